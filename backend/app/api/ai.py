@@ -3,7 +3,7 @@ AI Processing API Router
 Handles RAG queries and AI interactions
 """
 
-from typing import Annotated
+from typing import Annotated, List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
@@ -15,6 +15,7 @@ from api.auth import get_current_active_user
 from services.document_service import DocumentService
 from services.rag_service import RAGService
 from models.document import DocumentStatus
+from core.config import settings
 import structlog
 
 logger = structlog.get_logger()
@@ -25,13 +26,34 @@ router = APIRouter()
 # Request/Response Models
 class QueryRequest(BaseModel):
     question: str
-    method: str = "rag"  # "rag" or "graph" (graph to be implemented)
+    method: str = "rag"  # "rag" (vector), "hybrid" (BM25 + vector) or "graph"
+    rerank: Optional[bool] = None  # None = RERANK_ENABLED
 
 
 class QueryResponse(BaseModel):
+    answer: str
+    context_chunks: list[str]
+    distances: list[Optional[float]]  # None for chunks found only by keyword search
+    sources: list[dict] = []  # page range and offsets of each context chunk
+    retrieval: Optional[dict] = None
+    usage: dict
+
+
+class LibraryQueryRequest(BaseModel):
+    question: str
+    document_ids: Optional[List[int]] = None  # None = all processed documents
+    n_results: int = 5
+    rerank: Optional[bool] = None  # None = RERANK_ENABLED
+
+
+class LibraryQueryResponse(BaseModel):
     answer: str
     context_chunks: list[str]
     distances: list[float]
+    sources: list[dict]
+    shards: list[dict]
+    search_ms: float
+    retrieval: Optional[dict] = None
     usage: dict
 
 
@@ -39,6 +61,50 @@ class QueryResponse(BaseModel):
 # ENDPOINTS
 # ============================================================================
 
+@router.post("/query", response_model=LibraryQueryResponse)
+async def query_library(
+    request: LibraryQueryRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Query across several documents using RAG.
+    
+    - Searches the selected (or all) processed documents concurrently
+    - Merges hits into one global top-k and generates a single answer
+    - Returns per-shard search timing alongside sources and usage
+    """
+    logger.info("AI library query request",
+               user_id=current_user.id,
+               requested=len(request.document_ids) if request.document_ids is not None else "all")
+    
+    documents = await DocumentService.get_completed_documents(
+        db, current_user, request.document_ids
+    )
+    
+    if request.document_ids is not None:
+        unavailable = sorted(set(request.document_ids) - {doc.id for doc in documents})
+        if unavailable:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Documents not found or not yet processed: {unavailable}"
+            )
+    
+    if not documents:
+        raise HTTPException(status_code=400, detail="No processed documents to query")
+    
+    result = await RAGService.query_documents(
+        document_ids=[doc.id for doc in documents],
+        question=request.question,
+        user_id=current_user.id,
+        n_results=max(1, min(request.n_results, settings.RAG_MAX_RESULTS)),
+        titles={doc.id: doc.title for doc in documents},
+        rerank=request.rerank,
+        artifact_keys={doc.id: doc.artifact_key for doc in documents}
+    )
+    return result
+
+
 @router.post("/query/{document_id}", response_model=QueryResponse)
 async def query_document(
     document_id: int,
@@ -68,16 +134,20 @@ async def query_document(
         raise HTTPException(status_code=400, detail="Document not yet processed")
     
     # Perform RAG query
-    if request.method == "rag":
+    if request.method in ("rag", "hybrid"):
+        index_document_id, index_user_id = document.artifact_key
         result = await RAGService.query_document(
-            document_id=document_id,
-            question=request.question
+            document_id=index_document_id,
+            question=request.question,
+            user_id=index_user_id,
+            method="hybrid" if request.method == "hybrid" else "vector",
+            rerank=request.rerank
         )
         return result
     
     elif request.method == "graph":
         result = await GraphRAGService.query_document(
-            document_id=document_id,
+            document_id=document.artifact_key[0],
             question=request.question
         )
         return result
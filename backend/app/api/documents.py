@@ -14,6 +14,10 @@ from models.user import User, UserRole
 from models.document import Document, DocumentStatus
 from api.auth import get_current_active_user, require_admin
 from services.document_service import DocumentService
+from services.job_queue import job_queue
+from services.vector_store import VectorStore
+from services.rag_service import citation
+from services.chunker import stitch_chunks
 import structlog
 
 logger = structlog.get_logger()
@@ -35,16 +39,65 @@ class DocumentResponse(BaseModel):
         from_attributes = True
 
 
+class DocumentUploadResponse(DocumentResponse):
+    job_id: str | None  # None when an identical processed file was reused
+
+
+class BatchFileResult(BaseModel):
+    filename: str
+    status: str  # queued / reused / rejected
+    document_id: int | None
+    job_id: str | None  # follow like a single upload while status is queued
+    error: str | None
+
+
+class BatchUploadResponse(BaseModel):
+    total: int
+    queued: int
+    reused: int
+    rejected: int
+    files: List[BatchFileResult]
+
+
+class DocumentReplaceResponse(DocumentResponse):
+    job_id: str | None  # None when the uploaded file is identical to the current one
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: str | None = None
+    progress: int | None = None
+    attempts: int | None = None
+    error: str | None = None
+
+
 class DocumentListResponse(BaseModel):
     data: List[DocumentResponse]
     total: int
 
 
+class ChunkCitation(BaseModel):
+    text: str
+    chunk_index: int | None
+    page_start: int | None
+    page_end: int | None
+    char_start: int | None  # offsets into the document's extracted text
+    char_end: int | None
+
+
+class PageResponse(BaseModel):
+    document_id: int
+    page: int
+    text: str  # the page's chunks stitched together at their overlaps
+    chunks: List[ChunkCitation]
+
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
 
-@router.post("/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/upload", response_model=DocumentUploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_document(
     file: UploadFile = File(...),
     document_type: str = Form(...),
@@ -55,24 +108,90 @@ async def upload_document(
     Upload a document for processing.
     
     Supported formats: PDF, TXT, CSV
+    
+    Returns 202 as soon as the file is stored; processing runs in a worker.
+    Follow it via GET /jobs/{job_id} or WebSocket processing_update messages.
     """
     logger.info("Document upload request", user_id=current_user.id, filename=file.filename)
     
-    # Validate file size (50MB limit)
-    content = await file.read()
-    await file.seek(0)  # Reset file pointer
-    
-    if len(content) > 50 * 1024 * 1024:  # 50MB
-        raise HTTPException(status_code=413, detail="File too large (max 50MB)")
-    
-    document = await DocumentService.upload_document(
+    # Size (MAX_UPLOAD_SIZE) and type are checked while the file streams to disk
+    document, job_id = await DocumentService.upload_document(
         db=db,
         user=current_user,
         file=file,
         document_type=document_type
     )
     
-    return document
+    return {**DocumentResponse.model_validate(document).model_dump(), "job_id": job_id}
+
+
+@router.post("/batch", response_model=BatchUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    document_type: str = Form(...),
+    current_user: Annotated[User, Depends(get_current_active_user)] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Upload many documents at once: several files, or zip/tar archives of them.
+
+    Supported formats inside: PDF, TXT, CSV (other entries are rejected
+    individually). Returns 202 with a result per file; queued files are
+    followed via GET /jobs/{job_id} or WebSocket processing_update messages.
+    """
+    logger.info("Batch upload request", user_id=current_user.id, files=len(files))
+
+    results = await DocumentService.upload_documents(
+        db=db,
+        user=current_user,
+        files=files,
+        document_type=document_type
+    )
+
+    return {
+        "total": len(results),
+        **{state: sum(r["status"] == state for r in results) for state in ("queued", "reused", "rejected")},
+        "files": results,
+    }
+
+
+@router.put("/{document_id}", response_model=DocumentReplaceResponse, status_code=status.HTTP_202_ACCEPTED)
+async def replace_document(
+    document_id: int,
+    file: UploadFile = File(...),
+    current_user: Annotated[User, Depends(get_current_active_user)] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Upload a revised version of a document.
+
+    Re-ingestion is incremental: only chunks whose text changed are
+    embedded, vanished ones are deleted. Follow it like an upload.
+    """
+    logger.info("Document re-upload request", document_id=document_id, user_id=current_user.id)
+
+    document = await DocumentService.get_document_by_id(db, document_id, current_user, load_text=False)
+
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    job_id = await DocumentService.replace_document(db, document, file)
+
+    return {**DocumentResponse.model_validate(document).model_dump(), "job_id": job_id}
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_active_user)] = None
+):
+    """Get the status of a background processing job"""
+    job = await job_queue.get_status(job_id)
+    
+    if not job or (job.get("owner_id") != str(current_user.id) and current_user.role != UserRole.ADMIN):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
 
 
 @router.get("", response_model=DocumentListResponse)
@@ -96,7 +215,7 @@ async def get_document(
     db: AsyncSession = Depends(get_db)
 ):
     """Get specific document"""
-    document = await DocumentService.get_document_by_id(db, document_id, current_user)
+    document = await DocumentService.get_document_by_id(db, document_id, current_user, load_text=False)
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -149,4 +268,60 @@ async def get_document_content(
         "title": document.title,
         "content": document.extracted_text,
         "doc_metadata": document.doc_metadata 
-    }
\ No newline at end of file
+    }
+
+
+async def _get_indexed_document(db: AsyncSession, document_id: int, user: User) -> Document:
+    """A processed document of the user's, without its (large) extracted text"""
+    document = await DocumentService.get_document_by_id(db, document_id, user, load_text=False)
+
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if document.status != DocumentStatus.COMPLETED:
+        raise HTTPException(status_code=400, detail="Document still processing")
+
+    return document
+
+
+@router.get("/{document_id}/pages/{page}", response_model=PageResponse)
+async def get_document_page(
+    document_id: int,
+    page: int,
+    current_user: Annotated[User, Depends(get_current_active_user)] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get one page of a document ("open at page"), served from the vector
+    index by page metadata rather than from the stored extracted text
+    """
+    document = await _get_indexed_document(db, document_id, current_user)
+    found = await VectorStore.get_document_chunks(*document.artifact_key, page=page)
+
+    if not found['chunks']:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    citations = [citation(metadata) for metadata in found['metadatas']]
+    return {
+        "document_id": document.id,
+        "page": page,
+        "text": stitch_chunks(found['chunks'], [c['char_start'] for c in citations]),
+        "chunks": [{"text": text, **c} for text, c in zip(found['chunks'], citations)]
+    }
+
+
+@router.get("/{document_id}/chunks/{chunk_index}", response_model=ChunkCitation)
+async def get_document_chunk(
+    document_id: int,
+    chunk_index: int,
+    current_user: Annotated[User, Depends(get_current_active_user)] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a cited chunk with its page range and offsets (from a query's sources)"""
+    document = await _get_indexed_document(db, document_id, current_user)
+    found = await VectorStore.get_document_chunks(*document.artifact_key, chunk_index=chunk_index, limit=1)
+
+    if not found['chunks']:
+        raise HTTPException(status_code=404, detail="Chunk not found")
+
+    return {"text": found['chunks'][0], **citation(found['metadatas'][0])}
@@ -14,6 +14,12 @@ import structlog
 import json
 import asyncio
 
+from core import redis_client
+from core.config import settings
+from services.lexical_index import lexical_store
+from services.neo4j_service import neo4j_service
+from services.vector_store import VectorStore, collection_cache
+
 logger = structlog.get_logger()
 
 # Create router
@@ -181,4 +187,54 @@ async def send_notification(user_id: str, title: str, message: str, level: str =
         "title": title,
         "message": message,
         "level": level
-    }, user_id)
\ No newline at end of file
+    }, user_id)
+
+def forget_document(document_id: int, user_id: int):
+    """
+    Drop this process's cached state for a document a worker just
+    (re)ingested: its entity matcher, BM25 index and collection handle
+    """
+    neo4j_service.matchers.invalidate(document_id)
+    lexical_store.invalidate(document_id)
+    collection_cache.invalidate(VectorStore.collection_name(document_id, user_id))
+
+
+def forget_all_documents():
+    neo4j_service.matchers.clear()
+    lexical_store.clear()
+    collection_cache.clear()
+
+
+async def relay_processing_updates():
+    """
+    Forward progress published by ingestion workers to connected clients.
+    Runs in every API process; each delivers to its own connections, and
+    drops its caches of documents the workers re-ingested.
+    """
+    while True:
+        try:
+            pubsub = redis_client.redis_client.pubsub()
+            await pubsub.subscribe(settings.JOB_PROGRESS_CHANNEL)
+            # Updates published while unsubscribed are lost: start from cold caches
+            forget_all_documents()
+            try:
+                async for event in pubsub.listen():
+                    if event.get("type") != "message":
+                        continue
+                    update = json.loads(event["data"])
+                    if update["status"] == "completed":
+                        forget_document(update["document_id"], update["user_id"])
+                    await send_processing_update(
+                        str(update["user_id"]),
+                        update["document_id"],
+                        update["status"],
+                        update["progress"],
+                        update["message"]
+                    )
+            finally:
+                await pubsub.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Processing update relay failed, resubscribing", error=str(e))
+            await asyncio.sleep(1)
@@ -54,6 +54,30 @@ class Settings(BaseSettings):
     NEO4J_URI: str = "bolt://neo4j:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "your-neo4j-password"
+    NEO4J_WRITE_BATCH_SIZE: int = 500  # rows per UNWIND statement when writing a document graph
+    NEO4J_SCHEMA_ON_STARTUP: bool = True  # create missing constraints and indexes at API startup
+
+    # Graph queries: entity names found in the question seed a bounded
+    # expansion (at most MAX_HOPS, PATHS_PER_SEED paths from each seed)
+    GRAPH_QUERY_MAX_SEEDS: int = 10
+    GRAPH_QUERY_MAX_HOPS: int = 2
+    GRAPH_QUERY_PATHS_PER_SEED: int = 25
+    GRAPH_QUERY_MAX_RELATIONSHIPS: int = 50
+    GRAPH_ENTITY_MIN_CHARS: int = 2  # shorter names are never matched
+    GRAPH_MATCHER_CACHE_SIZE: int = 256  # documents whose entity matcher is kept in memory
+    GRAPH_MATCHER_TTL: int = 300  # seconds
+
+    # Entity extraction calls in flight per document (one call per chunk)
+    ENTITY_EXTRACTION_CONCURRENCY: int = 8
+
+    # Entity extraction: llm (a model call per chunk), local (rule-based, on
+    # CPU, no calls) or hybrid (local everywhere, plus the LLM on chunks where
+    # local finds at least ENTITY_HYBRID_MIN_NEW_ENTITIES entities that no
+    # earlier chunk of the document mentioned)
+    ENTITY_EXTRACTION_MODE: str = "llm"
+    ENTITY_LOCAL_BATCH_SIZE: int = 64  # chunks per process-pool task
+    ENTITY_HYBRID_MIN_NEW_ENTITIES: int = 2
+    ENTITY_GAZETTEER_PATH: str = ""  # CSV of name,type rows, for local extraction
     
     # ========================================================================
     # CORS (Cross-Origin Resource Sharing)
@@ -76,13 +100,93 @@ class Settings(BaseSettings):
     # Model selection
     OPENAI_MODEL: str = "gpt-4"
     EMBEDDING_MODEL: str = "text-embedding-ada-002"
-    
+
+    # Embedding backend: openai, local (hashing, offline), sentence-transformers
+    # Changing it changes the vector space - re-ingest documents afterwards
+    EMBEDDING_BACKEND: str = "openai"
+    LOCAL_EMBEDDING_DIM: int = 384
+    LOCAL_EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+
+    # Tokenizer used for token budgets (falls back to chars/4 if unavailable)
+    TOKENIZER_ENCODING: str = "cl100k_base"
+
+    # Embedding request batching: each provider call stays under both limits,
+    # and up to EMBEDDING_MAX_CONCURRENCY calls run at once per worker
+    EMBEDDING_BATCH_MAX_ITEMS: int = 2048
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100_000
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+
+    # ========================================================================
+    # EMBEDDING CACHE
+    # ========================================================================
+
+    # Vectors are cached by (model, sha256(text)): an in-process LRU tier
+    # in front of a Redis tier holding packed float32 bytes
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 5000  # ~30 MB at 1536 dims
+    EMBEDDING_CACHE_TTL: int = 30 * 24 * 3600  # 30 days
+
+    # Used to report the spend avoided by cache hits
+    EMBEDDING_COST_PER_1K_TOKENS: float = 0.0001  # text-embedding-ada-002
+
+    # ========================================================================
+    # RETRIEVAL
+    # ========================================================================
+
+    # Multi-document queries: shards searched in parallel, and the
+    # largest document_id $in list sent in one pooled-collection query
+    RAG_SEARCH_CONCURRENCY: int = 16
+    RAG_MAX_DOCUMENTS_PER_SHARD: int = 500
+    RAG_MAX_RESULTS: int = 20
+
+    # Lexical (BM25) index, one compact .npz per document
+    LEXICAL_INDEX_DIR: str = "/app/data/lexical"
+    LEXICAL_INDEX_CACHE_SIZE: int = 256  # indexes kept loaded
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+
+    # Hybrid retrieval: BM25 and vector rankings fused with RRF.
+    # The embedding call is skipped when the best lexical hit holds at least
+    # HYBRID_CONFIDENT_COVERAGE of the query's IDF weight and outscores the
+    # runner-up by HYBRID_CONFIDENT_MARGIN
+    HYBRID_RRF_K: int = 60
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_CONFIDENT_COVERAGE: float = 0.95
+    HYBRID_CONFIDENT_MARGIN: float = 1.5
+
+    # Optional rerank stage: retrieve n_results * RERANK_OVERFETCH candidates,
+    # rescore them on CPU and send at most RERANK_TOP_N chunks to the LLM
+    # lexical: BM25/coverage blended with dense similarity (no model)
+    # cross-encoder: RERANK_MODEL via sentence-transformers (optional dependency)
+    RERANK_ENABLED: bool = False
+    RERANK_BACKEND: str = "lexical"
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_OVERFETCH: int = 4
+    RERANK_TOP_N: int = 3
+    RERANK_DENSE_WEIGHT: float = 0.5
+
     # ========================================================================
     # FILE UPLOAD
     # ========================================================================
     
     UPLOAD_DIR: str = "/app/uploads"
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024  # 50 MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes read / hashed / written at a time
+    # Allowance on top of MAX_UPLOAD_SIZE for multipart boundaries and form
+    # fields when request bodies are cut off at the door
+    UPLOAD_REQUEST_OVERHEAD: int = 1024 * 1024
+
+    # Batch upload (many files or a zip/tar archive per request)
+    BATCH_UPLOAD_MAX_FILES: int = 1000
+    BATCH_UPLOAD_MAX_SIZE: int = 1024 * 1024 * 1024  # request body, and total bytes unpacked from an archive
+    BATCH_UPLOAD_CONCURRENCY: int = 4  # files streamed to storage at once
+
+    # PDF text extraction, by page range on the CPU process pool
+    # adaptive: PyPDF2, with pdfplumber only for pages that come back empty or garbled
+    # pdfplumber: pdfplumber for every page (slower, better layout)
+    PDF_EXTRACT_STRATEGY: str = "adaptive"
+    PDF_PARALLEL_EXTRACTION: bool = True
     
     # ========================================================================
     # MONITORING
@@ -93,6 +197,69 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60  # 1 hour
     ALGORITHM: str = "HS256"
 
+    # How often the event loop is probed for scheduling lag (seconds)
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5
+
+    # ========================================================================
+    # BACKGROUND JOBS
+    # ========================================================================
+
+    # Ingestion runs in worker processes (python -m worker) fed by a Redis
+    # stream; add workers to scale out
+    JOB_STREAM: str = "jobs:ingest"
+    JOB_GROUP: str = "ingest-workers"
+    JOB_PROGRESS_CHANNEL: str = "jobs:progress"
+    JOB_VISIBILITY_TIMEOUT: int = 300  # seconds without a heartbeat before a job is reclaimed
+    JOB_HEARTBEAT_INTERVAL: int = 30
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_DELAY: int = 10  # seconds, doubled per attempt
+    JOB_STATUS_TTL: int = 7 * 24 * 3600
+    WORKER_CONCURRENCY: int = 2  # jobs in flight per worker process
+    JOB_ENQUEUE_BATCH_SIZE: int = 500  # jobs per Redis round-trip when enqueuing many
+
+    # Ingestion pipeline: pages -> chunks -> embedding batches -> vector
+    # upserts, connected by queues of INGEST_QUEUE_SIZE items so memory
+    # stays bounded and the stages overlap
+    INGEST_QUEUE_SIZE: int = 4
+    INGEST_PDF_PAGE_BATCH: int = 8  # pages parsed per process-pool call
+    INGEST_TEXT_BLOCK_CHARS: int = 64 * 1024  # txt/csv read size
+    INGEST_EMBED_BATCH_SIZE: int = 64  # chunks per embedding call and upsert
+    INGEST_EMBED_WORKERS: int = 2  # embedding batches in flight
+
+    # Chunk size and overlap, in tokens of TOKENIZER_ENCODING
+    CHUNK_SIZE_TOKENS: int = 500
+    CHUNK_OVERLAP_TOKENS: int = 50
+
+    # ========================================================================
+    # EXECUTORS
+    # ========================================================================
+
+    # Blocking I/O (vector store, sync Neo4j driver) runs on threads;
+    # CPU-bound parsing (PDF extraction) runs on processes (0 = CPU count)
+    EXECUTOR_IO_THREADS: int = 32
+    EXECUTOR_CPU_PROCESSES: int = 0
+
+    # ========================================================================
+    # VECTOR STORE
+    # ========================================================================
+
+    # chroma: ChromaDB server over HTTP
+    # local: in-process NumPy index persisted under VECTOR_DATA_DIR
+    #        (no network hop; suited to small and medium deployments)
+    VECTOR_BACKEND: str = "chroma"
+    VECTOR_DATA_DIR: str = "/app/data/vectors"
+
+    # per_document: one collection per document (legacy layout)
+    # shared: all chunks in VECTOR_SHARED_COLLECTION, filtered by document_id
+    # per_user: one collection per owner, filtered by document_id
+    # Move existing data with: python -m scripts.migrate_vector_collections
+    VECTOR_COLLECTION_MODE: str = "per_document"
+    VECTOR_SHARED_COLLECTION: str = "document_chunks"
+
+    # Collection handles cached per process (seconds before re-checking the server)
+    VECTOR_COLLECTION_CACHE_SIZE: int = 1024
+    VECTOR_COLLECTION_CACHE_TTL: int = 300
+
     CHROMA_HOST: str = "chromadb"
     CHROMA_PORT: int = 4000
     CHROMA_URL: str = "http://chromadb:4000"
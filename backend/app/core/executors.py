@@ -0,0 +1,139 @@
+"""
+Executors
+Keeps blocking work off the event loop
+
+- run_io: blocking I/O (sync HTTP clients, sync drivers) on a sized thread pool
+- run_cpu: CPU-bound work (PDF parsing) on a process pool; the function and
+  its arguments must be picklable, so pass module-level functions
+- Event loop lag monitor, to show the loop stays responsive under load
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import time
+
+from prometheus_client import Gauge, Histogram
+from core.config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+EXECUTOR_TASK_DURATION = Histogram(
+    'executor_task_duration_seconds',
+    'Time from submission to completion of offloaded work',
+    ['pool']  # pool: io/cpu
+)
+
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'Delay between when a timer should fire and when it does',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+EVENT_LOOP_LAG_LAST = Gauge(
+    'event_loop_lag_last_seconds',
+    'Most recent event loop lag sample'
+)
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+_cpu_executor: Optional[ProcessPoolExecutor] = None
+_lag_task: Optional[asyncio.Task] = None
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Thread pool for blocking I/O, created on first use"""
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(
+            max_workers=settings.EXECUTOR_IO_THREADS,
+            thread_name_prefix="blocking-io"
+        )
+    return _io_executor
+
+
+def cpu_workers() -> int:
+    """Size of the CPU process pool"""
+    return settings.EXECUTOR_CPU_PROCESSES or os.cpu_count() or 1
+
+
+def get_cpu_executor() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound work, created on first use"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        workers = cpu_workers()
+        # spawn: forking a process that already runs threads can deadlock
+        _cpu_executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info("CPU process pool started", workers=workers)
+    return _cpu_executor
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call on the I/O thread pool"""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. request counters) into the worker thread
+    context = contextvars.copy_context()
+    call = partial(context.run, func, *args, **kwargs)
+
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(get_io_executor(), call)
+    finally:
+        EXECUTOR_TASK_DURATION.labels(pool="io").observe(time.perf_counter() - start)
+
+
+async def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """Run a picklable, CPU-bound function on the process pool"""
+    loop = asyncio.get_running_loop()
+
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(get_cpu_executor(), partial(func, *args, **kwargs))
+    finally:
+        EXECUTOR_TASK_DURATION.labels(pool="cpu").observe(time.perf_counter() - start)
+
+
+async def monitor_event_loop_lag(interval: float):
+    """Sample how late a sleep wakes up; sustained lag means something blocks the loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+        if lag > 1.0:
+            logger.warning("Event loop blocked", lag_seconds=round(lag, 3))
+
+
+def start_event_loop_monitor():
+    """Start the lag monitor on the running loop"""
+    global _lag_task
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.create_task(monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL))
+
+
+async def shutdown_executors():
+    """Stop the lag monitor and release pool workers"""
+    global _io_executor, _cpu_executor, _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        try:
+            await _lag_task
+        except asyncio.CancelledError:
+            pass
+        _lag_task = None
+
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False, cancel_futures=True)
+        _io_executor = None
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=False, cancel_futures=True)
+        _cpu_executor = None
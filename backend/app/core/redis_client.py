@@ -14,10 +14,13 @@ logger = structlog.get_logger()
 # Global redis client
 redis_client: Optional[redis.Redis] = None
 
+# Binary-safe client (no response decoding) for packed payloads such as vectors
+redis_binary_client: Optional[redis.Redis] = None
+
 
 async def init_redis():
     """Initialize Redis connection"""
-    global redis_client
+    global redis_client, redis_binary_client
     try:
         redis_client = await redis.from_url(
             settings.REDIS_URL,
@@ -25,6 +28,11 @@ async def init_redis():
             decode_responses=True,
             max_connections=10
         )
+        redis_binary_client = await redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=False,
+            max_connections=10
+        )
         # Test connection
         await redis_client.ping()
         logger.info("Redis connected successfully")
@@ -35,7 +43,8 @@ async def init_redis():
 
 async def close_redis():
     """Close Redis connection"""
-    global redis_client
+    if redis_binary_client:
+        await redis_binary_client.close()
     if redis_client:
         await redis_client.close()
         logger.info("Redis connection closed")
@@ -46,6 +55,11 @@ async def get_redis() -> redis.Redis:
     return redis_client
 
 
+async def get_redis_binary() -> Optional[redis.Redis]:
+    """Get binary-safe Redis client instance (bytes in, bytes out)"""
+    return redis_binary_client
+
+
 # Cache utilities
 async def cache_set(key: str, value: Any, expire: int = 3600):
     """Set cache with expiration (default 1 hour)"""
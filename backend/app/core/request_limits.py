@@ -0,0 +1,96 @@
+"""
+Request Body Limits
+ASGI middleware capping upload request bodies as they arrive
+
+The multipart parser spools a whole request body to disk before the
+endpoint runs, so per-file checks come too late to stop an oversized
+upload. This rejects it at the door: by Content-Length when the client
+sends one, otherwise by counting body bytes and answering 413 as soon
+as the limit is passed.
+"""
+
+from typing import Dict, Optional
+import json
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class RequestBodyLimitMiddleware:
+    """
+    Limit POST/PUT bodies by path prefix: limits maps a prefix to its max
+    bytes, and the longest matching prefix applies
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def limit_for(self, path: str) -> Optional[int]:
+        for prefix, max_bytes in self.limits:
+            if path.startswith(prefix):
+                return max_bytes
+        return None
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = None
+        if scope["type"] == "http" and scope["method"] in ("POST", "PUT"):
+            max_bytes = self.limit_for(scope["path"])
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+            await self._reject(scope, send, max_bytes)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    exceeded = True
+                    raise BodyTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal started
+            if exceeded:
+                # The framework turns the failed body read into its own
+                # error response; answer 413 in its place
+                if message["type"] == "http.response.start" and not started:
+                    started = True
+                    await self._reject(scope, send, max_bytes)
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except BodyTooLarge:
+            if not started:
+                await self._reject(scope, send, max_bytes)
+
+    @staticmethod
+    async def _reject(scope, send, max_bytes: int):
+        logger.info("Request body too large", path=scope["path"], limit=max_bytes)
+        body = json.dumps({"detail": f"Request too large (max {max_bytes} bytes)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
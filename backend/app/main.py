@@ -5,6 +5,7 @@ Location: backend/app/main.py
 
 # Add import
 from api import auth, documents, ai, websocket as ws_router, teacher, research
+import asyncio
 import os
 import sys
 from pathlib import Path
@@ -25,7 +26,10 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from api import auth, documents, ai, websocket as ws_router
 from core.database import init_db, close_db
 from core.redis_client import init_redis, close_redis
+from core.executors import start_event_loop_monitor, shutdown_executors
 from core.config import settings
+from core.request_limits import RequestBodyLimitMiddleware
+from services.neo4j_service import neo4j_service
 from utils.file_utils import ensure_upload_directory
 
 # Configure structured logging for production
@@ -55,18 +59,34 @@ async def lifespan(app: FastAPI):
         
         await init_redis()
         logger.info("Redis initialized")
+
+        # Graph constraints and indexes (idempotent); the API still starts
+        # without Neo4j, /health/graph-schema reports what's missing
+        if settings.NEO4J_SCHEMA_ON_STARTUP:
+            try:
+                await neo4j_service.schema.ensure()
+            except Exception as e:
+                logger.warning("Graph schema setup failed", error=str(e))
+
+        # Relay ingestion progress from workers to WebSocket clients
+        progress_relay = asyncio.create_task(ws_router.relay_processing_updates())
         
         # Ensure upload directory exists
         ensure_upload_directory()
         logger.info("Upload directory ready")
+
+        start_event_loop_monitor()
         
         yield
+
+        progress_relay.cancel()
         
     finally:
         # Shutdown
         logger.info("Shutting down AI Document Platform...")
         await close_db()
         await close_redis()
+        await shutdown_executors()
 
 # Create FastAPI app
 app = FastAPI(
@@ -89,6 +109,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cut off oversized uploads while they stream in
+app.add_middleware(
+    RequestBodyLimitMiddleware,
+    limits={
+        "/api/documents": settings.MAX_UPLOAD_SIZE + settings.UPLOAD_REQUEST_OVERHEAD,
+        "/api/documents/batch": settings.BATCH_UPLOAD_MAX_SIZE + settings.UPLOAD_REQUEST_OVERHEAD,
+    },
+)
+
 # Prometheus monitoring
 instrumentator = Instrumentator(
     should_group_status_codes=False,
@@ -131,6 +160,17 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
+@app.get("/health/graph-schema")
+async def graph_schema_check():
+    """Neo4j constraints and indexes the graph queries rely on"""
+    try:
+        problems = await neo4j_service.schema.check()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail={"status": "unavailable", "error": str(e)})
+    if problems:
+        raise HTTPException(status_code=503, detail={"status": "degraded", "problems": problems})
+    return {"status": "healthy"}
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -18,6 +18,24 @@ class DocumentStatus(str, Enum):
     FAILED = "failed"
 
 
+class DocumentBlob(Base):
+    """
+    An uploaded file, stored once per content hash and shared by every
+    Document row with that hash (ref_count of them)
+    """
+    __tablename__ = "document_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_hash = Column(String(64), nullable=False, unique=True, index=True)
+    file_path = Column(String(500), nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<DocumentBlob(id={self.id}, file_hash='{self.file_hash}', ref_count={self.ref_count})>"
+
+
 class Document(Base):
     """Document model"""
     __tablename__ = "documents"
@@ -30,12 +48,19 @@ class Document(Base):
     file_path = Column(String(500), nullable=False)
     file_hash = Column(String(64), nullable=False, index=True)
     content_type = Column(String(50), nullable=False)  # pdf, txt, csv
+    blob_id = Column(Integer, ForeignKey("document_blobs.id"), nullable=True, index=True)
     
     # Processing
     status = Column(SQLAEnum(DocumentStatus), default=DocumentStatus.PENDING, nullable=False)
     extracted_text = Column(Text, nullable=True)
     chunk_count = Column(Integer, nullable=True)
     doc_metadata  = Column(JSON, nullable=True)
+
+    # Key of the vectors, keyword index and graph this document reads.
+    # Its own id once processed; a duplicate upload reuses the key of the
+    # document it matched, and the artifacts live while any row holds it.
+    index_document_id = Column(Integer, nullable=True, index=True)
+    index_user_id = Column(Integer, nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -43,6 +68,13 @@ class Document(Base):
     
     # Relationships
     user = relationship("User", back_populates="documents")
+
+    @property
+    def artifact_key(self) -> tuple:
+        """(document_id, user_id) the document's vectors and indexes are stored under"""
+        if self.index_document_id is None:
+            return self.id, self.user_id
+        return self.index_document_id, self.index_user_id
     
     def __repr__(self):
         return f"<Document(id={self.id}, title='{self.title}', status='{self.status}')>"
\ No newline at end of file
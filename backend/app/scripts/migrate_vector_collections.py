@@ -0,0 +1,123 @@
+"""
+Vector Collection Migration
+Moves legacy per-document collections (doc_<id>) into the pooled layout
+selected by VECTOR_COLLECTION_MODE (shared or per_user)
+
+Usage (from the app directory, with the target mode configured):
+    VECTOR_COLLECTION_MODE=shared python -m scripts.migrate_vector_collections --dry-run
+    VECTOR_COLLECTION_MODE=shared python -m scripts.migrate_vector_collections --delete-source
+
+Embeddings are copied as stored (nothing is re-embedded). Writes are
+upserts, so an interrupted run can simply be restarted.
+"""
+
+from typing import Dict, List
+import argparse
+import asyncio
+import re
+
+from sqlalchemy import select
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.document import Document
+from services.vector_store import VectorStore, vector_client
+import structlog
+
+logger = structlog.get_logger()
+
+LEGACY_COLLECTION = re.compile(r"^doc_(\d+)$")
+
+
+async def load_owners(document_ids: List[int]) -> Dict[int, int]:
+    """Map document id -> owning user id"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document.id, Document.user_id).where(Document.id.in_(document_ids))
+        )
+        return {doc_id: user_id for doc_id, user_id in result.all()}
+
+
+def migrate_collection(document_id: int, user_id: int, page_size: int, dry_run: bool) -> int:
+    """Copy one legacy collection into its pooled target; returns rows copied"""
+    source = vector_client.get_collection(name=f"doc_{document_id}")
+    target = None if dry_run else VectorStore.get_or_create_collection(document_id, user_id)
+
+    copied = 0
+    offset = 0
+    while True:
+        page = source.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=page_size,
+            offset=offset
+        )
+        if not page["ids"]:
+            break
+
+        if target is not None:
+            target.upsert(
+                ids=[VectorStore.chunk_id(document_id, chunk_id) for chunk_id in page["ids"]],
+                embeddings=page["embeddings"],
+                documents=page["documents"],
+                metadatas=[
+                    {**(metadata or {}), "document_id": document_id, "user_id": user_id}
+                    for metadata in page["metadatas"]
+                ]
+            )
+
+        copied += len(page["ids"])
+        offset += len(page["ids"])
+
+    return copied
+
+
+async def migrate(page_size: int, dry_run: bool, delete_source: bool) -> Dict:
+    """Migrate every legacy collection; returns a summary"""
+    if not VectorStore.is_pooled():
+        raise SystemExit("Set VECTOR_COLLECTION_MODE to shared or per_user before migrating")
+
+    legacy = {}
+    for collection in vector_client.list_collections():
+        match = LEGACY_COLLECTION.match(collection.name)
+        if match:
+            legacy[int(match.group(1))] = collection.name
+
+    owners = await load_owners(list(legacy)) if legacy else {}
+    summary = {"collections": len(legacy), "migrated": 0, "rows": 0, "orphaned": [], "deleted": 0}
+
+    for document_id in sorted(legacy):
+        user_id = owners.get(document_id)
+        if user_id is None:
+            # No Document row: nothing can query it, leave it for manual cleanup
+            summary["orphaned"].append(legacy[document_id])
+            logger.warning("Skipping orphaned collection", collection=legacy[document_id])
+            continue
+
+        rows = migrate_collection(document_id, user_id, page_size, dry_run)
+        summary["migrated"] += 1
+        summary["rows"] += rows
+        logger.info("Collection migrated",
+                   collection=legacy[document_id],
+                   target=VectorStore.collection_name(document_id, user_id),
+                   rows=rows,
+                   dry_run=dry_run)
+
+        if delete_source and not dry_run:
+            vector_client.delete_collection(name=legacy[document_id])
+            summary["deleted"] += 1
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=500, help="rows copied per request")
+    parser.add_argument("--dry-run", action="store_true", help="count rows without writing")
+    parser.add_argument("--delete-source", action="store_true", help="drop doc_<id> collections once copied")
+    args = parser.parse_args()
+
+    summary = asyncio.run(migrate(args.page_size, args.dry_run, args.delete_source))
+    logger.info("Migration finished", mode=settings.VECTOR_COLLECTION_MODE, **summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Token Chunker
+Splits text into overlapping chunks measured in real tokens
+
+- The text is tokenized once (tiktoken when its BPE files load, otherwise a
+  local regex pre-tokenizer that approximates BPE token boundaries)
+- Paragraph and sentence boundaries are located with regexes, word
+  boundaries with a NumPy pass over the code points, and all are mapped
+  onto token positions; each chunk then picks its cut in
+  O(1), so a document is chunked in one linear pass
+- A chunk ends at the best boundary in the back half of its token window
+  (paragraph > sentence > word > hard cut) and the next one starts
+  `overlap` tokens earlier, snapped to a word start; every step moves forward
+- Chunks carry character offsets into the text and the pages they span
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+import re
+
+import numpy as np
+from services.tokenizer import get_encoding
+
+# Boundary strength at a token position
+WORD, SENTENCE, PARAGRAPH = 1, 2, 3
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s)")
+
+# Non-ASCII code points matched by \s
+UNICODE_SPACES = np.array(
+    [0x85, 0xA0, 0x1680, *range(0x2000, 0x200B), 0x2028, 0x2029, 0x202F, 0x205F, 0x3000],
+    dtype=np.uint32
+)
+
+# Used when tiktoken can't load: GPT-style pre-tokenization, with long
+# words split the way BPE splits rare words (~4-5 chars per token)
+APPROX_TOKEN = re.compile(r" ?[^\W\d_]{1,6}| ?\d{1,3}| ?[^\s\w]{1,3}|\s+(?!\S)|\s+")
+
+
+@dataclass
+class Chunk:
+    text: str
+    char_start: int  # text == source[char_start:char_end]
+    char_end: int
+    token_count: int
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+
+@lru_cache(maxsize=4)
+def _token_byte_lengths(encoding) -> np.ndarray:
+    """UTF-8 byte length of every token id, so offsets are a cumsum rather than a decode"""
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass  # unused ids between the BPE ranks and special tokens
+    return lengths
+
+
+def token_offsets(text: str, encoding=None) -> np.ndarray:
+    """
+    Character offset of each token's start, plus len(text) at the end
+    (n_tokens + 1 entries). encoding: a tiktoken Encoding, or None for the
+    regex approximation.
+    """
+    if encoding is None:
+        lengths = np.fromiter(map(len, APPROX_TOKEN.findall(text)), dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return offsets
+
+    tokens = np.asarray(encoding.encode_ordinary(text), dtype=np.int64)
+    byte_offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(_token_byte_lengths(encoding)[tokens], out=byte_offsets[1:])
+    if text.isascii():
+        return byte_offsets
+
+    # Byte -> character offsets: count UTF-8 lead bytes before each position
+    # (a token that ends inside a multi-byte character rounds down to it)
+    raw = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    lead_before = np.zeros(len(raw) + 1, dtype=np.int64)
+    np.cumsum((raw & 0xC0) != 0x80, out=lead_before[1:])
+    return lead_before[byte_offsets]
+
+
+class TokenChunker:
+    """Chunk text by token count with boundary-aware cuts"""
+
+    def __init__(self, chunk_size: int = 500, overlap: int = 50, encoding=None, use_tiktoken: bool = True):
+        if chunk_size < 2:
+            raise ValueError("chunk_size must be at least 2 tokens")
+        self.chunk_size = chunk_size
+        # Cuts land in the back half of the window, so more overlap than
+        # that could stall; clamp it
+        self.min_fill = max(1, chunk_size // 2)
+        self.overlap = max(0, min(overlap, self.min_fill - 1))
+        self.encoding = encoding if encoding is not None else (get_encoding() if use_tiktoken else None)
+
+    def _boundaries(self, text: str, offsets: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        For each token position p (0..n): the last position <= p where a
+        cut of at least each strength is allowed, and the next word start >= p.
+        """
+        n = len(offsets) - 1
+        strength = np.zeros(n + 1, dtype=np.int8)
+
+        # Word breaks: where each whitespace run starts (one vectorised pass
+        # over the code points; there is one per word)
+        codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        space = (codepoints == 32) | ((codepoints >= 9) & (codepoints <= 13))
+        if not text.isascii():
+            space |= np.isin(codepoints, UNICODE_SPACES)
+        run_starts = space.copy()
+        run_starts[1:] &= ~space[:-1]
+        breaks = [(WORD, np.flatnonzero(run_starts))]
+
+        for kind, pattern, use_end in ((SENTENCE, SENTENCE_END, True), (PARAGRAPH, PARAGRAPH_BREAK, False)):
+            breaks.append((kind, np.fromiter(
+                (m.end() if use_end else m.start() for m in pattern.finditer(text)), dtype=np.int64
+            )))
+
+        for kind, positions in breaks:
+            # The first token starting at or after the break (kinds go weakest
+            # first, so plain assignment keeps the strongest)
+            tokens = np.searchsorted(offsets, positions, side="left")
+            strength[tokens[tokens <= n]] = kind
+        strength[0] = strength[n] = PARAGRAPH
+
+        positions = np.arange(n + 1)
+        last = [
+            np.maximum.accumulate(np.where(strength >= kind, positions, 0))
+            for kind in (PARAGRAPH, SENTENCE, WORD)
+        ]
+        next_word = np.minimum.accumulate(np.where(strength >= WORD, positions, n)[::-1])[::-1]
+        return last[0], last[1], last[2], next_word
+
+    def split(self, text: str, final: bool = True, lookahead: int = 8) -> Tuple[List[Chunk], int]:
+        """
+        Chunks of text and the character offset up to which text is
+        consumed. With final=False, windows reaching into the last
+        `lookahead` tokens are left for later (more text may change them).
+        """
+        offsets = token_offsets(text, self.encoding)
+        n = len(offsets) - 1
+        if n == 0:
+            return [], len(text)
+
+        last_paragraph, last_sentence, last_word, next_word = self._boundaries(text, offsets)
+        size, min_fill, overlap = self.chunk_size, self.min_fill, self.overlap
+        limit = n if final else n - lookahead
+
+        chunks: List[Chunk] = []
+        start = 0
+        while start < n:
+            end = start + size
+            if end >= n:
+                if not final:
+                    break
+                cut = n
+            else:
+                if end > limit:
+                    break
+                lowest = start + min_fill
+                cut = end
+                for last in (last_paragraph, last_sentence, last_word):
+                    candidate = int(last[end])
+                    if candidate >= lowest:
+                        cut = candidate
+                        break
+
+            self._emit(chunks, text, int(offsets[start]), int(offsets[cut]), cut - start)
+            if cut >= n:
+                start = n
+                break
+
+            following = cut - overlap
+            snapped = int(next_word[following])
+            start = max(snapped if snapped < cut else following, start + 1)
+
+        return chunks, int(offsets[start]) if start < n else len(text)
+
+    @staticmethod
+    def _emit(chunks: List[Chunk], text: str, char_start: int, char_end: int, token_count: int):
+        piece = text[char_start:char_end]
+        stripped = piece.strip()
+        if not stripped:
+            return
+        char_start += len(piece) - len(piece.lstrip())
+        chunks.append(Chunk(stripped, char_start, char_start + len(stripped), token_count))
+
+    def chunk(self, text: str, page_starts: Optional[Sequence[Tuple[int, int]]] = None) -> List[Chunk]:
+        """
+        Chunk a whole text. page_starts: (char_offset, page_number) where
+        each page begins, in order; chunks are tagged with the pages they span.
+        """
+        chunks, _ = self.split(text)
+        if page_starts:
+            assign_pages(chunks, page_starts)
+        return chunks
+
+
+def assign_pages(chunks: List[Chunk], page_starts: Sequence[Tuple[int, int]], base: int = 0):
+    """Set page_start/page_end from (char_offset, page_number) starts; base shifts chunk offsets"""
+    if not chunks or not page_starts:
+        return
+    starts = np.array([offset for offset, _ in page_starts], dtype=np.int64)
+    numbers = [page for _, page in page_starts]
+    first = np.searchsorted(starts, [c.char_start + base for c in chunks], side="right") - 1
+    last = np.searchsorted(starts, [c.char_end + base - 1 for c in chunks], side="right") - 1
+    for chunk, i, j in zip(chunks, first.tolist(), last.tolist()):
+        chunk.page_start = numbers[max(i, 0)]
+        chunk.page_end = numbers[max(j, 0)]
+
+
+def stitch_chunks(texts: Sequence[str], char_starts: Sequence[Optional[int]]) -> str:
+    """
+    Rebuild the source span covered by overlapping chunks (in document
+    order) from their offsets, without repeating the overlaps. Whitespace
+    trimmed between chunks comes back as a single newline.
+    """
+    parts: List[str] = []
+    covered = None
+    for text, start in zip(texts, char_starts):
+        if start is None or covered is None:
+            parts.append(text if not parts else "\n" + text)
+        elif start < covered:
+            parts.append(text[covered - start:])
+        else:
+            parts.append("\n" + text)
+        if start is not None:
+            covered = max(covered or 0, start + len(text))
+    return "".join(parts)
+
+
+class StreamingTokenChunker:
+    """
+    TokenChunker over text that arrives a page at a time. Chunks are
+    emitted once the text after them has arrived; the unfinished tail is
+    carried into the next feed (and re-tokenized with it), so chunks span
+    page breaks. Offsets are relative to the concatenation of all feeds.
+    """
+
+    def __init__(self, chunker: TokenChunker):
+        self.chunker = chunker
+        self.buffer = ""
+        self.offset = 0  # absolute position of buffer[0]
+        self.page_starts: List[Tuple[int, int]] = []
+
+    def feed(self, text: str, page: Optional[int] = None) -> List[Chunk]:
+        """Add text (optionally starting a new page); returns the chunks completed by it"""
+        if page is not None:
+            self.page_starts.append((self.offset + len(self.buffer), page))
+        self.buffer += text
+        return self._drain(final=False)
+
+    def finish(self) -> List[Chunk]:
+        """Flush the remaining text"""
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[Chunk]:
+        chunks, consumed = self.chunker.split(self.buffer, final=final)
+        for chunk in chunks:
+            chunk.char_start += self.offset
+            chunk.char_end += self.offset
+        assign_pages(chunks, self.page_starts)
+
+        self.buffer = self.buffer[consumed:]
+        self.offset += consumed
+        # Keep only the page the remaining text starts in, and later ones
+        while len(self.page_starts) > 1 and self.page_starts[1][0] <= self.offset:
+            self.page_starts.pop(0)
+        return chunks
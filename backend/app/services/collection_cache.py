@@ -0,0 +1,154 @@
+"""
+Collection Handle Cache
+Avoids a get_collection round-trip to the vector server on every search and add
+
+- Bounded LRU of collection handles with a TTL
+- Single-flight creation: concurrent first uses of a name make one request
+- Explicit invalidation when a collection is deleted or a call on it fails
+
+Also counts vector-store requests, in total and per query, so the cost
+of each search in round-trips is visible.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import time
+
+from prometheus_client import Counter, Histogram
+import structlog
+
+logger = structlog.get_logger()
+
+VECTOR_STORE_REQUESTS = Counter(
+    'vector_store_requests_total',
+    'Requests made to the vector store',
+    ['backend', 'operation']
+)
+
+VECTOR_STORE_REQUESTS_PER_QUERY = Histogram(
+    'vector_store_requests_per_query',
+    'Vector store requests issued by one search/ingest operation',
+    ['operation'],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 16, 32, 64)
+)
+
+COLLECTION_CACHE_LOOKUPS = Counter(
+    'vector_collection_cache_lookups_total',
+    'Collection handle cache lookups',
+    ['result']  # result: hit/miss
+)
+
+# Per-operation request tally; a mutable list so child tasks add to the parent's count
+_request_tally: ContextVar[Optional[List[int]]] = ContextVar("vector_request_tally", default=None)
+
+
+def record_request(backend: str, operation: str):
+    """Count one request to the vector store"""
+    VECTOR_STORE_REQUESTS.labels(backend=backend, operation=operation).inc()
+    tally = _request_tally.get()
+    if tally is not None:
+        tally[0] += 1
+
+
+@contextmanager
+def count_requests(operation: str):
+    """
+    Tally vector store requests made inside the block.
+    Yields a one-element list holding the running count.
+    """
+    tally = _request_tally.get()
+    if tally is not None:
+        # Nested operation: let the outermost one own the tally
+        yield tally
+        return
+
+    tally = [0]
+    token = _request_tally.set(tally)
+    try:
+        yield tally
+    finally:
+        _request_tally.reset(token)
+        VECTOR_STORE_REQUESTS_PER_QUERY.labels(operation=operation).observe(tally[0])
+
+
+class CollectionHandleCache:
+    """TTL'd, bounded cache of collection handles keyed by name"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._creation_locks: Dict[str, threading.Lock] = {}
+
+    def _lookup(self, name: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            handle, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[name]
+                return None
+            self._entries.move_to_end(name)
+            return handle
+
+    def _store(self, name: str, handle: Any):
+        with self._lock:
+            self._entries[name] = (handle, time.monotonic() + self.ttl)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _creation_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._creation_locks.get(name)
+            if lock is None:
+                lock = self._creation_locks[name] = threading.Lock()
+            return lock
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return a live cached handle, or None (never calls the server)"""
+        handle = self._lookup(name)
+        if handle is not None:
+            COLLECTION_CACHE_LOOKUPS.labels(result="hit").inc()
+        return handle
+
+    def get_or_load(self, name: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached handle for name, calling loader() on a miss.
+        Concurrent misses for the same name wait for a single loader call.
+        """
+        handle = self._lookup(name)
+        if handle is not None:
+            COLLECTION_CACHE_LOOKUPS.labels(result="hit").inc()
+            return handle
+
+        try:
+            with self._creation_lock(name):
+                # Another thread may have loaded it while we waited
+                handle = self._lookup(name)
+                if handle is not None:
+                    COLLECTION_CACHE_LOOKUPS.labels(result="hit").inc()
+                    return handle
+
+                COLLECTION_CACHE_LOOKUPS.labels(result="miss").inc()
+                handle = loader()
+                self._store(name, handle)
+                return handle
+        finally:
+            # Also when loader() raised: a lock per failing name would pile up
+            with self._lock:
+                self._creation_locks.pop(name, None)
+
+    def invalidate(self, name: str):
+        """Forget a handle (collection deleted, or a call on it failed)"""
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -3,22 +3,38 @@ Document Processing Service
 Handles document upload, processing, and management
 """
 
-from typing import List, Optional, Dict
+from collections import Counter
+from pathlib import PurePosixPath
+from typing import Any, List, Optional, Dict, Tuple
+import asyncio
+import tarfile
+import zipfile
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, func, values, column, Integer, String
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import defer
 from fastapi import UploadFile, HTTPException
-from models.document import Document, DocumentStatus
+from models.document import Document, DocumentBlob, DocumentStatus
 from models.user import User
-from services.pdf_processor import PDFProcessor, TextChunker
-from utils.file_utils import save_upload_file, delete_file, get_file_extension
+from services.pdf_processor import PageRecord, PDFProcessor
+from utils.file_utils import (
+    save_upload_file, delete_file, get_file_extension, iter_text_blocks,
+    ALLOWED_MIME_TYPES, StoredFile, UnsupportedUpload, UploadTooLarge, is_archive, iter_archive,
+)
+from core.config import settings
+from core.executors import run_io
 from core.redis_client import cache_set, cache_get, cache_delete
 import structlog
 from services.vector_store import VectorStore
-from services.entity_extractor import EntityExtractor
+from services.lexical_index import lexical_store
+from services.ingest_pipeline import IngestPipeline, ProgressCallback
+from services.job_queue import job_queue
 from services.neo4j_service import neo4j_service
 
 logger = structlog.get_logger()
 
+INGEST_JOB = "ingest_document"
+
 
 class DocumentService:
     """Service for document operations"""
@@ -29,16 +45,22 @@ class DocumentService:
         user: User,
         file: UploadFile,
         document_type: str
-    ) -> Document:
-        """Upload and process document"""
+    ) -> Tuple[Document, Optional[str]]:
+        """
+        Save the upload and queue it for processing; returns (document, job_id).
+        A file identical to an already processed one (any user's) reuses its
+        text, vectors and graph instead: the document is ready at once and
+        job_id is None.
+        """
         try:
             # Validate file type
             file_extension = get_file_extension(file.filename)
-            if file_extension not in ['.pdf', '.txt', '.csv']:
+            if file_extension not in ALLOWED_MIME_TYPES:
                 raise HTTPException(status_code=400, detail="Unsupported file type")
             
-            # Save file
-            file_path, file_hash = await save_upload_file(file, user.id)
+            # Save file (stored once per content hash)
+            file_path, file_hash, _, _ = await DocumentService._store_upload(file)
+            blob_id = await DocumentService._acquire_blob(db, file_hash, file_path)
             
             # Create document record
             document = Document(
@@ -46,75 +68,457 @@ class DocumentService:
                 title=file.filename,
                 file_path=file_path,
                 file_hash=file_hash,
+                blob_id=blob_id,
                 content_type=file_extension.replace('.', ''),
-                status=DocumentStatus.PROCESSING
+                status=DocumentStatus.PENDING
             )
+            source = await DocumentService._find_processed_duplicate(db, file_hash)
+            if source is not None:
+                DocumentService._reuse_artifacts(document, source)
             
             db.add(document)
             await db.commit()
             await db.refresh(document)
             
+            if source is not None:
+                logger.info("Duplicate upload reused", doc_id=document.id, user_id=user.id,
+                            source_doc_id=source.id)
+                return document, None
+            
             logger.info("Document uploaded", doc_id=document.id, user_id=user.id)
             
-            # Process document asynchronously (in background)
-            # For now, we'll do it synchronously
-            await DocumentService.process_document(db, document)
+            # Processing (parsing, embedding, graph writes) runs in a worker
+            job_id = await job_queue.enqueue(
+                INGEST_JOB,
+                {"document_id": document.id, "user_id": user.id},
+                owner_id=user.id
+            )
             
-            return document
+            return document, job_id
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error("Document upload failed", error=str(e))
             raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
     
     @staticmethod
-    async def process_document(db: AsyncSession, document: Document):
-        """Extract text and prepare for RAG"""
+    async def upload_documents(
+        db: AsyncSession,
+        user: User,
+        files: List[UploadFile],
+        document_type: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Batch upload of files, or of zip/tar archives holding them.
+
+        Files are streamed to storage BATCH_UPLOAD_CONCURRENCY at a time
+        (an archive's members one after another), every Document row goes
+        in with one INSERT, and the ingest jobs are enqueued in pipelined
+        batches; workers then take them WORKER_CONCURRENCY at a time.
+
+        Returns one result per file, in upload order: status "queued"
+        (follow job_id like a single upload), "reused" (an identical file
+        was already processed; ready now) or "rejected" (see error).
+        """
+        max_files = settings.BATCH_UPLOAD_MAX_FILES
+        if sum(not is_archive(file.filename) for file in files) > max_files:
+            raise HTTPException(status_code=413, detail=f"Too many files (max {max_files} per batch)")
+
+        results: List[Dict[str, Any]] = []
+        stores = []
+        limit = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+
+        async def store(result: Dict[str, Any], file: UploadFile, max_size: Optional[int] = None):
+            async with limit:
+                try:
+                    result["stored"] = await save_upload_file(file, max_size=max_size)
+                except (UploadTooLarge, UnsupportedUpload) as e:
+                    result.update(status="rejected", error=str(e))
+                except (EOFError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    result.update(status="rejected", error=f"Corrupt archive member: {e}")
+
+        def add_result(filename: str) -> Dict[str, Any]:
+            result = {"filename": filename, "status": "queued", "document_id": None,
+                      "job_id": None, "error": None}
+            results.append(result)
+            return result
+
         try:
-            # Extract text based on file type
-            if document.content_type == 'pdf':
-                extracted_data = await PDFProcessor.extract_with_metadata(document.file_path)
-                document.extracted_text = extracted_data['text']
-                document.doc_metadata  = extracted_data['doc_metadata']
-                
-            elif document.content_type == 'txt':
-                with open(document.file_path, 'r', encoding='utf-8') as f:
-                    document.extracted_text = f.read()
-                document.doc_metadata  = {'char_count': len(document.extracted_text)}
-            
-            elif document.content_type == 'csv':
-                with open(document.file_path, 'r', encoding='utf-8') as f:
-                    document.extracted_text = f.read()
-                # Could parse CSV here for structured processing
-            
-            # Chunk text for RAG
-            chunks = TextChunker.chunk_by_tokens(document.extracted_text, chunk_size=500, overlap=50)
-            document.chunk_count = len(chunks)
-            
-            await VectorStore.add_document_chunks(
-            document_id=document.id,
-            chunks=chunks,
-            metadata=[{'page': i // 3 + 1} for i in range(len(chunks))]  # Approximate page numbers
+            for file in files:
+                if not is_archive(file.filename):
+                    stores.append(asyncio.create_task(store(add_result(file.filename), file)))
+                    continue
+
+                # Members share the archive stream, so they are stored in turn;
+                # the unpacked total is capped as well as each member
+                budget = settings.BATCH_UPLOAD_MAX_SIZE
+                members = iter_archive(file.file, file.filename)
+                try:
+                    while (item := await run_io(next, members, None)) is not None:
+                        name, member = item
+                        if len(results) >= max_files:
+                            add_result(file.filename).update(
+                                status="rejected",
+                                error=f"Too many files (max {max_files} per batch); the rest were skipped"
+                            )
+                            break
+                        result = add_result(name)
+                        if budget <= 0:
+                            result.update(status="rejected", error="Archive too large to unpack")
+                            continue
+                        await store(result, UploadFile(member, filename=name),
+                                    max_size=min(settings.MAX_UPLOAD_SIZE, budget))
+                        if "stored" in result:
+                            budget -= result["stored"].size
+                except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    add_result(file.filename).update(status="rejected", error=f"Unreadable archive: {e}")
+                finally:
+                    members.close()
+        finally:
+            await asyncio.gather(*stores, return_exceptions=True)
+        for task in stores:
+            task.result()  # surface unexpected storage errors
+
+        accepted = [result for result in results if "stored" in result]
+        if accepted:
+            try:
+                blob_ids = await DocumentService._acquire_blobs(
+                    db, [(r["stored"].file_hash, r["stored"].file_path) for r in accepted]
+                )
+                sources = await DocumentService._find_processed_duplicates(
+                    db, [r["stored"].file_hash for r in accepted]
+                )
+
+                documents = []
+                for result in accepted:
+                    stored: StoredFile = result.pop("stored")
+                    document = Document(
+                        user_id=user.id,
+                        title=PurePosixPath(result["filename"]).name[:255],
+                        file_path=stored.file_path,
+                        file_hash=stored.file_hash,
+                        blob_id=blob_ids[stored.file_hash],
+                        content_type=get_file_extension(result["filename"]).replace('.', ''),
+                        status=DocumentStatus.PENDING
+                    )
+                    source = sources.get(stored.file_hash)
+                    if source is not None:
+                        DocumentService._reuse_artifacts(document, source)
+                        result["status"] = "reused"
+                    documents.append(document)
+
+                # One multi-row INSERT ... RETURNING id
+                db.add_all(documents)
+                await db.flush()
+                for result, document in zip(accepted, documents):
+                    result["document_id"] = document.id
+                await db.commit()
+            except Exception as e:
+                logger.error("Batch upload failed", user_id=user.id, error=str(e))
+                raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+            queued = [result for result in accepted if result["status"] == "queued"]
+            job_ids = await job_queue.enqueue_many(
+                INGEST_JOB,
+                [{"document_id": result["document_id"], "user_id": user.id} for result in queued],
+                owner_id=user.id
+            )
+            for result, job_id in zip(queued, job_ids):
+                result["job_id"] = job_id
+
+        for result in results:
+            result.pop("stored", None)
+        logger.info("Batch uploaded", user_id=user.id, files=len(results),
+                    **Counter(result["status"] for result in results))
+        return results
+
+    # ------------------------------------------------------------------
+    # Content-addressed sharing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def _store_upload(file: UploadFile) -> StoredFile:
+        """Stream the upload into content-addressed storage (size and type checked on the way)"""
+        try:
+            return await save_upload_file(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except UnsupportedUpload as e:
+            raise HTTPException(status_code=415, detail=str(e))
+
+    @staticmethod
+    async def _acquire_blob(db: AsyncSession, file_hash: str, file_path: str) -> int:
+        """Take a reference on the stored file for a hash (creating its row); returns the blob id"""
+        blob_ids = await DocumentService._acquire_blobs(db, [(file_hash, file_path)])
+        return blob_ids[file_hash]
+
+    @staticmethod
+    async def _acquire_blobs(db: AsyncSession, files: List[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        Take one reference per (file_hash, file_path) in two statements,
+        whatever the count; returns {file_hash: blob id}
+        """
+        refs = Counter(file_hash for file_hash, _ in files)
+        paths = dict(files)
+        # Sorted, so concurrent batches lock shared rows in the same order
+        hashes = sorted(refs)
+        await db.execute(
+            insert(DocumentBlob)
+            .values([{"file_hash": h, "file_path": paths[h], "ref_count": 0} for h in hashes])
+            .on_conflict_do_nothing(index_elements=["file_hash"])
+        )
+        # Inlined (hex digests and counts), so the VALUES columns are typed
+        counts = values(
+            column("file_hash", String), column("refs", Integer), name="refs", literal_binds=True
+        ).data([(h, refs[h]) for h in hashes])
+        result = await db.execute(
+            update(DocumentBlob)
+            .where(DocumentBlob.file_hash == counts.c.file_hash)
+            .values(ref_count=DocumentBlob.ref_count + counts.c.refs)
+            .returning(DocumentBlob.file_hash, DocumentBlob.id)
+        )
+        return dict(result.all())
+
+    @staticmethod
+    async def _release_blob(db: AsyncSession, blob_id: Optional[int]) -> Optional[str]:
+        """Drop a reference; returns the file path once the last one is gone"""
+        if blob_id is None:
+            return None
+        result = await db.execute(
+            update(DocumentBlob)
+            .where(DocumentBlob.id == blob_id)
+            .values(ref_count=DocumentBlob.ref_count - 1)
+            .returning(DocumentBlob.ref_count, DocumentBlob.file_path)
+        )
+        ref_count, file_path = result.one()
+        if ref_count > 0:
+            return None
+        await db.execute(delete(DocumentBlob).where(DocumentBlob.id == blob_id))
+        return file_path
+
+    @staticmethod
+    async def _delete_orphaned_file(db: AsyncSession, file_path: Optional[str]):
+        """Delete a released file (after commit), unless an upload re-created its blob meanwhile"""
+        if file_path is None:
+            return
+        result = await db.execute(select(DocumentBlob.id).where(DocumentBlob.file_path == file_path))
+        if result.first() is None:
+            await delete_file(file_path)
+
+    @staticmethod
+    async def _find_processed_duplicate(
+        db: AsyncSession,
+        file_hash: str,
+        exclude_id: Optional[int] = None
+    ) -> Optional[Document]:
+        """A processed document (any user's) with identical file content"""
+        query = select(Document).where(
+            Document.file_hash == file_hash,
+            Document.status == DocumentStatus.COMPLETED
+        )
+        if exclude_id is not None:
+            query = query.where(Document.id != exclude_id)
+        result = await db.execute(query.order_by(Document.id).limit(1))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def _find_processed_duplicates(db: AsyncSession, file_hashes: List[str]) -> Dict[str, Document]:
+        """_find_processed_duplicate for many hashes in one query: {file_hash: document}"""
+        result = await db.execute(
+            select(Document)
+            .where(Document.file_hash.in_(set(file_hashes)), Document.status == DocumentStatus.COMPLETED)
+            .order_by(Document.id)
+        )
+        sources: Dict[str, Document] = {}
+        for document in result.scalars():
+            sources.setdefault(document.file_hash, document)
+        return sources
+
+    @staticmethod
+    def _reuse_artifacts(document: Document, source: Document):
+        """Point a duplicate at the source's vectors, keyword index and graph; copy its text"""
+        document.index_document_id, document.index_user_id = source.artifact_key
+        document.extracted_text = source.extracted_text
+        document.chunk_count = source.chunk_count
+        document.doc_metadata = source.doc_metadata
+        document.status = DocumentStatus.COMPLETED
+
+    @staticmethod
+    async def _artifact_sharers(db: AsyncSession, index_document_id: int, exclude_id: int) -> List[Document]:
+        """Other documents reading the artifacts stored under index_document_id"""
+        result = await db.execute(
+            select(Document).where(
+                Document.index_document_id == index_document_id,
+                Document.id != exclude_id
+            )
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def _reclaim_artifacts(db: AsyncSession, artifact_key: Tuple[int, int]):
+        """Delete the vectors, keyword index and graph under a key no document reads any more"""
+        index_document_id, index_user_id = artifact_key
+        result = await db.execute(
+            select(func.count()).select_from(Document).where(
+                Document.index_document_id == index_document_id
             )
+        )
+        if result.scalar_one() > 0:
+            return
 
-            if document.content_type == 'pdf' and len(document.extracted_text) > 100:
-                extraction = await EntityExtractor.extract_from_text(document.extracted_text)
-                await neo4j_service.create_document_graph(
-                    document_id=document.id,
-                    entities=extraction.get('entities', []),
-                    relationships=extraction.get('relationships', [])
+        # Its own collection, or its rows in a pooled one
+        await VectorStore.delete_document_collection(index_document_id, index_user_id)
+        await lexical_store.delete_document(index_document_id)
+        try:
+            await neo4j_service.delete_document_graph(index_document_id)
+        except Exception as e:
+            logger.warning("Graph deletion failed", index_document_id=index_document_id, error=str(e))
+        logger.info("Document artifacts reclaimed", index_document_id=index_document_id)
+
+    @staticmethod
+    async def replace_document(
+        db: AsyncSession,
+        document: Document,
+        file: UploadFile
+    ) -> Optional[str]:
+        """
+        Store a revised file for an existing document and queue its
+        re-ingestion, which only embeds the chunks that changed.
+        Returns the job id, or None when the file is identical.
+        """
+        try:
+            file_extension = get_file_extension(file.filename)
+            if file_extension not in ALLOWED_MIME_TYPES:
+                raise HTTPException(status_code=400, detail="Unsupported file type")
+            if document.status in (DocumentStatus.PENDING, DocumentStatus.PROCESSING):
+                raise HTTPException(status_code=409, detail="Document is still being processed")
+
+            file_path, file_hash, _, _ = await DocumentService._store_upload(file)
+            if file_hash == document.file_hash and document.status == DocumentStatus.COMPLETED:
+                logger.info("Re-upload unchanged", doc_id=document.id)
+                return None
+
+            blob_id = await DocumentService._acquire_blob(db, file_hash, file_path)
+            released = await DocumentService._release_blob(db, document.blob_id)
+            document.title = file.filename
+            document.file_path = file_path
+            document.file_hash = file_hash
+            document.blob_id = blob_id
+            document.content_type = file_extension.replace('.', '')
+
+            previous_key = document.artifact_key
+            source = await DocumentService._find_processed_duplicate(db, file_hash, exclude_id=document.id)
+            requeue: List[Document] = []
+            if source is not None:
+                DocumentService._reuse_artifacts(document, source)
+            else:
+                # Re-ingested in place (under its own id); duplicates that
+                # share the current artifacts would change with it, so they
+                # are processed on their own
+                if previous_key == (document.id, document.user_id):
+                    requeue = await DocumentService._artifact_sharers(db, previous_key[0], document.id)
+                    for sharer in requeue:
+                        sharer.index_document_id = None
+                        sharer.index_user_id = None
+                        sharer.status = DocumentStatus.PENDING
+                document.status = DocumentStatus.PENDING
+
+            await db.commit()
+            await db.refresh(document)
+            await DocumentService._delete_orphaned_file(db, released)
+            if source is not None:
+                await DocumentService._reclaim_artifacts(db, previous_key)
+                logger.info("Re-upload reused a processed duplicate", doc_id=document.id,
+                            source_doc_id=source.id)
+                return None
+
+            logger.info("Document re-uploaded", doc_id=document.id, user_id=document.user_id,
+                        requeued_duplicates=len(requeue))
+
+            for sharer in requeue:
+                await job_queue.enqueue(
+                    INGEST_JOB,
+                    {"document_id": sharer.id, "user_id": sharer.user_id},
+                    owner_id=sharer.user_id
                 )
+            return await job_queue.enqueue(
+                INGEST_JOB,
+                {"document_id": document.id, "user_id": document.user_id},
+                owner_id=document.user_id
+            )
 
-            # Update status
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error("Document re-upload failed", doc_id=document.id, error=str(e))
+            raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+    @staticmethod
+    async def process_document(
+        db: AsyncSession,
+        document: Document,
+        progress: Optional[ProgressCallback] = None
+    ):
+        """
+        Extract text and prepare for RAG (see services.ingest_pipeline).
+        Safe to re-run after a failure: vector writes are upserts and graph writes MERGE.
+        Re-running on a revised file only embeds the chunks that changed.
+        """
+        async def report(stage: str, percent: int, message: str):
+            if progress is not None:
+                await progress(stage, percent, message)
+
+        try:
+            document.status = DocumentStatus.PROCESSING
+            await db.commit()
+
+            # Stream pages through chunking, embedding and upserts
+            await report("extracting", 10, "Extracting text...")
+            if document.content_type == 'pdf':
+                info = await PDFProcessor.read_info(document.file_path)
+                pipeline = IngestPipeline(
+                    document.id,
+                    document.user_id,
+                    total_pages=info['num_pages'],
+                    extract_entities=True,
+                    progress=progress
+                )
+                result = await pipeline.run(PDFProcessor.iter_pages(document.file_path, info['num_pages']))
+                document.doc_metadata = {**info, 'total_chars': len(result.text)}
+
+            else:
+                # txt / csv: fixed-size blocks of one "page"
+                async def blocks():
+                    async for block in iter_text_blocks(document.file_path, settings.INGEST_TEXT_BLOCK_CHARS):
+                        yield PageRecord(1, block, "text")
+
+                pipeline = IngestPipeline(
+                    document.id,
+                    document.user_id,
+                    page_separator="",
+                    progress=progress
+                )
+                result = await pipeline.run(blocks())
+                if document.content_type == 'txt':
+                    document.doc_metadata = {'char_count': len(result.text)}
+                # Could parse CSV here for structured processing
+
+            document.extracted_text = result.text
+            document.chunk_count = result.chunk_count
+
+            # Update status; the document now reads its own artifacts
+            previous_key = document.artifact_key
+            document.index_document_id = document.id
+            document.index_user_id = document.user_id
             document.status = DocumentStatus.COMPLETED
             
             await db.commit()
             await db.refresh(document)
+            await DocumentService._reclaim_artifacts(db, previous_key)
             
-            logger.info("Document processed", doc_id=document.id, chunks=len(chunks))
-            
-            # Store chunks for later use (we'll implement vector storage in Phase 3)
-            await cache_set(f"doc_chunks:{document.id}", chunks, expire=86400)  # 24 hours
-            
+            logger.info("Document processed", doc_id=document.id, chunks=result.chunk_count)
+
         except Exception as e:
             document.status = DocumentStatus.FAILED
             await db.commit()
@@ -149,16 +553,38 @@ class DocumentService:
             raise
     
     @staticmethod
-    async def get_document_by_id(db: AsyncSession, document_id: int, user: User) -> Optional[Document]:
-        """Get specific document"""
-        result = await db.execute(
-            select(Document).where(
-                Document.id == document_id,
-                Document.user_id == user.id
-            )
+    async def get_document_by_id(
+        db: AsyncSession,
+        document_id: int,
+        user: User,
+        load_text: bool = True
+    ) -> Optional[Document]:
+        """Get specific document (load_text=False skips the extracted_text column)"""
+        query = select(Document).where(
+            Document.id == document_id,
+            Document.user_id == user.id
         )
+        if not load_text:
+            query = query.options(defer(Document.extracted_text))
+        result = await db.execute(query)
         return result.scalar_one_or_none()
     
+    @staticmethod
+    async def get_completed_documents(
+        db: AsyncSession,
+        user: User,
+        document_ids: Optional[List[int]] = None
+    ) -> List[Document]:
+        """Get a user's processed documents (all, or only the given ids)"""
+        query = select(Document).where(
+            Document.user_id == user.id,
+            Document.status == DocumentStatus.COMPLETED
+        )
+        if document_ids is not None:
+            query = query.where(Document.id.in_(document_ids))
+        result = await db.execute(query.order_by(Document.id))
+        return list(result.scalars().all())
+    
     @staticmethod
     async def delete_document(db: AsyncSession, document_id: int, user: User):
         """Delete document"""
@@ -168,16 +594,21 @@ class DocumentService:
             if not document:
                 raise HTTPException(status_code=404, detail="Document not found")
             
-            # Delete file from disk
-            await delete_file(document.file_path)
-            
-            # Delete from database
+            # Delete from database, dropping its reference to the stored file
+            artifact_key = document.artifact_key
+            blob_id, file_path = document.blob_id, document.file_path
+            released = await DocumentService._release_blob(db, blob_id)
             await db.delete(document)
             await db.commit()
+
+            # Shared file and artifacts go with their last reference
+            if blob_id is None:
+                await delete_file(file_path)
+            await DocumentService._delete_orphaned_file(db, released)
+            await DocumentService._reclaim_artifacts(db, artifact_key)
             
             # Clear cache
             await cache_delete(f"user_docs:{user.id}")
-            await cache_delete(f"doc_chunks:{document_id}")
             
             logger.info("Document deleted", doc_id=document_id)
             
@@ -0,0 +1,157 @@
+"""
+Embedding Backends
+Pluggable text -> vector implementations, selected with EMBEDDING_BACKEND
+
+- openai: remote API (batched, retried)
+- local: feature-hashing projection, pure NumPy on CPU, no network, no model files
+- sentence-transformers: small transformer model loaded once per process (optional dependency)
+
+Switching backend changes the vector space: re-ingest documents afterwards.
+"""
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List
+import re
+import zlib
+
+import numpy as np
+from openai import AsyncOpenAI
+from core.config import settings
+from core.executors import run_io
+from services.embedding_batcher import EmbeddingBatcher
+import structlog
+
+logger = structlog.get_logger()
+
+# Above this many texts, CPU-bound backends run off the event loop
+# (NumPy and torch release the GIL, so the thread pool is enough)
+INLINE_BATCH_LIMIT = 32
+
+
+class EmbeddingBackend(ABC):
+    """Interface for embedding providers"""
+
+    # Identifies the vector space; used to namespace cached vectors
+    name: str = ""
+
+    # Remote backends cost money and latency, so their vectors are cached
+    remote: bool = False
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning one vector per input in input order"""
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """OpenAI embeddings API"""
+
+    remote = True
+
+    def __init__(self, model: str, api_key: str):
+        self.name = model
+        self.batcher = EmbeddingBatcher(
+            # The batcher retries with its own backoff; SDK retries would stack on top
+            client=AsyncOpenAI(api_key=api_key, max_retries=0),
+            model=model,
+            max_items=settings.EMBEDDING_BATCH_MAX_ITEMS,
+            max_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+            concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES
+        )
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return await self.batcher.embed(texts)
+
+
+@lru_cache(maxsize=200_000)
+def _signed_bucket(dimension: int, feature: str) -> int:
+    """Signed column of a hashed feature: +(col + 1) or -(col + 1)"""
+    h = zlib.crc32(feature.encode("utf-8"))
+    column = h % dimension
+    return column + 1 if h & 0x80000000 else -(column + 1)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Signed feature hashing of word unigrams and bigrams.
+
+    Each feature is hashed (crc32, stable across processes) to a column and
+    a sign; counts are log-scaled and rows L2-normalised, so cosine distance
+    behaves like TF similarity. Lexical rather than semantic, but needs
+    no network and embeds a query in well under a millisecond.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def _features(self, text: str) -> List[str]:
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens + bigrams
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch into a float32 matrix (rows L2-normalised)"""
+        rows, buckets = [], []
+        for row, text in enumerate(texts):
+            signed = [_signed_bucket(self.dimension, feature) for feature in self._features(text)]
+            rows.extend([row] * len(signed))
+            buckets.extend(signed)
+
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if buckets:
+            buckets = np.asarray(buckets, dtype=np.int64)
+            columns = np.abs(buckets) - 1
+            signs = np.sign(buckets).astype(np.float32)
+            np.add.at(matrix, (np.asarray(rows), columns), signs)
+
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) <= INLINE_BATCH_LIMIT:
+            return self.embed_sync(texts).tolist()
+        return (await run_io(self.embed_sync, texts)).tolist()
+
+
+class SentenceTransformerEmbeddingBackend(EmbeddingBackend):
+    """Local transformer model (e.g. all-MiniLM-L6-v2), loaded once per process"""
+
+    def __init__(self, model_name: str):
+        # Optional dependency: only required when this backend is selected
+        from sentence_transformers import SentenceTransformer
+
+        self.name = f"st-{model_name}"
+        self.model = SentenceTransformer(model_name, device="cpu")
+        logger.info("Local embedding model loaded", model=model_name)
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return (await run_io(self.embed_sync, texts)).tolist()
+
+
+@lru_cache(maxsize=1)
+def get_embedding_backend() -> EmbeddingBackend:
+    """Build the configured backend once per process"""
+    backend = settings.EMBEDDING_BACKEND
+
+    if backend == "openai":
+        return OpenAIEmbeddingBackend(settings.EMBEDDING_MODEL, settings.OPENAI_API_KEY)
+    if backend == "local":
+        return HashingEmbeddingBackend(settings.LOCAL_EMBEDDING_DIM)
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbeddingBackend(settings.LOCAL_EMBEDDING_MODEL)
+
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
@@ -0,0 +1,113 @@
+"""
+Embedding Batcher
+Splits large embedding jobs into provider-sized requests and runs them concurrently
+
+- Batches are bounded by item count and by token budget
+- Requests run in parallel under a shared semaphore
+- 429/5xx responses are retried with backoff and jitter
+- Results come back in the original input order
+"""
+
+from typing import List
+import asyncio
+import time
+
+from openai import AsyncOpenAI
+from prometheus_client import Counter, Histogram
+from services.openai_retry import with_openai_retries
+from services.tokenizer import count_tokens
+import structlog
+
+logger = structlog.get_logger()
+
+EMBEDDING_REQUESTS = Counter(
+    'embedding_provider_requests_total',
+    'Embedding requests sent to the provider'
+)
+
+EMBEDDING_REQUEST_DURATION = Histogram(
+    'embedding_provider_request_duration_seconds',
+    'Embedding provider request duration (including retries)'
+)
+
+
+class EmbeddingBatcher:
+    """Token-aware, concurrent embedding requests"""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        max_items: int = 2048,
+        max_tokens: int = 100_000,
+        concurrency: int = 4,
+        max_retries: int = 5
+    ):
+        self.client = client
+        self.model = model
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        # Shared by every caller so concurrent uploads respect one limit
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def plan_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group input indices into batches that respect both limits.
+        An input larger than the token budget gets a batch of its own.
+        """
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = count_tokens(text)
+            if current and (
+                len(current) >= self.max_items
+                or current_tokens + tokens > self.max_tokens
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """Embed one batch, holding a concurrency slot for its duration"""
+        async with self._semaphore:
+            start = time.perf_counter()
+            response = await with_openai_retries(
+                lambda: self.client.embeddings.create(model=self.model, input=batch),
+                operation="embeddings",
+                max_retries=self.max_retries
+            )
+            EMBEDDING_REQUESTS.inc()
+            EMBEDDING_REQUEST_DURATION.observe(time.perf_counter() - start)
+
+        # The API returns items with their input index; don't rely on ordering
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return [item.embedding for item in ordered]
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed all texts, returning vectors in input order"""
+        if not texts:
+            return []
+
+        batches = self.plan_batches(texts)
+        results = await asyncio.gather(*[
+            self._embed_batch([texts[i] for i in batch]) for batch in batches
+        ])
+
+        embeddings: List[List[float]] = [None] * len(texts)
+        for batch, vectors in zip(batches, results):
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+
+        if len(batches) > 1:
+            logger.info("Embedding batches completed",
+                       inputs=len(texts),
+                       batches=len(batches))
+        return embeddings
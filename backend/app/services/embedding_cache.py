@@ -0,0 +1,194 @@
+"""
+Embedding Cache
+Content-addressed cache for embedding vectors
+
+Two tiers, both keyed by (model, sha256(text)):
+1. In-process LRU: repeated questions and boilerplate chunks never leave the worker
+2. Redis: shared across workers, vectors stored as packed float32 bytes (not JSON)
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+import hashlib
+
+import numpy as np
+from prometheus_client import Counter
+from core.config import settings
+from core.redis_client import get_redis_binary
+import structlog
+
+logger = structlog.get_logger()
+
+# Metrics
+EMBEDDING_CACHE_HITS = Counter(
+    'embedding_cache_hits_total',
+    'Embedding cache hits',
+    ['tier']  # tier: memory/redis
+)
+
+EMBEDDING_CACHE_MISSES = Counter(
+    'embedding_cache_misses_total',
+    'Embedding cache misses (texts sent to the provider)'
+)
+
+EMBEDDING_CACHE_BYTES = Counter(
+    'embedding_cache_bytes_total',
+    'Vector bytes moved between the cache and Redis',
+    ['direction']  # direction: read/write
+)
+
+EMBEDDING_CACHE_SAVED_USD = Counter(
+    'embedding_cache_saved_usd_total',
+    'Estimated embedding spend avoided by cache hits'
+)
+
+# Vectors are stored little-endian so workers on any platform can share them
+VECTOR_DTYPE = np.dtype('<f4')
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """Build the content-addressed key for a text under a given model"""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"emb:{model}:{digest}"
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """Pack a vector as raw float32 bytes"""
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack_vector(data: bytes) -> np.ndarray:
+    """Unpack raw float32 bytes into a vector"""
+    return np.frombuffer(data, dtype=VECTOR_DTYPE)
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + Redis) embedding cache"""
+
+    def __init__(self, max_items: int = 5000, ttl: int = 30 * 24 * 3600):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._stats = {
+            'memory_hits': 0,
+            'redis_hits': 0,
+            'misses': 0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+            'saved_tokens': 0,
+            'saved_usd': 0.0,
+        }
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the LRU tier, evicting the least recently used entry"""
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def _record_saving(self, text: str):
+        """Account for a provider call avoided (1 token ≈ 4 characters)"""
+        tokens = max(1, len(text) // 4)
+        usd = (tokens / 1000) * settings.EMBEDDING_COST_PER_1K_TOKENS
+        self._stats['saved_tokens'] += tokens
+        self._stats['saved_usd'] += usd
+        EMBEDDING_CACHE_SAVED_USD.inc(usd)
+
+    async def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for texts.
+        Returns a list aligned with texts; None marks a miss.
+        """
+        keys = [embedding_cache_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        # Tier 1: in-process LRU
+        pending = []
+        for i, key in enumerate(keys):
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                results[i] = vector.tolist()
+                self._stats['memory_hits'] += 1
+                EMBEDDING_CACHE_HITS.labels(tier="memory").inc()
+                self._record_saving(texts[i])
+            else:
+                pending.append(i)
+
+        # Tier 2: Redis (single MGET round-trip for all LRU misses)
+        redis = await get_redis_binary()
+        if pending and redis is not None:
+            try:
+                values = await redis.mget([keys[i] for i in pending])
+            except Exception as e:
+                logger.error("Embedding cache read failed", error=str(e))
+                values = [None] * len(pending)
+
+            still_pending = []
+            for i, value in zip(pending, values):
+                if value is None:
+                    still_pending.append(i)
+                    continue
+                vector = unpack_vector(value)
+                self._remember(keys[i], vector)
+                results[i] = vector.tolist()
+                self._stats['redis_hits'] += 1
+                self._stats['bytes_read'] += len(value)
+                EMBEDDING_CACHE_HITS.labels(tier="redis").inc()
+                EMBEDDING_CACHE_BYTES.labels(direction="read").inc(len(value))
+                self._record_saving(texts[i])
+            pending = still_pending
+
+        self._stats['misses'] += len(pending)
+        EMBEDDING_CACHE_MISSES.inc(len(pending))
+        return results
+
+    async def set_many(self, model: str, embeddings: Dict[str, List[float]]):
+        """Store freshly computed embeddings (text -> vector) in both tiers"""
+        if not embeddings:
+            return
+
+        packed = {}
+        for text, embedding in embeddings.items():
+            key = embedding_cache_key(model, text)
+            vector = np.asarray(embedding, dtype=VECTOR_DTYPE)
+            self._remember(key, vector)
+            packed[key] = vector.tobytes()
+
+        redis = await get_redis_binary()
+        if redis is None:
+            return
+
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for key, value in packed.items():
+                    pipe.setex(key, self.ttl, value)
+                await pipe.execute()
+
+            written = sum(len(value) for value in packed.values())
+            self._stats['bytes_written'] += written
+            EMBEDDING_CACHE_BYTES.labels(direction="write").inc(written)
+        except Exception as e:
+            logger.error("Embedding cache write failed", error=str(e))
+
+    def stats(self) -> Dict:
+        """Snapshot of cache counters for this process"""
+        hits = self._stats['memory_hits'] + self._stats['redis_hits']
+        lookups = hits + self._stats['misses']
+        return {
+            **self._stats,
+            'saved_usd': round(self._stats['saved_usd'], 6),
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_items': len(self._lru),
+        }
+
+    def clear(self):
+        """Drop the in-process tier (Redis entries expire on their own)"""
+        self._lru.clear()
+
+
+# Global instance
+embedding_cache = EmbeddingCache(
+    max_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+    ttl=settings.EMBEDDING_CACHE_TTL
+)
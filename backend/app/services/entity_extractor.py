@@ -1,29 +1,66 @@
 """
 Entity and Relationship Extraction using OpenAI
+
+- ChunkExtraction runs the extractor over every chunk of a document,
+  ENTITY_EXTRACTION_CONCURRENCY calls at a time, as chunks are produced;
+  rate limits and server errors are retried with backoff
+- ENTITY_EXTRACTION_MODE=local uses the rule-based local extractor instead
+  (batches of chunks on the CPU pool, no calls); hybrid runs it on every
+  chunk and calls the LLM only for chunks where it finds new entities
+- Results are merged across chunks by normalised name (case, spacing and
+  edge punctuation ignored); every entity and relationship keeps the ids
+  of the chunks it was found in
 """
 
-from typing import List, Dict
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
 from openai import AsyncOpenAI
+from prometheus_client import Counter as MetricCounter
 from core.config import settings
+from core.executors import run_cpu
+from services.local_entity_extractor import extract_batch
+from services.openai_retry import with_openai_retries
+import asyncio
 import json
 import structlog
 
 logger = structlog.get_logger()
 
-openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+# with_openai_retries does the retrying; SDK retries would stack on top
+openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+
+ENTITY_EXTRACTION_CALLS = MetricCounter(
+    'entity_extraction_calls_total',
+    'Entity extraction calls, by chunk',
+    ['extractor', 'outcome']  # extractor: llm/local, outcome: ok/failed
+)
+
+EXTRACTION_MODES = ("llm", "local", "hybrid")
+
+# Local batches up to this many chunks run on the event loop; the process
+# pool round-trip costs more than extracting them
+LOCAL_INLINE_LIMIT = 8
+
+
+def normalize_name(name: str) -> str:
+    """Key that spellings of the same entity share"""
+    return " ".join(name.casefold().split()).strip(".,;:!?'\"()[]")
 
 
 class EntityExtractor:
     """Extract entities and relationships from text"""
-    
+
+    # Longest text sent in one call, to stay within token limits
+    MAX_INPUT_CHARS = 3000
+
     @staticmethod
     async def extract_from_text(text: str) -> Dict:
         """Extract entities and relationships using GPT-4"""
-        
+
         prompt = f"""Extract entities and relationships from the following text.
 
 Text:
-{text[:3000]}  # Limit to avoid token limits
+{text[:EntityExtractor.MAX_INPUT_CHARS]}
 
 Return a JSON object with:
 1. "entities": list of objects with "name" and "type" (Person, Organization, Location, Concept, etc.)
@@ -42,20 +79,188 @@ Example:
 
 Only return valid JSON, no other text."""
 
-        response = await openai_client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": "You are an expert at extracting structured information from text."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            response_format={"type": "json_object"}
+        response = await with_openai_retries(
+            lambda: openai_client.chat.completions.create(
+                model="gpt-4-turbo-preview",
+                messages=[
+                    {"role": "system", "content": "You are an expert at extracting structured information from text."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            ),
+            operation="entity_extraction"
         )
-        
+
         result = json.loads(response.choices[0].message.content)
-        
-        logger.info("Entities extracted", 
+
+        logger.info("Entities extracted",
                    entities=len(result.get('entities', [])),
                    relationships=len(result.get('relationships', [])))
-        
-        return result
\ No newline at end of file
+
+        return result
+
+
+def merge_extractions(extractions: List[Tuple[str, Dict]]) -> Dict:
+    """
+    Merge (chunk_id, extraction) results into one deduplicated extraction.
+
+    Entities sharing a normalised name are one entity: the first spelling
+    is kept, with the type most chunks gave it. Relationship endpoints are
+    mapped onto those names; relationships are unique per (from, to, type).
+    """
+    spellings: Dict[str, str] = {}
+    types: Dict[str, Counter] = {}
+    entity_chunks: Dict[str, List[str]] = {}
+    relationships: Dict[Tuple[str, str, str], Dict] = {}
+
+    def add_chunk(chunk_ids: List[str], chunk_id: str):
+        if chunk_id not in chunk_ids:
+            chunk_ids.append(chunk_id)
+
+    for chunk_id, extraction in extractions:
+        for entity in extraction.get('entities', []):
+            name, entity_type = entity.get('name'), entity.get('type')
+            if not isinstance(name, str) or not isinstance(entity_type, str):
+                continue
+            key = normalize_name(name)
+            if not key:
+                continue
+            spellings.setdefault(key, name.strip())
+            types.setdefault(key, Counter())[entity_type] += 1
+            add_chunk(entity_chunks.setdefault(key, []), chunk_id)
+
+    for chunk_id, extraction in extractions:
+        for rel in extraction.get('relationships', []):
+            source, target, rel_type = rel.get('from'), rel.get('to'), rel.get('type')
+            if not all(isinstance(value, str) for value in (source, target, rel_type)):
+                continue
+            source_key, target_key = normalize_name(source), normalize_name(target)
+            if not source_key or not target_key:
+                continue
+            key = (source_key, target_key, rel_type.strip().upper())
+            merged = relationships.get(key)
+            if merged is None:
+                merged = relationships[key] = {
+                    'from': spellings.get(source_key, source.strip()),
+                    'to': spellings.get(target_key, target.strip()),
+                    'type': key[2],
+                    'chunk_ids': []
+                }
+            add_chunk(merged['chunk_ids'], chunk_id)
+
+    return {
+        'entities': [
+            {'name': spellings[key], 'type': types[key].most_common(1)[0][0], 'chunk_ids': entity_chunks[key]}
+            for key in spellings
+        ],
+        'relationships': list(relationships.values())
+    }
+
+
+class ChunkExtraction:
+    """
+    One document's chunk-wise extraction: chunks are submitted as they are
+    produced and extracted concurrently (bounded); result() merges them
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, mode: Optional[str] = None):
+        self.mode = mode or settings.ENTITY_EXTRACTION_MODE
+        if self.mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown ENTITY_EXTRACTION_MODE: {self.mode}")
+        self._limit = asyncio.Semaphore(concurrency or settings.ENTITY_EXTRACTION_CONCURRENCY)
+        self._tasks: List[asyncio.Task] = []
+        self._pending: List[Tuple[str, str]] = []  # chunks waiting for a local batch
+        self._seen: Set[str] = set()  # normalised names local extraction has found (hybrid)
+        self._submitted = 0
+
+    def __len__(self) -> int:
+        return self._submitted
+
+    def submit(self, chunk_id: str, text: str):
+        self._submitted += 1
+        if self.mode == "llm":
+            self._tasks.append(asyncio.create_task(self._extract(chunk_id, text)))
+            return
+        self._pending.append((chunk_id, text))
+        if len(self._pending) >= settings.ENTITY_LOCAL_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._tasks.append(asyncio.create_task(self._extract_local(self._pending)))
+            self._pending = []
+
+    async def _extract(self, chunk_id: str, text: str) -> List[Tuple[str, Dict]]:
+        async with self._limit:
+            try:
+                extraction = await EntityExtractor.extract_from_text(text)
+            except Exception:
+                ENTITY_EXTRACTION_CALLS.labels(extractor="llm", outcome="failed").inc()
+                raise
+        ENTITY_EXTRACTION_CALLS.labels(extractor="llm", outcome="ok").inc()
+        return [(chunk_id, extraction)]
+
+    async def _extract_local(self, batch: List[Tuple[str, str]]) -> List[Tuple[str, Dict]]:
+        texts = [text for _, text in batch]
+        if len(texts) <= LOCAL_INLINE_LIMIT:
+            extractions = extract_batch(texts, settings.ENTITY_GAZETTEER_PATH)
+        else:
+            extractions = await run_cpu(extract_batch, texts, settings.ENTITY_GAZETTEER_PATH)
+        ENTITY_EXTRACTION_CALLS.labels(extractor="local", outcome="ok").inc(len(batch))
+        results = [(chunk_id, extraction) for (chunk_id, _), extraction in zip(batch, extractions)]
+        if self.mode != "hybrid":
+            return results
+
+        # Chunks introducing entities are where the LLM's types and typed
+        # relationships pay off; chunks re-mentioning known ones keep their
+        # co-occurrence edges. LLM results go first so their spellings (and
+        # types, on ties) win the merge
+        novel = []
+        for index, (_, extraction) in enumerate(results):
+            names = {normalize_name(entity['name']) for entity in extraction['entities']}
+            if len(names - self._seen) >= settings.ENTITY_HYBRID_MIN_NEW_ENTITIES:
+                novel.append(index)
+            self._seen |= names
+        outcomes = await asyncio.gather(
+            *(self._extract(*batch[index]) for index in novel), return_exceptions=True
+        )
+        llm_results = []
+        for index, outcome in zip(novel, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.warning("LLM extraction failed, keeping local entities",
+                               chunk_id=batch[index][0], error=str(outcome))
+                continue
+            llm_results.extend(outcome)
+        return llm_results + results
+
+    async def result(self) -> Dict:
+        """
+        Merged extraction of every submitted chunk. Chunks that still fail
+        after retries are left out (logged); raises if all of them failed.
+        """
+        self._flush()
+        outcomes = await asyncio.gather(*self._tasks, return_exceptions=True)
+        extractions = [
+            extraction for outcome in outcomes if not isinstance(outcome, BaseException)
+            for extraction in outcome
+        ]
+        failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if failures:
+            if not extractions:
+                raise failures[0]
+            logger.warning("Entity extraction failed for some chunks",
+                           failed=len(failures), tasks=len(outcomes), error=str(failures[0]))
+
+        merged = merge_extractions(extractions)
+        logger.info("Entities merged",
+                    mode=self.mode,
+                    chunks=self._submitted,
+                    entities=len(merged['entities']),
+                    relationships=len(merged['relationships']))
+        return merged
+
+    def cancel(self):
+        self._pending = []
+        for task in self._tasks:
+            task.cancel()
@@ -0,0 +1,149 @@
+"""
+Entity Matcher
+Finds a document's entity names in a question, to seed graph queries
+
+- Aho-Corasick automaton over the normalised names: every mention in one
+  pass over the text, however many names the document has
+- Matches respect word boundaries ("pump" is not found in "pumping")
+- Matchers are cached per document (bounded LRU with a TTL); the process
+  writing a graph refreshes its entry, others drop theirs when ingestion
+  completes or the TTL runs out
+"""
+
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import threading
+import time
+
+from prometheus_client import Counter
+
+ENTITY_MATCHER_CACHE_LOOKUPS = Counter(
+    'entity_matcher_cache_lookups_total',
+    'Entity matcher cache lookups',
+    ['result']  # result: hit/miss
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, with whitespace runs collapsed to single spaces"""
+    return " ".join(text.lower().split())
+
+
+class EntityMatcher:
+    """Aho-Corasick automaton over entity names"""
+
+    def __init__(self, names: Iterable[str], min_chars: int = 2):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]  # keys ending at a state (through fail links too)
+        self._keys: List[str] = []
+        self._names: List[List[str]] = []  # original spellings per key
+
+        index: Dict[str, int] = {}
+        for name in names:
+            key = normalize(name)
+            if len(key) < min_chars:
+                continue
+            if key in index:
+                if name not in self._names[index[key]]:
+                    self._names[index[key]].append(name)
+                continue
+            index[key] = len(self._keys)
+            self._keys.append(key)
+            self._names.append([name])
+            self._insert(key, index[key])
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _insert(self, key: str, key_id: int):
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(key_id)
+
+    def _link(self):
+        # Breadth-first: a state's fail link points to its longest proper
+        # suffix that is also a prefix of some key
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state].extend(self._out[self._fail[next_state]])
+
+    def find(self, text: str) -> List[str]:
+        """
+        Entity names mentioned in text (original spellings), longest
+        mentions first, then by position
+        """
+        text = normalize(text)
+        first_seen: Dict[int, int] = {}
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for key_id in self._out[state]:
+                start = end - len(self._keys[key_id])
+                if key_id in first_seen:
+                    continue
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if end < len(text) and text[end].isalnum():
+                    continue
+                first_seen[key_id] = start
+
+        ordered = sorted(first_seen, key=lambda key_id: (-len(self._keys[key_id]), first_seen[key_id]))
+        return [name for key_id in ordered for name in self._names[key_id]]
+
+
+class EntityMatcherCache:
+    """TTL'd, bounded LRU of matchers keyed by document"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[EntityMatcher, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[EntityMatcher]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                ENTITY_MATCHER_CACHE_LOOKUPS.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(key)
+            ENTITY_MATCHER_CACHE_LOOKUPS.labels(result="hit").inc()
+            return entry[0]
+
+    def put(self, key: Hashable, matcher: EntityMatcher):
+        with self._lock:
+            self._entries[key] = (matcher, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
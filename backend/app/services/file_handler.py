@@ -5,13 +5,13 @@ import aiofiles
 from fastapi import UploadFile, HTTPException
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import OpenAIEmbeddings
 from app.models.document import Document
 from app.core.database import get_db
+from app.services.embedding_backend import get_embedding_backend
 
 class FileProcessor:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings()
+        self.embeddings = get_embedding_backend()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200
@@ -61,7 +61,7 @@ class FileProcessor:
             chunks = self.text_splitter.split_text(text)
             
             # Generate embeddings
-            embeddings = self.embeddings.embed_documents(chunks)
+            embeddings = await self.embeddings.embed(chunks)
             
             # Store in vector database
             await self.store_in_vectordb(document.id, chunks, embeddings)
@@ -0,0 +1,425 @@
+"""
+Ingestion Pipeline
+Streams a document through async stages connected by bounded queues
+
+    pages -> chunks -> embedding batches -> vector upserts
+             chunks -> entity extraction (concurrent) -> merge -> graph write
+
+- Embedding starts on the first pages while later pages are still being
+  parsed; end-to-end time tends to the slowest stage, not the sum
+- Bounded queues give backpressure: a slow embedding provider pauses page
+  parsing instead of buffering the whole document's vectors
+- Page text and chunks are written through to a temporary spool as they
+  pass and dropped: the lexical index is built from the spooled chunks in
+  a worker process, and the text is read back once at the end for
+  document.extracted_text; embeddings are released batch by batch
+- Re-ingestion is incremental: chunk ids are content hashes, so only
+  chunks not already stored for the document are embedded and written;
+  stored chunks that moved get new metadata, vanished ones are deleted
+"""
+
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from prometheus_client import Counter, Histogram
+from core.config import settings
+from services.entity_extractor import ChunkExtraction
+from services.lexical_index import lexical_store
+from services.neo4j_service import neo4j_service
+from services.chunker import Chunk, StreamingTokenChunker, TokenChunker
+from services.pdf_processor import PageRecord
+from services.vector_store import VectorStore
+from core.executors import run_io
+import structlog
+
+logger = structlog.get_logger()
+
+INGEST_STAGE_SECONDS = Histogram(
+    'ingest_stage_seconds',
+    'Time each ingestion stage spent working on one document (excludes queue waits)',
+    ['stage'],  # stage: read/chunk/embed/write/entities/index
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+INGEST_CHUNKS = Counter(
+    'ingest_chunks_total',
+    'Chunks per outcome when (re-)ingesting documents',
+    ['outcome']  # embedded / reused / deleted
+)
+
+# Stands in for the next page / batch once a stage's input is exhausted
+_DONE = object()
+
+# progress(stage, percent, message)
+ProgressCallback = Callable[[str, int, str], Awaitable[None]]
+
+# Minimum chunk text before entity extraction is worth a model call
+MIN_ENTITY_TEXT = 100
+
+
+@dataclass
+class IngestResult:
+    text: str
+    pages: int
+    chunk_count: int
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    chunks_deleted: int = 0
+
+
+@dataclass
+class _Batch:
+    # Chunks not stored yet (local content ids)
+    ids: List[str] = field(default_factory=list)
+    chunks: List[str] = field(default_factory=list)
+    metadatas: List[Dict] = field(default_factory=list)
+    embeddings: Optional[List[List[float]]] = None
+
+
+class _Spool:
+    """
+    Temporary files for a run's page text and chunks (one JSON line per
+    chunk, the format build_index_from_spool reads); blocking calls go
+    through run_io
+    """
+
+    def __init__(self):
+        self.text = tempfile.TemporaryFile("w+", encoding="utf-8")
+        fd, self.chunks_path = tempfile.mkstemp(prefix="ingest-", suffix=".jsonl")
+        self.chunks = os.fdopen(fd, "w", encoding="utf-8")
+
+    def write_text(self, text: str):
+        self.text.write(text)
+
+    def write_chunks(self, rows: List[Tuple[str, Dict]]):
+        for text, metadata in rows:
+            self.chunks.write(json.dumps({"text": text, "metadata": metadata}) + "\n")
+
+    def finish_chunks(self):
+        self.chunks.close()
+
+    def read_text(self) -> str:
+        self.text.seek(0)
+        return self.text.read()
+
+    def close(self):
+        self.text.close()
+        self.chunks.close()
+        try:
+            os.unlink(self.chunks_path)
+        except FileNotFoundError:
+            pass
+
+
+class IngestPipeline:
+    """One document's ingestion run"""
+
+    def __init__(
+        self,
+        document_id: int,
+        user_id: Optional[int] = None,
+        total_pages: Optional[int] = None,
+        extract_entities: bool = False,
+        page_separator: str = "\n\n",
+        progress: Optional[ProgressCallback] = None,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        embed_batch_size: Optional[int] = None,
+        embed_workers: Optional[int] = None
+    ):
+        self.document_id = document_id
+        self.user_id = user_id
+        self.total_pages = total_pages
+        self.extract_entities = extract_entities
+        self.page_separator = page_separator
+        self.progress = progress
+        self.chunker = StreamingTokenChunker(TokenChunker(
+            chunk_size=chunk_size or settings.CHUNK_SIZE_TOKENS,
+            overlap=overlap if overlap is not None else settings.CHUNK_OVERLAP_TOKENS
+        ))
+
+        queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+        self.embed_batch_size = embed_batch_size or settings.INGEST_EMBED_BATCH_SIZE
+        self.embed_workers = embed_workers or settings.INGEST_EMBED_WORKERS
+        self.pages: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.batches: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.embedded: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        self._spool: Optional[_Spool] = None
+        self._rows: List[Tuple[str, Dict]] = []  # chunks not spooled yet
+        self.chunk_count = 0
+        self.pages_read = 0
+        self.chunks_written = 0
+        self.chunks_reused = 0
+        self.stored: Dict[str, Dict] = {}  # id -> metadata of chunks already indexed
+        self._seen_ids: Set[str] = set()
+        self._occurrences: Dict[bytes, int] = {}  # sha256(text) -> times seen
+        self._open = _Batch()
+        # Stored chunks whose position changed: only their metadata is rewritten
+        self._moved_ids: List[str] = []
+        self._moved_metadatas: List[Dict] = []
+        self.stage_seconds: Dict[str, float] = {}
+        # Every chunk is extracted, concurrently with the rest of the pipeline
+        self._extraction: Optional[ChunkExtraction] = ChunkExtraction() if extract_entities else None
+        self._entity_task: Optional[asyncio.Task] = None
+        self._reported = -1
+
+    def _busy(self, stage: str, started: float):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + time.perf_counter() - started
+
+    async def _report(self, stage: str, percent: int, message: str):
+        if self.progress is not None and percent != self._reported:
+            self._reported = percent
+            await self.progress(stage, percent, message)
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    async def _read(self, source: AsyncIterator[PageRecord]):
+        """Pull pages from the source"""
+        iterator = source.__aiter__()
+        first = True
+        while True:
+            started = time.perf_counter()
+            try:
+                record = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                self._busy("read", started)
+
+            self.pages_read += 1
+            if not record.text:
+                continue
+            # Spooled as page_separator.join() of the non-empty pages
+            await run_io(self._spool.write_text, record.text if first else self.page_separator + record.text)
+            first = False
+            await self.pages.put((record.page_number, record.text))
+
+        await self.pages.put(_DONE)
+
+    async def _chunk(self):
+        """Chunk pages as they arrive, carrying partial chunks across page breaks"""
+        first = True
+
+        while True:
+            item = await self.pages.get()
+            started = time.perf_counter()
+            if item is _DONE:
+                chunks = self.chunker.finish()
+            else:
+                page_number, text = item
+                if not first:
+                    text = self.page_separator + text
+                first = False
+                chunks = self.chunker.feed(text, page=page_number)
+            for chunk in chunks:
+                self._add_chunk(chunk)
+            self._busy("chunk", started)
+
+            if len(self._rows) >= self.embed_batch_size or item is _DONE:
+                rows, self._rows = self._rows, []
+                await run_io(self._spool.write_chunks, rows)
+
+            batch = self._open
+            if len(batch.chunks) >= self.embed_batch_size or (item is _DONE and batch.chunks):
+                self._open = _Batch()
+                await self.batches.put(batch)
+
+            if item is _DONE:
+                break
+
+        for _ in range(self.embed_workers):
+            await self.batches.put(_DONE)
+
+    def _add_chunk(self, chunk: Chunk):
+        """Record a chunk: new ones go into the open batch, moved ones get a metadata update"""
+        digest = hashlib.sha256(chunk.text.encode("utf-8")).digest()
+        occurrence = self._occurrences.get(digest, 0)
+        self._occurrences[digest] = occurrence + 1
+        local_id = VectorStore.content_id(chunk.text, occurrence)
+        chunk_id = VectorStore.chunk_id(self.document_id, local_id)
+        self._seen_ids.add(chunk_id)
+
+        # Offsets index result.text (document.extracted_text); 'page' is kept
+        # for readers of collections written before page ranges were stored
+        metadata = {
+            'chunk_index': self.chunk_count,
+            'page': chunk.page_start or 1,
+            'page_start': chunk.page_start or 1,
+            'page_end': chunk.page_end or chunk.page_start or 1,
+            'char_start': chunk.char_start,
+            'char_end': chunk.char_end,
+        }
+        self.chunk_count += 1
+        self._rows.append((chunk.text, metadata))
+
+        # Repeated text would only yield the same entities again
+        if self._extraction is not None and occurrence == 0 and len(chunk.text.strip()) >= MIN_ENTITY_TEXT:
+            self._extraction.submit(chunk_id, chunk.text)
+
+        stored = self.stored.get(chunk_id)
+        if stored is None:
+            self._open.ids.append(local_id)
+            self._open.chunks.append(chunk.text)
+            self._open.metadatas.append(metadata)
+            return
+        self.chunks_reused += 1
+        if any(stored.get(key) != value for key, value in metadata.items()):
+            self._moved_ids.append(chunk_id)
+            self._moved_metadatas.append(metadata)
+
+    async def _embed(self):
+        """One of embed_workers tasks turning chunk batches into vectors"""
+        while True:
+            batch = await self.batches.get()
+            if batch is _DONE:
+                await self.embedded.put(_DONE)
+                return
+            started = time.perf_counter()
+            batch.embeddings = await VectorStore.create_embeddings(batch.chunks)
+            self._busy("embed", started)
+            await self.embedded.put(batch)
+
+    async def _write(self):
+        """Upsert embedded batches; ids come from chunk contents, so order doesn't matter"""
+        finished = 0
+        while finished < self.embed_workers:
+            batch = await self.embedded.get()
+            if batch is _DONE:
+                finished += 1
+                continue
+            started = time.perf_counter()
+            await VectorStore.add_document_chunks(
+                document_id=self.document_id,
+                chunks=batch.chunks,
+                metadata=batch.metadatas,
+                user_id=self.user_id,
+                embeddings=batch.embeddings,
+                ids=batch.ids
+            )
+            self._busy("write", started)
+            self.chunks_written += len(batch.chunks)
+
+            if self.total_pages:
+                percent = 10 + 70 * min(self.pages_read, self.total_pages) // self.total_pages
+                message = f"Processed {self.pages_read}/{self.total_pages} pages"
+            else:
+                percent = 10
+                message = f"Embedded {self.chunks_written} chunks"
+            await self._report("embedding", percent, message)
+
+    # ------------------------------------------------------------------
+    # Entity extraction (every chunk; calls started by _add_chunk)
+    # ------------------------------------------------------------------
+
+    async def _entities(self):
+        started = time.perf_counter()
+        extraction = await self._extraction.result()
+        # Replaces any previous version's graph (a no-op on first ingestion)
+        await neo4j_service.delete_document_graph(self.document_id)
+        await neo4j_service.create_document_graph(
+            document_id=self.document_id,
+            entities=extraction.get('entities', []),
+            relationships=extraction.get('relationships', [])
+        )
+        self._busy("entities", started)
+
+    # ------------------------------------------------------------------
+    # Run
+    # ------------------------------------------------------------------
+
+    async def run(self, source: AsyncIterator[PageRecord]) -> IngestResult:
+        """Ingest the pages from source; raises if any stage fails"""
+        started = time.perf_counter()
+        self.stored = await VectorStore.get_stored_chunks(self.document_id, self.user_id)
+        self._spool = await run_io(_Spool)
+        stages = [
+            asyncio.create_task(self._read(source)),
+            asyncio.create_task(self._chunk()),
+            *(asyncio.create_task(self._embed()) for _ in range(self.embed_workers)),
+            asyncio.create_task(self._write()),
+        ]
+        try:
+            try:
+                await asyncio.gather(*stages)
+            except BaseException:
+                # One stage failed: stop the others rather than leave them blocked on a queue
+                for task in stages:
+                    task.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
+                raise
+
+            # Only after every write, so searches never see the document half
+            # gone; moved chunks in one call (a local index rewrites segments)
+            write_started = time.perf_counter()
+            await VectorStore.update_chunk_metadata(
+                self.document_id, self._moved_ids, self._moved_metadatas, self.user_id
+            )
+            stale = [chunk_id for chunk_id in self.stored if chunk_id not in self._seen_ids]
+            await VectorStore.delete_chunks(self.document_id, stale, self.user_id)
+            self._busy("write", write_started)
+
+            if self._extraction is not None and len(self._extraction):
+                self._entity_task = asyncio.create_task(self._entities())
+            elif self._extraction is not None or self.stored:
+                # Nothing extracted this time: the previous version's graph
+                # would keep seeding graph queries
+                self._entity_task = asyncio.create_task(
+                    neo4j_service.delete_document_graph(self.document_id)
+                )
+
+            await self._report("indexing", 85, "Building keyword index...")
+            index_started = time.perf_counter()
+            await run_io(self._spool.finish_chunks)
+            await lexical_store.index_spooled_document(self.document_id, self._spool.chunks_path)
+            self._busy("index", index_started)
+
+            if self._entity_task is not None:
+                await self._report("graph", 90, "Writing the knowledge graph...")
+                await self._entity_task
+
+            text = await run_io(self._spool.read_text)
+        finally:
+            if self._entity_task is not None and not self._entity_task.done():
+                self._entity_task.cancel()
+            if self._extraction is not None:
+                self._extraction.cancel()
+            await run_io(self._spool.close)
+
+        wall = time.perf_counter() - started
+        for stage, seconds in self.stage_seconds.items():
+            INGEST_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+        INGEST_CHUNKS.labels(outcome="embedded").inc(self.chunks_written)
+        INGEST_CHUNKS.labels(outcome="reused").inc(self.chunks_reused)
+        INGEST_CHUNKS.labels(outcome="deleted").inc(len(stale))
+        logger.info("Document ingested",
+                    document_id=self.document_id,
+                    pages=self.pages_read,
+                    chunks=self.chunk_count,
+                    chunks_embedded=self.chunks_written,
+                    chunks_reused=self.chunks_reused,
+                    chunks_deleted=len(stale),
+                    wall_seconds=round(wall, 3),
+                    stage_seconds={k: round(v, 3) for k, v in self.stage_seconds.items()})
+
+        return IngestResult(
+            text=text,
+            pages=self.pages_read,
+            chunk_count=self.chunk_count,
+            stage_seconds=dict(self.stage_seconds),
+            wall_seconds=wall,
+            chunks_embedded=self.chunks_written,
+            chunks_reused=self.chunks_reused,
+            chunks_deleted=len(stale)
+        )
@@ -0,0 +1,323 @@
+"""
+Job Queue
+Durable background jobs on Redis streams, consumed by worker processes
+
+- Jobs are stream entries read through a consumer group, so each job goes
+  to one worker and any number of workers can share the load
+- Unacknowledged jobs become visible again after JOB_VISIBILITY_TIMEOUT
+  (a crashed worker's jobs are reclaimed with XAUTOCLAIM); running jobs
+  heartbeat to keep their claim
+- Failures are retried with exponential backoff through a delay set, then
+  dead-lettered after JOB_MAX_ATTEMPTS. Jobs that kill their worker never
+  reach fail(): once their attempts or deliveries exceed JOB_MAX_ATTEMPTS
+  they are dead-lettered instead of being run again
+- Status lives in a hash per job; progress is also published on a channel
+  that the API relays to WebSocket clients
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import json
+import time
+import uuid
+
+from prometheus_client import Counter
+from redis.exceptions import ResponseError
+from core.config import settings
+from core import redis_client
+import structlog
+
+logger = structlog.get_logger()
+
+JOBS_TOTAL = Counter(
+    'jobs_total',
+    'Background job state transitions',
+    ['type', 'state']  # state: enqueued/completed/retried/dead
+)
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    COMPLETED = "completed"
+    DEAD = "dead"
+
+
+@dataclass
+class Job:
+    """A claimed stream entry"""
+    message_id: str
+    job_id: str
+    type: str
+    payload: Dict[str, Any]
+    attempt: int = 0  # set by JobQueue.start()
+    deliveries: int = 1  # of this stream entry; more than one when reclaimed
+
+
+class JobQueue:
+    """Redis streams job queue with a consumer group"""
+
+    def __init__(self, stream: str, group: str):
+        self.stream = stream
+        self.group = group
+        self.delayed_key = f"{stream}:delayed"
+        self.dead_stream = f"{stream}:dead"
+
+    @property
+    def redis(self):
+        # Resolved per call: the client is created in init_redis()
+        return redis_client.redis_client
+
+    @staticmethod
+    def status_key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], owner_id: Optional[int] = None) -> str:
+        """Add a job; returns its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await self.set_status(
+            job_id,
+            status=JobStatus.QUEUED,
+            type=job_type,
+            owner_id=owner_id if owner_id is not None else "",
+            attempts=0,
+            progress=0,
+            stage="queued",
+            created_at=now
+        )
+        await self._add(job_id, job_type, payload)
+        JOBS_TOTAL.labels(type=job_type, state="enqueued").inc()
+        logger.info("Job enqueued", job_id=job_id, type=job_type)
+        return job_id
+
+    async def enqueue_many(
+        self,
+        job_type: str,
+        payloads: List[Dict[str, Any]],
+        owner_id: Optional[int] = None
+    ) -> List[str]:
+        """
+        Add one job per payload; returns their ids in order. Status hashes
+        and stream entries go out JOB_ENQUEUE_BATCH_SIZE jobs per pipeline
+        instead of three round-trips per job.
+        """
+        job_ids = [uuid.uuid4().hex for _ in payloads]
+        for start in range(0, len(payloads), settings.JOB_ENQUEUE_BATCH_SIZE):
+            now = time.time()
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for job_id, payload in zip(job_ids[start:start + settings.JOB_ENQUEUE_BATCH_SIZE],
+                                           payloads[start:start + settings.JOB_ENQUEUE_BATCH_SIZE]):
+                    key = self.status_key(job_id)
+                    pipe.hset(key, mapping={
+                        "status": JobStatus.QUEUED,
+                        "type": job_type,
+                        "owner_id": owner_id if owner_id is not None else "",
+                        "attempts": 0,
+                        "progress": 0,
+                        "stage": "queued",
+                        "created_at": now,
+                        "updated_at": now
+                    })
+                    pipe.expire(key, settings.JOB_STATUS_TTL)
+                    pipe.xadd(self.stream, {
+                        "job_id": job_id,
+                        "type": job_type,
+                        "payload": json.dumps(payload)
+                    })
+                await pipe.execute()
+        JOBS_TOTAL.labels(type=job_type, state="enqueued").inc(len(job_ids))
+        logger.info("Jobs enqueued", count=len(job_ids), type=job_type)
+        return job_ids
+
+    async def _add(self, job_id: str, job_type: str, payload: Dict[str, Any]):
+        await self.redis.xadd(self.stream, {
+            "job_id": job_id,
+            "type": job_type,
+            "payload": json.dumps(payload)
+        })
+
+    async def set_status(self, job_id: str, **fields):
+        key = self.status_key(job_id)
+        fields["updated_at"] = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={k: v for k, v in fields.items() if v is not None})
+            pipe.expire(key, settings.JOB_STATUS_TTL)
+            await pipe.execute()
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        status = await self.redis.hgetall(self.status_key(job_id))
+        if not status:
+            return None
+        return {"job_id": job_id, **status}
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    async def ensure_group(self):
+        """Create the stream and consumer group if missing"""
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            logger.info("Job consumer group created", stream=self.stream, group=self.group)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @staticmethod
+    def _parse(message_id: str, fields: Dict[str, str]) -> Job:
+        return Job(
+            message_id=message_id,
+            job_id=fields["job_id"],
+            type=fields["type"],
+            payload=json.loads(fields.get("payload") or "{}")
+        )
+
+    async def claim(self, consumer: str, count: int, block_ms: int = 5000) -> List[Job]:
+        """
+        Next jobs for this consumer: first entries whose previous owner went
+        silent for longer than the visibility timeout, then new entries.
+        """
+        jobs: List[Job] = []
+        timeout_ms = settings.JOB_VISIBILITY_TIMEOUT * 1000
+
+        reclaimed = await self.redis.xautoclaim(
+            self.stream, self.group, consumer,
+            min_idle_time=timeout_ms, start_id="0-0", count=count
+        )
+        entries = [(message_id, fields) for message_id, fields in reclaimed[1] if fields]  # trimmed: empty
+        if entries:
+            # XAUTOCLAIM counted this delivery; XPENDING reports the total
+            pending = await self.redis.xpending_range(
+                self.stream, self.group, min=entries[0][0], max=entries[-1][0], count=len(entries)
+            )
+            deliveries = {entry["message_id"]: entry["times_delivered"] for entry in pending}
+            for message_id, fields in entries:
+                job = self._parse(message_id, fields)
+                job.deliveries = deliveries.get(message_id, job.deliveries)
+                jobs.append(job)
+                logger.warning("Job reclaimed after visibility timeout",
+                               message_id=message_id, deliveries=job.deliveries)
+
+        if len(jobs) < count:
+            response = await self.redis.xreadgroup(
+                self.group, consumer, {self.stream: ">"},
+                count=count - len(jobs), block=block_ms
+            )
+            for _, messages in response or []:
+                jobs.extend(self._parse(message_id, fields) for message_id, fields in messages)
+
+        return jobs
+
+    async def start(self, job: Job) -> int:
+        """
+        Mark a job running and count the attempt. Counted in the status hash,
+        so deliveries to workers that crashed mid-job count too.
+        """
+        job.attempt = await self.redis.hincrby(self.status_key(job.job_id), "attempts", 1)
+        await self.set_status(job.job_id, status=JobStatus.RUNNING, started_at=time.time())
+        return job.attempt
+
+    @staticmethod
+    def abandoned(job: Job) -> bool:
+        """
+        Whether a started job has used up its attempts without fail() ever
+        running, i.e. earlier runs died with their worker (OOM, a crashing
+        parser). Such a job would otherwise be reclaimed and re-run forever.
+        """
+        return job.attempt > settings.JOB_MAX_ATTEMPTS or job.deliveries > settings.JOB_MAX_ATTEMPTS
+
+    async def heartbeat(self, consumer: str, message_id: str):
+        """Reset the entry's idle time so it isn't reclaimed while still running"""
+        await self.redis.xclaim(
+            self.stream, self.group, consumer,
+            min_idle_time=0, message_ids=[message_id], justid=True
+        )
+
+    async def ack(self, job: Job):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, job.message_id)
+            pipe.xdel(self.stream, job.message_id)
+            await pipe.execute()
+
+    async def complete(self, job: Job):
+        await self.ack(job)
+        await self.set_status(job.job_id, status=JobStatus.COMPLETED, progress=100, stage="completed")
+        JOBS_TOTAL.labels(type=job.type, state="completed").inc()
+
+    async def fail(self, job: Job, error: str) -> bool:
+        """
+        Record a failed attempt. Schedules a retry with backoff and returns
+        True, or dead-letters the job and returns False when out of attempts.
+        """
+        if job.attempt < settings.JOB_MAX_ATTEMPTS:
+            delay = settings.JOB_RETRY_BASE_DELAY * (2 ** (job.attempt - 1))
+            entry = json.dumps({
+                "job_id": job.job_id,
+                "type": job.type,
+                "payload": job.payload
+            })
+            await self.redis.zadd(self.delayed_key, {entry: time.time() + delay})
+            await self.ack(job)
+            await self.set_status(job.job_id, status=JobStatus.RETRYING, error=error,
+                                  retry_at=time.time() + delay)
+            JOBS_TOTAL.labels(type=job.type, state="retried").inc()
+            logger.warning("Job failed, retry scheduled",
+                           job_id=job.job_id, attempt=job.attempt, delay=delay, error=error)
+            return True
+
+        await self.dead_letter(job, error)
+        return False
+
+    async def dead_letter(self, job: Job, error: str):
+        """Move a job to the dead-letter stream; it is not run again"""
+        await self.redis.xadd(self.dead_stream, {
+            "job_id": job.job_id,
+            "type": job.type,
+            "payload": json.dumps(job.payload),
+            "attempt": job.attempt,
+            "error": error[:2000]
+        })
+        await self.ack(job)
+        await self.set_status(job.job_id, status=JobStatus.DEAD, error=error)
+        JOBS_TOTAL.labels(type=job.type, state="dead").inc()
+        logger.error("Job dead-lettered", job_id=job.job_id, attempts=job.attempt, error=error)
+
+    async def release_due(self, limit: int = 100) -> int:
+        """Move retries whose delay has elapsed back onto the stream"""
+        due = await self.redis.zrangebyscore(self.delayed_key, 0, time.time(), start=0, num=limit)
+        released = 0
+        for entry in due:
+            # ZREM succeeds for exactly one worker, so each retry is released once
+            if await self.redis.zrem(self.delayed_key, entry):
+                fields = json.loads(entry)
+                await self._add(fields["job_id"], fields["type"], fields["payload"])
+                released += 1
+        return released
+
+    # ------------------------------------------------------------------
+    # Progress
+    # ------------------------------------------------------------------
+
+    async def publish_progress(self, job_id: str, user_id: int, document_id: int,
+                               status: str, stage: str, progress: int, message: str):
+        """Record progress on the job and publish it for WebSocket relay"""
+        await self.set_status(job_id, stage=stage, progress=progress)
+        await self.redis.publish(settings.JOB_PROGRESS_CHANNEL, json.dumps({
+            "job_id": job_id,
+            "user_id": user_id,
+            "document_id": document_id,
+            "status": status,
+            "stage": stage,
+            "progress": progress,
+            "message": message
+        }))
+
+
+# Global instance
+job_queue = JobQueue(settings.JOB_STREAM, settings.JOB_GROUP)
@@ -0,0 +1,314 @@
+"""
+Lexical Index
+BM25 keyword search over a document's chunks, answered in-process
+
+Dense embeddings blur exact strings; this index catches identifiers,
+part numbers and names typed verbatim. One index per document, built at
+ingest and stored as a compact inverted index (CSR postings):
+
+    LEXICAL_INDEX_DIR/doc_<id>.npz
+        terms          sorted vocabulary (unicode array)
+        offsets        postings for term t are rows offsets[t]:offsets[t+1]
+        postings       chunk positions (int32)
+        tfs            term frequency per posting (float32)
+        doc_lens       tokens per chunk (float32)
+        text_blob      chunk texts, UTF-8, concatenated (uint8)
+        text_offsets   byte offsets of each chunk in text_blob
+        metadata_json  chunk metadatas as a JSON list (uint8)
+"""
+
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import re
+import threading
+
+import numpy as np
+from core.config import settings
+from core.executors import run_cpu, run_io
+import structlog
+
+logger = structlog.get_logger()
+
+# Words plus joined identifiers such as "XR-2000", "v1.2.3" or "ISO/IEC"
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+PART_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased tokens; joined identifiers are indexed whole and by part"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum() and "_" not in token:
+            tokens.extend(PART_PATTERN.findall(token))
+    return tokens
+
+
+class LexicalIndex:
+    """Immutable BM25 index over one document's chunks"""
+
+    def __init__(
+        self,
+        terms: np.ndarray,
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        tfs: np.ndarray,
+        doc_lens: np.ndarray,
+        text_blob: np.ndarray,
+        text_offsets: np.ndarray,
+        metadatas: List[Dict]
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.text_blob = text_blob
+        self.text_offsets = text_offsets
+        self.metadatas = metadatas
+        self.vocab = {term: i for i, term in enumerate(terms.tolist())}
+        self.avgdl = float(doc_lens.mean()) if len(doc_lens) else 0.0
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    @classmethod
+    def build(cls, chunks: List[str], metadatas: Optional[List[Dict]] = None) -> "LexicalIndex":
+        """Tokenise chunks and lay postings out term by term"""
+        term_postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = np.zeros(len(chunks), dtype=np.float32)
+
+        for position, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            doc_lens[position] = sum(counts.values())
+            for term, tf in counts.items():
+                term_postings.setdefault(term, []).append((position, tf))
+
+        terms = sorted(term_postings)
+        sizes = np.fromiter((len(term_postings[t]) for t in terms), dtype=np.int64, count=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            rows = term_postings[term]
+            postings[offsets[i]:offsets[i + 1]] = [position for position, _ in rows]
+            tfs[offsets[i]:offsets[i + 1]] = [tf for _, tf in rows]
+
+        encoded = [chunk.encode("utf-8") for chunk in chunks]
+        text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=text_offsets[1:])
+        text_blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        return cls(
+            terms=np.array(terms, dtype=str),
+            offsets=offsets,
+            postings=postings,
+            tfs=tfs,
+            doc_lens=doc_lens,
+            text_blob=text_blob,
+            text_offsets=text_offsets,
+            metadatas=metadatas or [{"chunk_index": i} for i in range(len(chunks))]
+        )
+
+    def save(self, path: Path):
+        """Write atomically (readers never see a half-written file)"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp,
+            terms=self.terms,
+            offsets=self.offsets,
+            postings=self.postings,
+            tfs=self.tfs,
+            doc_lens=self.doc_lens,
+            text_blob=self.text_blob,
+            text_offsets=self.text_offsets,
+            metadata_json=np.frombuffer(json.dumps(self.metadatas).encode("utf-8"), dtype=np.uint8)
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                terms=data["terms"],
+                offsets=data["offsets"],
+                postings=data["postings"],
+                tfs=data["tfs"],
+                doc_lens=data["doc_lens"],
+                text_blob=data["text_blob"],
+                text_offsets=data["text_offsets"],
+                metadatas=json.loads(data["metadata_json"].tobytes().decode("utf-8"))
+            )
+
+    def chunk(self, position: int) -> str:
+        start, end = self.text_offsets[position], self.text_offsets[position + 1]
+        return self.text_blob[start:end].tobytes().decode("utf-8")
+
+    def idf(self, df: int) -> float:
+        n = len(self)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, n_results: int = 5) -> Dict:
+        """
+        BM25 top-k. Besides chunks and scores, reports `coverage`: the share
+        of the query's IDF weight that the best chunk contains (1.0 means
+        every query term, including rare identifiers, appears in it).
+        """
+        k1, b = settings.BM25_K1, settings.BM25_B
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        scores = np.zeros(len(self), dtype=np.float32)
+        empty = {'chunks': [], 'scores': [], 'metadatas': [], 'positions': [], 'coverage': 0.0}
+        if not query_terms or not len(self):
+            return empty
+
+        weights, matched = [], []
+        for term in query_terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                # Unseen terms carry the maximum weight: the index can't vouch for them
+                weights.append(self.idf(0))
+                matched.append(None)
+                continue
+
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = self.postings[start:end]
+            tf = self.tfs[start:end]
+            idf = self.idf(end - start)
+            norm = k1 * (1 - b + b * self.doc_lens[rows] / self.avgdl)
+            scores[rows] += idf * tf * (k1 + 1) / (tf + norm)
+            weights.append(idf)
+            matched.append(rows)
+
+        hit_rows = np.flatnonzero(scores)
+        if not len(hit_rows):
+            return empty
+
+        k = min(n_results, len(hit_rows))
+        top = hit_rows[np.argpartition(-scores[hit_rows], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        best = top[0]
+        covered = sum(
+            weight for weight, rows in zip(weights, matched)
+            if rows is not None and best in rows
+        )
+
+        return {
+            'chunks': [self.chunk(p) for p in top.tolist()],
+            'scores': scores[top].tolist(),
+            'metadatas': [dict(self.metadatas[p]) for p in top.tolist()],
+            'positions': top.tolist(),
+            'coverage': covered / sum(weights)
+        }
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked key lists: score(key) = sum over lists of 1 / (k + rank)"""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def build_index_file(path: str, chunks: List[str], metadatas: Optional[List[Dict]] = None) -> int:
+    """Build and persist an index; module-level so it can run in a worker process"""
+    index = LexicalIndex.build(chunks, metadatas)
+    index.save(Path(path))
+    return len(index.terms)
+
+
+def build_index_from_spool(path: str, spool_path: str) -> Tuple[int, int]:
+    """
+    build_index_file for chunks spooled to a JSON-lines file, one
+    {"text", "metadata"} object per line, read in the worker process so
+    the caller never holds them; returns (chunks, terms)
+    """
+    chunks, metadatas = [], []
+    with open(spool_path, encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            chunks.append(row["text"])
+            metadatas.append(row["metadata"])
+    return len(chunks), build_index_file(path, chunks, metadatas)
+
+
+class LexicalIndexStore:
+    """Per-document indexes on disk, with an LRU of loaded ones"""
+
+    def __init__(self, data_dir: str, max_loaded: int = 256):
+        self.data_dir = Path(data_dir)
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[int, LexicalIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, document_id: int) -> Path:
+        return self.data_dir / f"doc_{document_id}.npz"
+
+    def get(self, document_id: int) -> Optional[LexicalIndex]:
+        """Loaded index, reading it from disk on a miss; None if never built"""
+        with self._lock:
+            index = self._loaded.get(document_id)
+            if index is not None:
+                self._loaded.move_to_end(document_id)
+                return index
+
+        path = self.path(document_id)
+        if not path.exists():
+            return None
+        index = LexicalIndex.load(path)
+
+        with self._lock:
+            self._loaded[document_id] = index
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return index
+
+    def invalidate(self, document_id: int):
+        with self._lock:
+            self._loaded.pop(document_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._loaded.clear()
+
+    def delete(self, document_id: int):
+        self.invalidate(document_id)
+        self.path(document_id).unlink(missing_ok=True)
+
+    async def index_document(self, document_id: int, chunks: List[str], metadatas: Optional[List[Dict]] = None):
+        """Build a document's index at ingest (tokenising is CPU-bound: process pool)"""
+        terms = await run_cpu(build_index_file, str(self.path(document_id)), chunks, metadatas)
+        self.invalidate(document_id)
+        logger.info("Lexical index built", document_id=document_id, chunks=len(chunks), terms=terms)
+
+    async def index_spooled_document(self, document_id: int, spool_path: str):
+        """index_document for chunks spooled to disk (see build_index_from_spool)"""
+        chunks, terms = await run_cpu(build_index_from_spool, str(self.path(document_id)), spool_path)
+        self.invalidate(document_id)
+        logger.info("Lexical index built", document_id=document_id, chunks=chunks, terms=terms)
+
+    async def search(self, document_id: int, query: str, n_results: int = 5) -> Optional[Dict]:
+        """BM25 search, or None when the document has no index (ingested before indexing existed)"""
+        with self._lock:
+            index = self._loaded.get(document_id)
+        if index is None:
+            index = await run_io(self.get, document_id)
+        if index is None:
+            return None
+        return index.search(query, n_results)
+
+    async def delete_document(self, document_id: int):
+        await run_io(self.delete, document_id)
+
+
+# Global instance
+lexical_store = LexicalIndexStore(settings.LEXICAL_INDEX_DIR, settings.LEXICAL_INDEX_CACHE_SIZE)
@@ -0,0 +1,143 @@
+"""
+Local Entity Extraction
+Rule-based entities and co-occurrence relationships, on CPU, no model calls
+
+- Entities: gazetteer names (ENTITY_GAZETTEER_PATH, matched with the
+  Aho-Corasick EntityMatcher), part and model codes (XR-2000, M12),
+  organisations (Title Case names ending in Inc, Ltd, GmbH, ...), other
+  Title Case phrases of two or more words, and acronyms
+- Relationships: entities mentioned in the same sentence CO_OCCUR
+- extract_batch() takes many chunks per call, so one process-pool task
+  covers a whole batch (compiled patterns and the gazetteer are loaded
+  once per worker process)
+
+Precision is below an LLM's and relationship types are generic; use
+ENTITY_EXTRACTION_MODE=hybrid to send the chunks where it finds new
+entities to the LLM as well.
+"""
+
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Tuple
+import csv
+import re
+
+from services.entity_matcher import EntityMatcher, normalize
+
+CO_OCCURS = "CO_OCCURS"
+
+# More entities than this in one sentence is usually a list or a table:
+# pairing them all would swamp the graph
+MAX_ENTITIES_PER_SENTENCE = 6
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+CODE = re.compile(r"\b(?:[A-Z]{1,5}-?\d{2,}[A-Za-z0-9]*(?:-[A-Za-z0-9]+)*|[A-Z]\d{1,4})\b")
+ORGANIZATION = re.compile(
+    r"\b(?:[A-Z][\w&'-]*\s+){0,4}[A-Z][\w&'-]*,?\s+"
+    r"(?:Inc|Ltd|LLC|GmbH|AG|Corp|Corporation|Company|Co|plc|S\.A)\b\.?"
+)
+# No "the" inside: "Fit the Drive Belt" is a verb before a name
+TITLE_PHRASE = re.compile(r"\b[A-Z][\w'-]+(?:\s+(?:(?:of|and|for|de)\s+)?[A-Z][\w'-]+){1,4}\b")
+ACRONYM = re.compile(r"\b[A-Z]{2,6}s?\b")
+
+# Capitalised words that start phrases without naming anything
+STOP_WORDS = {
+    "the", "a", "an", "this", "that", "these", "those", "if", "when", "before", "after", "do", "not",
+    "check", "ensure", "note", "warning", "caution", "danger", "step", "figure", "table", "page",
+    "see", "use", "remove", "install", "replace", "in", "on", "for", "to", "and", "or", "with",
+}
+STOP_ACRONYMS = {"NOTE", "WARNING", "CAUTION", "DANGER", "IMPORTANT", "TIP", "OK", "NO", "YES", "ON", "OFF", "AND",
+                 "OR", "THE", "FOR", "TO", "IN", "OF", "IS", "IT", "AM", "PM"}
+
+
+@lru_cache(maxsize=4)
+def load_gazetteer(path: str) -> Tuple[EntityMatcher, Dict[str, str]]:
+    """Matcher and name -> type for a CSV of name,type rows (cached per process)"""
+    types: Dict[str, str] = {}
+    if path:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and row[0].strip() and not row[0].startswith("#"):
+                    types.setdefault(row[0].strip(), row[1].strip())
+    return EntityMatcher(types), types
+
+
+def _strip_stop_words(text: str, start: int) -> Tuple[int, str]:
+    """Drop leading stop words from a phrase found at start; returns its new start and text"""
+    for word in text.split():
+        if word.lower().rstrip(",") not in STOP_WORDS:
+            break
+        rest = text[len(word):].lstrip()
+        start += len(text) - len(rest)
+        text = rest
+    return start, text
+
+
+def _candidates(sentence: str, gazetteer: EntityMatcher, gazetteer_types: Dict[str, str]):
+    """(start, end, name, type) of every rule match, most specific rule first"""
+    for name in gazetteer.find(sentence):
+        pattern = r"\s+".join(re.escape(word) for word in name.split())
+        match = re.search(pattern, sentence, re.IGNORECASE)
+        if match:
+            yield match.start(), match.end(), name, gazetteer_types[name]
+    for match in ORGANIZATION.finditer(sentence):
+        start, name = _strip_stop_words(match.group(0).rstrip("."), match.start())
+        if len(name.split()) >= 2:
+            yield start, start + len(name), name.replace(",", ""), "Organization"
+    for match in TITLE_PHRASE.finditer(sentence):
+        start, name = _strip_stop_words(match.group(0), match.start())
+        # "XR-2000 Pump" names a product, "Pressure Relief Valve" a concept;
+        # words before a code are usually a verb ("Fit PN-1000")
+        code = CODE.search(name)
+        if code:
+            start, name = start + code.start(), name[code.start():]
+        if len(name.split()) >= 2:
+            yield start, start + len(name), name, "Product" if code else "Concept"
+    for match in CODE.finditer(sentence):
+        yield match.start(), match.end(), match.group(0), "Product"
+    for match in ACRONYM.finditer(sentence):
+        if match.group(0) not in STOP_ACRONYMS:
+            yield match.start(), match.end(), match.group(0), "Concept"
+
+
+def _sentence_entities(sentence: str, gazetteer: EntityMatcher,
+                       gazetteer_types: Dict[str, str]) -> Dict[str, Tuple[str, str]]:
+    """normalised name -> (name, type) in one sentence; a span goes to the first rule matching it"""
+    found: Dict[str, Tuple[str, str]] = {}
+    taken: List[Tuple[int, int]] = []
+    for start, end, name, entity_type in _candidates(sentence, gazetteer, gazetteer_types):
+        if any(start < taken_end and taken_start < end for taken_start, taken_end in taken):
+            continue
+        taken.append((start, end))
+        key = normalize(name)
+        if key and key not in found:
+            found[key] = (name, entity_type)
+    return found
+
+
+def extract_text(text: str, gazetteer_path: str = "") -> Dict:
+    """Entities and co-occurrence relationships of one text, in the LLM extractor's format"""
+    gazetteer, gazetteer_types = load_gazetteer(gazetteer_path)
+    entities: Dict[str, Tuple[str, str]] = {}
+    pairs: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+    for sentence in SENTENCE_END.split(text):
+        if not sentence.strip():
+            continue
+        found = _sentence_entities(sentence, gazetteer, gazetteer_types)
+        for key, value in found.items():
+            entities.setdefault(key, value)
+        if 2 <= len(found) <= MAX_ENTITIES_PER_SENTENCE:
+            for a, b in combinations(sorted(found), 2):
+                pairs.setdefault((a, b), (entities[a][0], entities[b][0]))
+
+    return {
+        "entities": [{"name": name, "type": entity_type} for name, entity_type in entities.values()],
+        "relationships": [{"from": a, "to": b, "type": CO_OCCURS} for a, b in pairs.values()],
+    }
+
+
+def extract_batch(texts: List[str], gazetteer_path: str = "") -> List[Dict]:
+    """extract_text over many chunks in one call (module-level: runs on the process pool)"""
+    return [extract_text(text, gazetteer_path) for text in texts]
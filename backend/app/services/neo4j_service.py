@@ -1,15 +1,107 @@
 """
 Neo4j Graph Database Service
 Manages knowledge graph creation and querying
+
+- Graphs are written as UNWIND $rows statements of NEO4J_WRITE_BATCH_SIZE
+  rows inside one explicit transaction, so round-trips grow with
+  rows / batch size instead of one per entity and relationship
+- Entities are keyed by (document_id, name): documents mentioning the
+  same name get their own nodes, and deleting one graph leaves the others
+  intact. Relationships name their endpoints without types, so within a
+  document a name is one node (it keeps the first type written)
+- Queries find the document's entity names in the question (EntityMatcher),
+  look those nodes up by index and expand a bounded neighbourhood around
+  them, instead of scanning paths for the whole question as a substring
 """
 
-from typing import List, Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from neo4j import AsyncGraphDatabase
 from core.config import settings
+from services.entity_matcher import EntityMatcher, EntityMatcherCache
+from services.graph_schema import GraphSchemaManager
 import structlog
 
 logger = structlog.get_logger()
 
+DOCUMENT_UPSERT = """
+MERGE (d:Document {id: $doc_id})
+SET d.created_at = datetime()
+"""
+
+ENTITY_UPSERT = """
+UNWIND $rows AS row
+MERGE (e:Entity {name: row.name, document_id: $doc_id})
+SET e.type = row.type, e.chunk_ids = row.chunk_ids
+WITH e
+MATCH (d:Document {id: $doc_id})
+MERGE (d)-[:CONTAINS]->(e)
+"""
+
+ENTITY_NAMES = """
+MATCH (e:Entity {document_id: $doc_id})
+RETURN DISTINCT e.name AS name
+"""
+
+# Seeds come from the (document_id, name) index; each expands lazily up
+# to $per_seed paths, so hub entities can't blow up the result
+NEIGHBOURHOOD = """
+MATCH (seed:Entity)
+WHERE seed.document_id = $doc_id AND seed.name IN $names
+CALL {{
+    WITH seed
+    MATCH path = (seed)-[:RELATES_TO*1..{max_hops}]-(:Entity)
+    RETURN path
+    LIMIT $per_seed
+}}
+UNWIND relationships(path) AS r
+WITH DISTINCT r
+RETURN startNode(r).name AS entity1, endNode(r).name AS entity2, r.type AS relationship
+LIMIT $limit
+"""
+
+RELATIONSHIP_UPSERT = """
+UNWIND $rows AS row
+MATCH (e1:Entity {name: row.source, document_id: $doc_id})
+MATCH (e2:Entity {name: row.target, document_id: $doc_id})
+MERGE (e1)-[r:RELATES_TO {type: row.type}]->(e2)
+SET r.chunk_ids = row.chunk_ids
+"""
+
+
+def graph_write_batches(
+    document_id: Any,
+    entities: List[Dict],
+    relationships: List[Dict],
+    batch_size: Optional[int] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    (query, parameters) statements writing a document graph: the document
+    node, then entity and relationship rows batch_size at a time.
+
+    entities: {"name", "type"}; relationships: {"source", "target", "type"};
+    both with optional "chunk_ids" (the chunks they were extracted from).
+    Repeated rows are merged (entities by name: the first type wins), so
+    each batch does distinct work. Run them
+    in order in one transaction (sync or async driver alike).
+    """
+    batch_size = batch_size or settings.NEO4J_WRITE_BATCH_SIZE
+
+    def merged(items, keys, fields):
+        rows: Dict[tuple, Dict] = {}
+        for item in items:
+            key = tuple(item[k] for k in keys)
+            row = rows.setdefault(key, {**{k: item[k] for k in fields}, 'chunk_ids': []})
+            row['chunk_ids'].extend(c for c in item.get('chunk_ids', ()) if c not in row['chunk_ids'])
+        return list(rows.values())
+
+    entity_rows = merged(entities, ('name',), ('name', 'type'))
+    relationship_rows = merged(relationships, ('source', 'target', 'type'), ('source', 'target', 'type'))
+
+    yield DOCUMENT_UPSERT, {'doc_id': document_id}
+    for query, rows in ((ENTITY_UPSERT, entity_rows), (RELATIONSHIP_UPSERT, relationship_rows)):
+        for start in range(0, len(rows), batch_size):
+            yield query, {'doc_id': document_id, 'rows': rows[start:start + batch_size]}
+
 
 class Neo4jService:
     """Neo4j graph operations"""
@@ -19,81 +111,83 @@ class Neo4jService:
             settings.NEO4J_URI,
             auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
         )
+        self.matchers = EntityMatcherCache(settings.GRAPH_MATCHER_CACHE_SIZE, settings.GRAPH_MATCHER_TTL)
     
     async def close(self):
         """Close Neo4j connection"""
         await self.driver.close()
+
+    @property
+    def schema(self) -> GraphSchemaManager:
+        """Constraints and indexes on this connection"""
+        return GraphSchemaManager(self.driver)
     
     async def create_document_graph(self, document_id: int, entities: List[Dict], relationships: List[Dict]):
         """Create knowledge graph from extracted entities and relationships"""
+        statements = list(graph_write_batches(
+            document_id,
+            entities,
+            [
+                {'source': rel['from'], 'target': rel['to'], 'type': rel['type'],
+                 'chunk_ids': rel.get('chunk_ids', [])}
+                for rel in relationships
+            ]
+        ))
+
+        async def write(tx):
+            for query, parameters in statements:
+                result = await tx.run(query, parameters)
+                await result.consume()
+
         async with self.driver.session() as session:
-            # Create document node
-            await session.run(
-                """
-                MERGE (d:Document {id: $doc_id})
-                SET d.created_at = datetime()
-                """,
-                doc_id=document_id
-            )
-            
-            # Create entity nodes
-            for entity in entities:
-                await session.run(
-                    """
-                    MERGE (e:Entity {name: $name, type: $type})
-                    SET e.document_id = $doc_id
-                    MERGE (d:Document {id: $doc_id})
-                    MERGE (d)-[:CONTAINS]->(e)
-                    """,
-                    name=entity['name'],
-                    type=entity['type'],
-                    doc_id=document_id
-                )
-            
-            # Create relationships
-            for rel in relationships:
-                await session.run(
-                    """
-                    MATCH (e1:Entity {name: $from_entity})
-                    MATCH (e2:Entity {name: $to_entity})
-                    WHERE e1.document_id = $doc_id AND e2.document_id = $doc_id
-                    MERGE (e1)-[r:RELATES_TO {type: $rel_type}]->(e2)
-                    """,
-                    from_entity=rel['from'],
-                    to_entity=rel['to'],
-                    rel_type=rel['type'],
-                    doc_id=document_id
-                )
-            
-            logger.info("Graph created", document_id=document_id, 
-                       entities=len(entities), relationships=len(relationships))
+            # One transaction (retried as a whole on transient errors)
+            await session.execute_write(write)
+
+        # Fresh matcher for this process; others pick the graph up on their next miss
+        self.matchers.put(document_id, EntityMatcher(
+            (entity['name'] for entity in entities), settings.GRAPH_ENTITY_MIN_CHARS
+        ))
+        logger.info("Graph created", document_id=document_id,
+                    entities=len(entities), relationships=len(relationships), statements=len(statements))
     
+    async def entity_matcher(self, document_id: int) -> EntityMatcher:
+        """The document's entity matcher, built from its graph on a cache miss"""
+        matcher = self.matchers.get(document_id)
+        if matcher is None:
+            async with self.driver.session() as session:
+                result = await session.run(ENTITY_NAMES, doc_id=document_id)
+                names = [record['name'] async for record in result]
+            matcher = EntityMatcher(names, settings.GRAPH_ENTITY_MIN_CHARS)
+            self.matchers.put(document_id, matcher)
+        return matcher
+
     async def query_graph(self, document_id: int, query: str) -> List[Dict]:
-        """Query the knowledge graph"""
+        """Relationships around the entities the query mentions"""
+        matcher = await self.entity_matcher(document_id)
+        seeds = matcher.find(query)[:settings.GRAPH_QUERY_MAX_SEEDS]
+        if not seeds:
+            logger.info("No graph entities in query", document_id=document_id, entities=len(matcher))
+            return []
+
         async with self.driver.session() as session:
-            # Simple path query - find related entities
             result = await session.run(
-                """
-                MATCH path = (e1:Entity)-[r*1..2]-(e2:Entity)
-                WHERE e1.document_id = $doc_id 
-                AND (e1.name CONTAINS $query OR e2.name CONTAINS $query)
-                RETURN e1.name as entity1, e2.name as entity2, 
-                       type(r[0]) as relationship
-                LIMIT 10
-                """,
+                NEIGHBOURHOOD.format(max_hops=int(settings.GRAPH_QUERY_MAX_HOPS)),
                 doc_id=document_id,
-                query=query.lower()
+                names=seeds,
+                per_seed=settings.GRAPH_QUERY_PATHS_PER_SEED,
+                limit=settings.GRAPH_QUERY_MAX_RELATIONSHIPS
             )
-            
-            paths = []
-            async for record in result:
-                paths.append({
+            paths = [
+                {
                     'entity1': record['entity1'],
                     'entity2': record['entity2'],
                     'relationship': record['relationship']
-                })
-            
-            return paths
+                }
+                async for record in result
+            ]
+
+        logger.info("Graph queried", document_id=document_id, seeds=len(seeds), relationships=len(paths))
+        return paths
     
     async def delete_document_graph(self, document_id: int):
         """Delete all nodes and relationships for a document"""
@@ -106,7 +200,8 @@ class Neo4jService:
                 """,
                 doc_id=document_id
             )
-            logger.info("Graph deleted", document_id=document_id)
+        self.matchers.invalidate(document_id)
+        logger.info("Graph deleted", document_id=document_id)
 
 
 # Global instance
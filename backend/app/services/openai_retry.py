@@ -0,0 +1,81 @@
+"""
+OpenAI Retry Helper
+Retries rate-limited (429) and server-side (5xx) failures with
+exponential backoff and full jitter
+"""
+
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import random
+
+import openai
+from prometheus_client import Counter
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+OPENAI_RETRIES = Counter(
+    'openai_retries_total',
+    'OpenAI calls retried after a transient failure',
+    ['operation', 'reason']  # reason: rate_limit/server_error/connection
+)
+
+
+def retry_reason(error: Exception) -> Optional[str]:
+    """Classify an OpenAI error as retryable (returns reason) or not (None)"""
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return "server_error"
+    if isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return "connection"
+    return None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the server's Retry-After hint, if it sent one"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def with_openai_retries(
+    call: Callable[[], Awaitable[T]],
+    operation: str,
+    max_retries: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0
+) -> T:
+    """
+    Await call(), retrying transient OpenAI failures.
+    Delay is uniform in [0, min(max_delay, base_delay * 2^attempt)],
+    or the server's Retry-After when larger.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            reason = retry_reason(e)
+            if reason is None or attempt >= max_retries:
+                raise
+
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            hinted = retry_after_seconds(e)
+            if hinted is not None:
+                delay = max(delay, min(hinted, max_delay))
+
+            OPENAI_RETRIES.labels(operation=operation, reason=reason).inc()
+            logger.warning("OpenAI call failed, retrying",
+                          operation=operation,
+                          reason=reason,
+                          attempt=attempt + 1,
+                          delay=round(delay, 2))
+            attempt += 1
+            await asyncio.sleep(delay)
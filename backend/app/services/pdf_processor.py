@@ -1,32 +1,207 @@
 """
 PDF Processing Service
 Extracts text from PDF files
+
+Pages are produced lazily as PageRecords (iter_page_records in a worker
+process, PDFProcessor.iter_pages on the event loop); the joined document
+text is only built by the extractors that return it.
 """
 
-from typing import List, Dict
+from collections import deque
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, NamedTuple, Optional, Tuple
+import asyncio
+import math
 import PyPDF2
 import pdfplumber
 from pathlib import Path
+from prometheus_client import Counter
+from core.config import settings
+from core.executors import cpu_workers, run_cpu
+from services.chunker import TokenChunker
 import structlog
 
 logger = structlog.get_logger()
 
+PDF_PAGES_EXTRACTED = Counter(
+    'pdf_pages_extracted_total',
+    'PDF pages extracted, by the extractor that produced the text',
+    ['extractor']  # pypdf/pdfplumber
+)
+
+
+class PageRecord(NamedTuple):
+    """One extracted page"""
+    page_number: int
+    text: str
+    extractor: str  # pypdf/pdfplumber ("text" for plain-text files)
+
+
+def _looks_garbled(text: str) -> bool:
+    """
+    Empty, or mostly characters no real text is made of: replacement
+    characters, private-use glyphs (fonts without a Unicode map), control
+    codes, or very little that is alphanumeric.
+    """
+    sample = text.strip()[:2000]
+    if not sample:
+        return True
+    bad = sum(
+        1 for c in sample
+        if c == '\ufffd' or '\ue000' <= c <= '\uf8ff' or (c < ' ' and c not in '\n\r\t')
+    )
+    if bad > len(sample) * 0.05:
+        return True
+    if len(sample) >= 20 and sum(c.isalnum() for c in sample) < len(sample) * 0.3:
+        return True
+    return False
+
+
+def _plumber_page_text(page) -> str:
+    try:
+        return page.extract_text() or ""
+    finally:
+        # pdfplumber keeps each page's parsed layout and text map cached on
+        # the page object; without this, memory grows with every page read
+        # (what Page.close() does in newer pdfplumber releases)
+        page.flush_cache()
+        page.get_textmap.cache_clear()
+
+
+def iter_page_records(
+    file_path: str,
+    strategy: str = "adaptive",
+    start: int = 0,
+    stop: Optional[int] = None
+) -> Iterator[PageRecord]:
+    """
+    Lazily yield pages [start, stop) of a PDF, opening the file once and
+    holding nothing from earlier pages.
+
+    strategy: 'pypdf', 'pdfplumber' (slower, better layout) or 'adaptive'
+    (PyPDF2, with pdfplumber for pages that come back empty or garbled)
+    """
+    if strategy == "pdfplumber":
+        with pdfplumber.open(file_path) as pdf:
+            stop = len(pdf.pages) if stop is None else min(stop, len(pdf.pages))
+            for page_num in range(start, stop):
+                yield PageRecord(page_num + 1, _plumber_page_text(pdf.pages[page_num]), "pdfplumber")
+        return
+
+    plumber = None
+    try:
+        with open(file_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+            for page_num in range(start, stop):
+                try:
+                    text = reader.pages[page_num].extract_text() or ""
+                except Exception:
+                    if strategy == "pypdf":
+                        raise
+                    text = ""
+                if strategy == "adaptive" and _looks_garbled(text):
+                    if plumber is None:
+                        plumber = pdfplumber.open(file_path)
+                    yield PageRecord(page_num + 1, _plumber_page_text(plumber.pages[page_num]), "pdfplumber")
+                else:
+                    yield PageRecord(page_num + 1, text, "pypdf")
+    finally:
+        if plumber is not None:
+            plumber.close()
+
+
+class _TextAssembler:
+    """
+    Joins non-empty pages with blank lines. Pages are described by offsets
+    into the joined text instead of holding a second copy of it.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.pages: List[Dict] = []
+        self.length = 0
+
+    def add(self, record: PageRecord):
+        if not record.text:
+            return
+        if self.parts:
+            self.parts.append("\n\n")
+            self.length += 2
+        self.pages.append({
+            'page_number': record.page_number,
+            'start': self.length,
+            'char_count': len(record.text)
+        })
+        self.parts.append(record.text)
+        self.length += len(record.text)
+
+    def result(self, info: Dict) -> Dict:
+        text = "".join(self.parts)
+        self.parts = []
+        return {
+            'text': text,
+            'pages': self.pages,
+            'doc_metadata': {**info, 'total_chars': len(text)}
+        }
+
+
+def _with_page_headers(records: Iterable[PageRecord]) -> Tuple[str, int]:
+    parts = []
+    for record in records:
+        parts.append(f"\n--- Page {record.page_number} ---\n")
+        parts.append(record.text)
+    return "".join(parts), len(parts) // 2
+
+
+def _extract_pypdf(file_path: str) -> Tuple[str, int]:
+    """PyPDF2 extraction in one call; module-level so it can run in a worker process"""
+    return _with_page_headers(iter_page_records(file_path, "pypdf"))
+
+
+def _extract_pdfplumber(file_path: str) -> Tuple[str, int]:
+    """pdfplumber extraction in one call; module-level so it can run in a worker process"""
+    return _with_page_headers(iter_page_records(file_path, "pdfplumber"))
+
+
+def _read_info(file_path: str) -> Dict:
+    """Page count and document metadata, without extracting any text"""
+    with pdfplumber.open(file_path) as pdf:
+        metadata = pdf.metadata
+        return {
+            'title': metadata.get('Title', ''),
+            'author': metadata.get('Author', ''),
+            'subject': metadata.get('Subject', ''),
+            'num_pages': len(pdf.pages)
+        }
+
+
+def _extract_with_metadata(file_path: str) -> Dict:
+    """Text, page offsets and document metadata in one serial pass"""
+    assembler = _TextAssembler()
+    for record in iter_page_records(file_path, "pdfplumber"):
+        assembler.add(record)
+    return assembler.result(_read_info(file_path))
+
+
+def _extract_page_range(file_path: str, start: int, stop: int, strategy: str = "adaptive") -> List[PageRecord]:
+    """Pages [start, stop); module-level so each process-pool worker extracts its own range"""
+    return list(iter_page_records(file_path, strategy, start, stop))
+
 
 class PDFProcessor:
-    """Process PDF files and extract text"""
+    """
+    Process PDF files and extract text.
+    Parsing is CPU-bound, so it runs on the process pool, not the event loop.
+    """
     
     @staticmethod
     async def extract_text_pypdf(file_path: str) -> str:
         """Extract text using PyPDF2 (faster but less accurate)"""
         try:
-            text = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text += f"\n--- Page {page_num + 1} ---\n"
-                    text += page.extract_text()
-            
-            logger.info("PDF text extracted (PyPDF2)", pages=len(pdf_reader.pages))
+            text, pages = _with_page_headers([
+                record async for record in PDFProcessor.iter_pages(file_path, strategy="pypdf")
+            ])
+            logger.info("PDF text extracted (PyPDF2)", pages=pages)
             return text
         except Exception as e:
             logger.error("PyPDF2 extraction failed", error=str(e))
@@ -36,56 +211,99 @@ class PDFProcessor:
     async def extract_text_pdfplumber(file_path: str) -> str:
         """Extract text using pdfplumber (slower but more accurate)"""
         try:
-            text = ""
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    text += f"\n--- Page {page_num + 1} ---\n"
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
-            
-            logger.info("PDF text extracted (pdfplumber)", pages=len(pdf.pages))
+            text, pages = _with_page_headers([
+                record async for record in PDFProcessor.iter_pages(file_path, strategy="pdfplumber")
+            ])
+            logger.info("PDF text extracted (pdfplumber)", pages=pages)
             return text
         except Exception as e:
             logger.error("pdfplumber extraction failed", error=str(e))
             raise
     
     @staticmethod
-    async def extract_with_metadata(file_path: str) -> Dict:
-        """Extract text with metadata"""
+    async def extract_with_metadata(file_path: str, parallel: Optional[bool] = None) -> Dict:
+        """
+        Extract text with metadata: {'text', 'pages', 'doc_metadata'}.
+        Each page is {'page_number', 'start', 'char_count'}; its text is
+        text[start:start + char_count].
+        parallel (default PDF_PARALLEL_EXTRACTION): split the pages into one
+        range per process-pool worker and extract the ranges concurrently
+        """
+        if parallel is None:
+            parallel = settings.PDF_PARALLEL_EXTRACTION
         try:
-            with pdfplumber.open(file_path) as pdf:
-                metadata = pdf.doc_metadata 
-                num_pages = len(pdf.pages)
-                
-                # Extract text with page boundaries
-                pages_content = []
-                for page_num, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        pages_content.append({
-                            'page_number': page_num + 1,
-                            'text': page_text,
-                            'char_count': len(page_text)
-                        })
-                
-                full_text = "\n\n".join([p['text'] for p in pages_content])
-                
-                return {
-                    'text': full_text,
-                    'pages': pages_content,
-                    'doc_metadata': {
-                        'title': metadata.get('Title', ''),
-                        'author': metadata.get('Author', ''),
-                        'subject': metadata.get('Subject', ''),
-                        'num_pages': num_pages,
-                        'total_chars': len(full_text)
-                    }
-                }
+            if not parallel:
+                return await run_cpu(_extract_with_metadata, file_path)
+
+            info = await PDFProcessor.read_info(file_path)
+            num_pages = info['num_pages']
+            assembler = _TextAssembler()
+            async for record in PDFProcessor.iter_pages(
+                file_path, num_pages,
+                batch_size=max(1, math.ceil(num_pages / cpu_workers())),
+                parallelism=cpu_workers()
+            ):
+                assembler.add(record)
+            return assembler.result(info)
         except Exception as e:
             logger.error("PDF metadata extraction failed", error=str(e))
             raise
     
+    @staticmethod
+    async def read_info(file_path: str) -> Dict:
+        """Page count and document metadata"""
+        return await run_cpu(_read_info, file_path)
+
+    @staticmethod
+    async def iter_pages(
+        file_path: str,
+        num_pages: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        parallelism: Optional[int] = None,
+        strategy: Optional[str] = None
+    ) -> AsyncIterator[PageRecord]:
+        """
+        Yield PageRecords in page order. Ranges of batch_size pages are
+        extracted on the process pool, up to `parallelism` (default: the
+        pool size) ranges ahead of the consumer, so consumers can start on
+        the first pages while later ones are still being parsed and at most
+        parallelism * batch_size pages are held at once.
+        """
+        if num_pages is None:
+            num_pages = (await PDFProcessor.read_info(file_path))['num_pages']
+        batch_size = batch_size or settings.INGEST_PDF_PAGE_BATCH
+        parallelism = parallelism or cpu_workers()
+        strategy = strategy or settings.PDF_EXTRACT_STRATEGY
+        starts = iter(range(0, num_pages, batch_size))
+        pending: deque = deque()
+
+        def submit():
+            start = next(starts, None)
+            if start is not None:
+                pending.append((start, asyncio.ensure_future(
+                    run_cpu(_extract_page_range, file_path, start, start + batch_size, strategy)
+                )))
+
+        for _ in range(parallelism):
+            submit()
+        try:
+            while pending:
+                start, future = pending.popleft()
+                try:
+                    records = await future
+                except Exception as e:
+                    logger.error("PDF page extraction failed", start_page=start + 1, error=str(e))
+                    raise
+                submit()
+                for record in records:
+                    PDF_PAGES_EXTRACTED.labels(extractor=record.extractor).inc()
+                    yield record
+                del records
+        finally:
+            # Consumer stopped early or a range failed: don't leave ranges running
+            for _, future in pending:
+                future.cancel()
+
     @staticmethod
     async def extract_text(file_path: str, method: str = 'pdfplumber') -> str:
         """
@@ -105,33 +323,12 @@ class TextChunker:
     @staticmethod
     def chunk_by_tokens(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """
-        Split text into overlapping chunks by approximate token count
-        1 token ≈ 4 characters
+        Split text into overlapping chunks of about chunk_size tokens,
+        cutting at paragraph, sentence or word boundaries (see services.chunker)
         """
-        char_chunk_size = chunk_size * 4
-        char_overlap = overlap * 4
-        
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            end = start + char_chunk_size
-            
-            # Don't cut in the middle of a word
-            if end < text_length:
-                # Find last space before end
-                while end > start and text[end] not in [' ', '\n', '.', '!', '?']:
-                    end -= 1
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            start = end - char_overlap
-        
+        chunks = TokenChunker(chunk_size, overlap).chunk(text)
         logger.info("Text chunked", num_chunks=len(chunks), chunk_size=chunk_size)
-        return chunks
+        return [chunk.text for chunk in chunks]
     
     @staticmethod
     def chunk_by_paragraphs(text: str, max_chunk_size: int = 2000) -> List[str]:
@@ -155,4 +352,4 @@ class TextChunker:
         if current_chunk:
             chunks.append(current_chunk)
         
-        return chunks
\ No newline at end of file
+        return chunks
@@ -4,6 +4,8 @@ from neo4j import GraphDatabase
 from langchain.graphs import Neo4jGraph
 from langchain.chains import GraphCypherQAChain
 from langchain.llms import OpenAI
+from core.executors import run_io
+from services.neo4j_service import graph_write_batches
 
 class GraphRAG:
     def __init__(self):
@@ -26,25 +28,27 @@ class GraphRAG:
         # Extract entities and relationships
         entities = await self.extract_entities(content)
         
-        # Create nodes and relationships in Neo4j
+        # Create nodes and relationships in Neo4j (sync driver: off the event loop)
+        await run_io(self._write_graph, document_id, entities)
+
+    def _write_graph(self, document_id: str, entities: Dict):
+        # Batched UNWIND writes in one transaction, shared with Neo4jService
+        statements = list(graph_write_batches(
+            document_id,
+            entities.get("entities", []),
+            entities.get("relationships", [])
+        ))
+
+        def write(tx):
+            for query, parameters in statements:
+                tx.run(query, parameters).consume()
+
         with self.driver.session() as session:
-            for entity in entities:
-                session.run("""
-                    MERGE (e:Entity {name: $name, type: $type})
-                    SET e.document_id = $doc_id
-                """, name=entity["name"], type=entity["type"], doc_id=document_id)
-            
-            # Create relationships
-            for rel in entities.get("relationships", []):
-                session.run("""
-                    MATCH (a:Entity {name: $source})
-                    MATCH (b:Entity {name: $target})
-                    MERGE (a)-[r:RELATES_TO {type: $rel_type}]->(b)
-                """, source=rel["source"], target=rel["target"], rel_type=rel["type"])
+            session.execute_write(write)
     
     async def query(self, question: str, user_id: str) -> Dict:
-        # Query the knowledge graph
-        response = self.qa_chain.run(question)
+        # Query the knowledge graph (the chain makes blocking Neo4j and LLM calls)
+        response = await run_io(self.qa_chain.run, question)
         
         return {
             "answer": response.get("result", ""),
@@ -3,9 +3,17 @@ RAG (Retrieval-Augmented Generation) Service
 Combines vector search with LLM generation
 """
 
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import time
+
 from openai import AsyncOpenAI
+from prometheus_client import Counter, Histogram
 from services.vector_store import VectorStore
+from services.collection_cache import count_requests
+from services.lexical_index import lexical_store, reciprocal_rank_fusion
+from services.reranker import rerank_results
 from core.config import settings
 import structlog
 
@@ -13,88 +21,428 @@ logger = structlog.get_logger()
 
 openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
+RAG_SHARD_SEARCH_DURATION = Histogram(
+    'rag_shard_search_duration_seconds',
+    'Duration of one shard search in a multi-document query'
+)
+
+HYBRID_RETRIEVALS = Counter(
+    'rag_hybrid_retrievals_total',
+    'Hybrid retrievals by how they were answered',
+    ['path']  # path: fused/lexical_only/vector_only
+)
+
+SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided context.
+Use ONLY the information from the context to answer questions.
+If the answer cannot be found in the context, say "I cannot find this information in the document."
+Cite the chunk number when referencing information."""
+
+LIBRARY_SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on excerpts from several documents.
+Use ONLY the information from the context to answer questions.
+If the answer cannot be found in the context, say "I cannot find this information in your documents."
+Cite the chunk number and document title when referencing information."""
+
+
+def citation(metadata: Optional[Dict]) -> Dict:
+    """
+    Where a chunk sits in its document, from its index metadata. Chunks
+    stored before page ranges were recorded only carry 'page' (and no offsets).
+    """
+    metadata = metadata or {}
+    page_start = metadata.get('page_start', metadata.get('page'))
+    return {
+        'chunk_index': metadata.get('chunk_index'),
+        'page_start': page_start,
+        'page_end': metadata.get('page_end', page_start),
+        'char_start': metadata.get('char_start'),
+        'char_end': metadata.get('char_end'),
+    }
+
 
 class RAGService:
     """Handle RAG queries"""
-    
+
+    @staticmethod
+    async def _generate_answer(system_prompt: str, user_prompt: str) -> Dict:
+        """Call the LLM and return the answer with token usage and cost"""
+        response = await openai_client.chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=500
+        )
+
+        # Calculate costs (approximate)
+        input_tokens = response.usage.prompt_tokens
+        output_tokens = response.usage.completion_tokens
+
+        # GPT-4 pricing (as of 2024)
+        input_cost = (input_tokens / 1000) * 0.03  # $0.03 per 1K tokens
+        output_cost = (output_tokens / 1000) * 0.06  # $0.06 per 1K tokens
+        total_cost = input_cost + output_cost
+
+        return {
+            'answer': response.choices[0].message.content,
+            'usage': {
+                'input_tokens': input_tokens,
+                'output_tokens': output_tokens,
+                'total_tokens': response.usage.total_tokens,
+                'cost_usd': round(total_cost, 4)
+            }
+        }
+
+    @staticmethod
+    async def hybrid_search(
+        document_id: int,
+        question: str,
+        n_results: int = 5,
+        user_id: Optional[int] = None
+    ) -> Dict:
+        """
+        BM25 + vector retrieval fused with reciprocal rank fusion.
+
+        The lexical side runs in-process first. If its best hit contains
+        (nearly) all of the query's IDF weight and clearly beats the
+        runner-up, the query embedding and vector search are skipped.
+        Documents without a lexical index fall back to vector search.
+        """
+        candidates = max(n_results, settings.HYBRID_CANDIDATES)
+        lexical = await lexical_store.search(document_id, question, candidates)
+
+        if lexical is not None and lexical['chunks']:
+            scores = lexical['scores']
+            runner_up = scores[1] if len(scores) > 1 else 0.0
+            if (lexical['coverage'] >= settings.HYBRID_CONFIDENT_COVERAGE
+                    and scores[0] >= settings.HYBRID_CONFIDENT_MARGIN * runner_up):
+                HYBRID_RETRIEVALS.labels(path="lexical_only").inc()
+                return {
+                    'chunks': lexical['chunks'][:n_results],
+                    'distances': [None] * min(n_results, len(scores)),
+                    'metadatas': lexical['metadatas'][:n_results],
+                    'retrieval': {'method': 'hybrid', 'path': 'lexical_only'}
+                }
+
+        dense = await VectorStore.similarity_search(
+            document_id=document_id,
+            query=question,
+            n_results=candidates,
+            user_id=user_id
+        )
+        if lexical is None or not lexical['chunks']:
+            HYBRID_RETRIEVALS.labels(path="vector_only").inc()
+            return {
+                'chunks': dense['chunks'][:n_results],
+                'distances': dense['distances'][:n_results],
+                'metadatas': dense['metadatas'][:n_results],
+                'retrieval': {'method': 'hybrid', 'path': 'vector_only'}
+            }
+
+        # Chunks are keyed by text: identical in both stores, and present
+        # for collections written before chunk_index was tagged
+        hits = {}
+        for chunk, metadata in zip(lexical['chunks'], lexical['metadatas']):
+            hits[chunk] = {'distance': None, 'metadata': metadata}
+        for chunk, distance, metadata in zip(dense['chunks'], dense['distances'], dense['metadatas']):
+            hits[chunk] = {'distance': distance, 'metadata': metadata}
+
+        fused = reciprocal_rank_fusion(
+            [lexical['chunks'], dense['chunks']], k=settings.HYBRID_RRF_K
+        )[:n_results]
+
+        HYBRID_RETRIEVALS.labels(path="fused").inc()
+        return {
+            'chunks': [chunk for chunk, _ in fused],
+            'distances': [hits[chunk]['distance'] for chunk, _ in fused],
+            'metadatas': [hits[chunk]['metadata'] for chunk, _ in fused],
+            'retrieval': {
+                'method': 'hybrid',
+                'path': 'fused',
+                'rrf_scores': [round(score, 6) for _, score in fused]
+            }
+        }
+
     @staticmethod
     async def query_document(
         document_id: int,
         question: str,
-        n_results: int = 5
+        n_results: int = 5,
+        user_id: Optional[int] = None,
+        method: str = "vector",
+        rerank: Optional[bool] = None
     ) -> Dict:
         """
         Perform RAG query:
-        1. Search for relevant chunks
-        2. Construct prompt with context
-        3. Generate answer using LLM
+        1. Search for relevant chunks (method: "vector" or "hybrid")
+        2. Optionally rerank over-fetched candidates, keeping the best few
+        3. Construct prompt with context
+        4. Generate answer using LLM
         """
         try:
-            # Step 1: Similarity search
-            search_results = await VectorStore.similarity_search(
-                document_id=document_id,
-                query=question,
-                n_results=n_results
-            )
-            
-            # Step 2: Construct context
+            rerank = settings.RERANK_ENABLED if rerank is None else rerank
+            fetch = n_results * settings.RERANK_OVERFETCH if rerank else n_results
+
+            # Step 1: Retrieval
+            if method == "hybrid":
+                search_results = await RAGService.hybrid_search(
+                    document_id=document_id,
+                    question=question,
+                    n_results=fetch,
+                    user_id=user_id
+                )
+            else:
+                search_results = await VectorStore.similarity_search(
+                    document_id=document_id,
+                    query=question,
+                    n_results=fetch,
+                    user_id=user_id
+                )
+
+            # Step 2: Rerank
+            retrieval = dict(search_results.get('retrieval', {'method': method}))
+            if rerank:
+                search_results = await rerank_results(
+                    question, search_results, min(n_results, settings.RERANK_TOP_N)
+                )
+                retrieval['rerank'] = search_results['rerank']
+
+            # Step 3: Construct context
             context = "\n\n".join([
-                f"[Chunk {i+1}]:\n{chunk}" 
+                f"[Chunk {i+1}]:\n{chunk}"
                 for i, chunk in enumerate(search_results['chunks'])
             ])
-            
-            # Step 3: Generate answer
-            system_prompt = """You are a helpful assistant that answers questions based on the provided context.
-Use ONLY the information from the context to answer questions.
-If the answer cannot be found in the context, say "I cannot find this information in the document."
-Cite the chunk number when referencing information."""
-            
+
+            # Step 4: Generate answer
             user_prompt = f"""Context from document:
 {context}
 
 Question: {question}
 
 Answer:"""
-            
-            response = await openai_client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-            
-            answer = response.choices[0].message.content
-            
-            # Calculate costs (approximate)
-            input_tokens = response.usage.prompt_tokens
-            output_tokens = response.usage.completion_tokens
-            
-            # GPT-4 pricing (as of 2024)
-            input_cost = (input_tokens / 1000) * 0.03  # $0.03 per 1K tokens
-            output_cost = (output_tokens / 1000) * 0.06  # $0.06 per 1K tokens
-            total_cost = input_cost + output_cost
-            
+
+            generation = await RAGService._generate_answer(SYSTEM_PROMPT, user_prompt)
+            usage = generation['usage']
+
             logger.info("RAG query completed",
                        document_id=document_id,
-                       input_tokens=input_tokens,
-                       output_tokens=output_tokens,
-                       cost_usd=round(total_cost, 4))
-            
+                       method=method,
+                       reranked=rerank,
+                       input_tokens=usage['input_tokens'],
+                       output_tokens=usage['output_tokens'],
+                       cost_usd=usage['cost_usd'])
+
             return {
-                'answer': answer,
+                'answer': generation['answer'],
                 'context_chunks': search_results['chunks'],
                 'distances': search_results['distances'],
-                'usage': {
-                    'input_tokens': input_tokens,
-                    'output_tokens': output_tokens,
-                    'total_tokens': response.usage.total_tokens,
-                    'cost_usd': round(total_cost, 4)
-                }
+                'sources': [
+                    {**citation(metadata), 'distance': distance}
+                    for distance, metadata in zip(search_results['distances'], search_results['metadatas'])
+                ],
+                'retrieval': retrieval,
+                'usage': usage
             }
-            
+
         except Exception as e:
             logger.error("RAG query failed", error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def _plan_shards(document_ids: List[int]) -> List[List[int]]:
+        """
+        Split documents into searchable shards.
+        Pooled collections answer many documents per query ($in filter);
+        per-document collections need one query per document.
+        """
+        if not VectorStore.is_pooled():
+            return [[document_id] for document_id in document_ids]
+
+        size = settings.RAG_MAX_DOCUMENTS_PER_SHARD
+        return [document_ids[i:i + size] for i in range(0, len(document_ids), size)]
+
+    @staticmethod
+    async def search_documents(
+        document_ids: List[int],
+        question: str,
+        user_id: int,
+        n_results: int = 5,
+        owners: Optional[Dict[int, int]] = None
+    ) -> Dict:
+        """
+        Search many documents concurrently and keep the global top-k.
+
+        The query is embedded once, shards are searched in parallel under
+        a semaphore, and hits are merged with a heap on distance.
+        owners: user id whose collection holds each document (per_user
+        mode), when it isn't user_id (documents shared by deduplication).
+        """
+        query_embedding = (await VectorStore.create_embeddings([question]))[0]
+        semaphore = asyncio.Semaphore(settings.RAG_SEARCH_CONCURRENCY)
+
+        async def search_shard(shard: List[int], owner: int) -> Dict:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    results = await VectorStore.search_documents(
+                        document_ids=shard,
+                        query=question,
+                        n_results=n_results,
+                        user_id=owner,
+                        query_embedding=query_embedding
+                    )
+                    error = None
+                except Exception as e:
+                    # One bad shard (e.g. a missing collection) shouldn't sink the query
+                    results = {'chunks': [], 'distances': [], 'metadatas': []}
+                    error = str(e)
+                duration = time.perf_counter() - start
+                RAG_SHARD_SEARCH_DURATION.observe(duration)
+
+            hits = []
+            for chunk, distance, metadata in zip(
+                results['chunks'], results['distances'], results['metadatas']
+            ):
+                metadata = dict(metadata or {})
+                if len(shard) == 1:
+                    # Legacy per-document collections may lack the tag
+                    metadata.setdefault('document_id', shard[0])
+                hits.append((distance, chunk, metadata))
+            timing = {
+                'document_ids': shard,
+                'hits': len(hits),
+                'duration_ms': round(duration * 1000, 2)
+            }
+            if error:
+                timing['error'] = error
+            return {'hits': hits, 'timing': timing}
+
+        # A shard never spans two owners' collections
+        by_owner: Dict[int, List[int]] = {}
+        for document_id in document_ids:
+            by_owner.setdefault((owners or {}).get(document_id, user_id), []).append(document_id)
+
+        # Shard tasks share one tally, so this counts the whole query
+        with count_requests("library_search") as requests:
+            shard_results = await asyncio.gather(*[
+                search_shard(shard, owner)
+                for owner, ids in by_owner.items()
+                for shard in RAGService._plan_shards(ids)
+            ])
+
+        # Global top-k across shards (each shard is already locally top-k)
+        top = heapq.nsmallest(
+            n_results,
+            (hit for result in shard_results for hit in result['hits']),
+            key=lambda hit: hit[0]
+        )
+
+        return {
+            'chunks': [chunk for _, chunk, _ in top],
+            'distances': [distance for distance, _, _ in top],
+            'metadatas': [metadata for _, _, metadata in top],
+            'shards': [result['timing'] for result in shard_results],
+            'vector_requests': requests[0]
+        }
+
+    @staticmethod
+    async def query_documents(
+        document_ids: List[int],
+        question: str,
+        user_id: int,
+        n_results: int = 5,
+        titles: Optional[Dict[int, str]] = None,
+        rerank: Optional[bool] = None,
+        artifact_keys: Optional[Dict[int, Tuple[int, int]]] = None
+    ) -> Dict:
+        """
+        Perform a RAG query across several documents:
+        1. Search all documents concurrently, merge to a global top-k
+        2. Optionally rerank over-fetched candidates, keeping the best few
+        3. Construct one prompt labelled with document titles
+        4. Generate answer using LLM
+
+        artifact_keys: document id -> Document.artifact_key, for documents
+        whose vectors are stored under another (deduplicated) document
+        """
+        try:
+            rerank = settings.RERANK_ENABLED if rerank is None else rerank
+            fetch = n_results * settings.RERANK_OVERFETCH if rerank else n_results
+
+            # Search by artifact key; hits map back to the caller's document ids
+            keys = {document_id: (artifact_keys or {}).get(document_id, (document_id, user_id))
+                    for document_id in document_ids}
+            aliases: Dict[int, int] = {}
+            owners: Dict[int, int] = {}
+            for document_id, (key_id, key_user_id) in keys.items():
+                aliases.setdefault(key_id, document_id)
+                owners[key_id] = key_user_id
+
+            start = time.perf_counter()
+            search_results = await RAGService.search_documents(
+                document_ids=list(owners),
+                question=question,
+                user_id=user_id,
+                n_results=fetch,
+                owners=owners
+            )
+            search_ms = round((time.perf_counter() - start) * 1000, 2)
+
+            retrieval = {'method': 'vector'}
+            if rerank:
+                search_results = await rerank_results(
+                    question, search_results, min(n_results, settings.RERANK_TOP_N)
+                )
+                retrieval['rerank'] = search_results['rerank']
+
+            titles = titles or {}
+            sources = []
+            context_parts = []
+            for i, (chunk, distance, metadata) in enumerate(zip(
+                search_results['chunks'], search_results['distances'], search_results['metadatas']
+            )):
+                document_id = aliases.get(metadata.get('document_id'), metadata.get('document_id'))
+                title = titles.get(document_id, f"Document {document_id}")
+                context_parts.append(f"[Chunk {i+1} - {title}]:\n{chunk}")
+                sources.append({
+                    'document_id': document_id,
+                    'title': title,
+                    **citation(metadata),
+                    'distance': distance,
+                    'metadata': metadata
+                })
+
+            context = "\n\n".join(context_parts)
+            user_prompt = f"""Context from documents:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+            generation = await RAGService._generate_answer(LIBRARY_SYSTEM_PROMPT, user_prompt)
+            usage = generation['usage']
+
+            logger.info("Multi-document RAG query completed",
+                       documents=len(document_ids),
+                       shards=len(search_results['shards']),
+                       search_ms=search_ms,
+                       reranked=rerank,
+                       vector_requests=search_results['vector_requests'],
+                       cost_usd=usage['cost_usd'])
+
+            return {
+                'answer': generation['answer'],
+                'context_chunks': search_results['chunks'],
+                'distances': search_results['distances'],
+                'sources': sources,
+                'shards': search_results['shards'],
+                'search_ms': search_ms,
+                'retrieval': retrieval,
+                'usage': usage
+            }
+
+        except Exception as e:
+            logger.error("Multi-document RAG query failed", error=str(e))
+            raise
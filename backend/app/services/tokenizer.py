@@ -0,0 +1,32 @@
+"""
+Tokenizer Utilities
+Token counting with tiktoken, falling back to an estimate
+when the BPE files cannot be loaded (e.g. air-gapped deployments)
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+from core.config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+
+@lru_cache(maxsize=1)
+def get_encoding() -> Optional[object]:
+    """Load the tiktoken encoding once per process (None if unavailable)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken unavailable, estimating tokens", error=str(e))
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text (1 token ≈ 4 characters when tiktoken is unavailable)"""
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode_ordinary(text))
+    return max(1, len(text) // 4)
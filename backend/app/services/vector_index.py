@@ -0,0 +1,643 @@
+"""
+Local Vector Index
+Embedded (in-process) vector storage with a ChromaDB-compatible surface
+
+Used when VECTOR_BACKEND=local, so similarity search is a NumPy matrix
+product instead of an HTTP round-trip to the Chroma server.
+
+On-disk layout (one directory per collection under VECTOR_DATA_DIR):
+    manifest.json          collection metadata + ordered segment names
+    seg_<n>.npy            L2-normalised float32 vectors (memory-mapped on read)
+    seg_<n>.json           ids, documents and metadatas for the segment rows
+
+Every add writes a new immutable segment; deletes rewrite only the
+segments they touch; once there are too many segments they are merged.
+Search is exact cosine top-k over all segments. Each segment keeps
+posting lists for the owner keys of pooled collections (document_id,
+user_id), so equality and $in filters on them skip the metadata scan.
+
+The API and the ingestion workers share the directory: writes hold an
+exclusive flock on the collection's .lock file and start from the current
+manifest; reads reload the manifest (under a shared lock) whenever another
+process has replaced it.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+import structlog
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one process per data dir
+    fcntl = None
+
+logger = structlog.get_logger()
+
+LOCK_FILE = ".lock"
+
+# Merge segments once a collection has more than this many
+MAX_SEGMENTS = 32
+
+# Metadata keys with per-segment posting lists (value -> row indexes)
+INDEXED_KEYS = ("document_id", "user_id")
+
+_VALID_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+# ============================================================================
+# METADATA FILTERS (subset of Chroma's `where` syntax)
+# ============================================================================
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for op, expected in condition.items():
+        if op == "$eq" and not value == expected:
+            return False
+        if op == "$ne" and not value != expected:
+            return False
+        if op == "$in" and value not in expected:
+            return False
+        if op == "$nin" and value in expected:
+            return False
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > expected:
+                return False
+            if op == "$gte" and not value >= expected:
+                return False
+            if op == "$lt" and not value < expected:
+                return False
+            if op == "$lte" and not value <= expected:
+                return False
+    return True
+
+
+def match_where(metadata: Optional[Dict], where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma-style where clause against one metadata dict"""
+    if not where:
+        return True
+    metadata = metadata or {}
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(match_where(metadata, clause) for clause in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _write_json_atomic(path: Path, payload: Dict):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _write_npy_atomic(path: Path, array: np.ndarray):
+    tmp = path.with_name(path.stem + ".tmp.npy")
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+# ============================================================================
+# SEGMENTS
+# ============================================================================
+
+class _Segment:
+    """One immutable batch of rows"""
+
+    def __init__(self, name: str, vectors: np.ndarray, records: Dict):
+        self.name = name
+        self.vectors = vectors
+        self.ids: List[str] = records["ids"]
+        self.documents: List[str] = records["documents"]
+        self.metadatas: List[Dict] = records["metadatas"]
+        self.all_rows = np.arange(len(self.ids), dtype=np.int64)
+
+        # Built once: segments are immutable
+        postings: Dict[str, Dict[Any, List[int]]] = {key: {} for key in INDEXED_KEYS}
+        for row, metadata in enumerate(self.metadatas):
+            metadata = metadata or {}
+            for key in INDEXED_KEYS:
+                value = metadata.get(key)
+                if isinstance(value, (str, int, float, bool, type(None))):
+                    postings[key].setdefault(value, []).append(row)
+        self.postings: Dict[str, Dict[Any, np.ndarray]] = {
+            key: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+            for key, values in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _posting_rows(self, key: str, condition: Any) -> Optional[np.ndarray]:
+        """Rows for an equality / $in clause on an indexed key; None if the clause needs a scan"""
+        if key not in INDEXED_KEYS:
+            return None
+        if isinstance(condition, dict):
+            if len(condition) != 1:
+                return None
+            (op, expected), = condition.items()
+            if op == "$eq":
+                values = [expected]
+            elif op == "$in" and isinstance(expected, (list, tuple)):
+                values = list(expected)
+            else:
+                return None
+        else:
+            values = [condition]
+
+        postings = self.postings[key]
+        try:
+            found = [postings[value] for value in set(values) if value in postings]
+        except TypeError:  # unhashable value: never a posting key
+            return None
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return found[0] if len(found) == 1 else np.sort(np.concatenate(found))
+
+    def rows_matching(self, where: Optional[Dict]) -> np.ndarray:
+        """Row indexes matching a where clause, ascending"""
+        if not where:
+            return self.all_rows
+
+        # Top-level and $and clauses: posting lists first, then scan what's left
+        clauses, pending = [], [where]
+        while pending:
+            for key, condition in pending.pop().items():
+                if key == "$and":
+                    pending.extend(condition)
+                else:
+                    clauses.append((key, condition))
+
+        rows, rest = None, []
+        for key, condition in clauses:
+            posting = self._posting_rows(key, condition)
+            if posting is None:
+                rest.append({key: condition})
+            else:
+                rows = posting if rows is None else np.intersect1d(rows, posting, assume_unique=True)
+        if rest:
+            rest_where = {"$and": rest}
+            candidates = self.all_rows if rows is None else rows
+            rows = np.asarray(
+                [row for row in candidates.tolist() if match_where(self.metadatas[row], rest_where)],
+                dtype=np.int64
+            )
+        return rows
+
+    def vectors_for(self, rows: np.ndarray) -> np.ndarray:
+        """Vectors of the given rows; a view (no copy out of the mmap) when they are contiguous"""
+        if len(rows) == len(self.ids):
+            return self.vectors
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            return self.vectors[rows[0]:rows[-1] + 1]
+        return self.vectors[rows]
+
+
+class LocalCollection:
+    """A named set of vectors, documents and metadata (Chroma Collection API subset)"""
+
+    def __init__(self, name: str, path: Path, metadata: Optional[Dict] = None):
+        self.name = name
+        self.path = path
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._stamp: Optional[Tuple[int, int, int]] = None  # manifest last read or written
+
+        path.mkdir(parents=True, exist_ok=True)
+        with self._file_lock(exclusive=True):
+            if (path / "manifest.json").exists():
+                self._read_manifest()
+            else:
+                self.metadata = metadata or {}
+                self._next_segment = 0
+                self._save_manifest()
+
+    # ----- cross-process consistency -----------------------------------------
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """flock on the collection's lock file (a separate fd, so it also excludes threads of this process)"""
+        if fcntl is None:
+            yield
+            return
+        try:
+            f = open(self.path / LOCK_FILE, "a+")
+        except FileNotFoundError:
+            raise ValueError(f"Collection {self.name} does not exist.")
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _manifest_stamp(self) -> Tuple[int, int, int]:
+        # The manifest is replaced, never rewritten in place: a new inode each time
+        try:
+            stat = os.stat(self.path / "manifest.json")
+        except FileNotFoundError:
+            raise ValueError(f"Collection {self.name} does not exist.")
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_manifest(self):
+        with open(self.path / "manifest.json", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._stamp = self._manifest_stamp()
+        self.metadata = manifest.get("metadata") or {}
+        self._next_segment = manifest.get("next_segment", 0)
+        # Segments are immutable and never renamed: keep the ones already loaded
+        loaded = {segment.name: segment for segment in self._segments}
+        self._segments = [
+            loaded.get(segment_name) or self._load_segment(segment_name)
+            for segment_name in manifest.get("segments", [])
+        ]
+
+    def _sync(self):
+        """Reload the manifest if another process replaced it (call holding self._lock)"""
+        if self._manifest_stamp() != self._stamp:
+            with self._file_lock(exclusive=False):
+                self._read_manifest()
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive access for a write, starting from the current manifest"""
+        with self._lock, self._file_lock(exclusive=True):
+            if self._manifest_stamp() != self._stamp:
+                self._read_manifest()
+            yield
+
+    # ----- persistence ------------------------------------------------------
+
+    def _load_segment(self, name: str) -> _Segment:
+        vectors = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        with open(self.path / f"{name}.json", encoding="utf-8") as f:
+            records = json.load(f)
+        return _Segment(name, vectors, records)
+
+    def _write_segment(self, vectors: np.ndarray, ids: List[str],
+                       documents: List[str], metadatas: List[Dict]) -> _Segment:
+        name = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        records = {"ids": ids, "documents": documents, "metadatas": metadatas}
+        _write_npy_atomic(self.path / f"{name}.npy", np.ascontiguousarray(vectors, dtype=np.float32))
+        _write_json_atomic(self.path / f"{name}.json", records)
+        return self._load_segment(name)
+
+    def _remove_segment_files(self, name: str):
+        for suffix in (".npy", ".json"):
+            try:
+                (self.path / f"{name}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+
+    def _save_manifest(self):
+        _write_json_atomic(self.path / "manifest.json", {
+            "name": self.name,
+            "metadata": self.metadata,
+            "next_segment": self._next_segment,
+            "segments": [segment.name for segment in self._segments],
+        })
+        self._stamp = self._manifest_stamp()
+
+    def _compact(self):
+        """Merge all segments into one"""
+        if len(self._segments) <= 1:
+            return
+        old = self._segments
+        merged = self._write_segment(
+            np.concatenate([np.asarray(s.vectors) for s in old]),
+            [i for s in old for i in s.ids],
+            [d for s in old for d in s.documents],
+            [m for s in old for m in s.metadatas],
+        )
+        self._segments = [merged]
+        self._save_manifest()
+        for segment in old:
+            self._remove_segment_files(segment.name)
+        logger.info("Local collection compacted", collection=self.name, rows=len(merged))
+
+    # ----- writes -----------------------------------------------------------
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict]] = None
+    ):
+        """Add rows; ids must not already exist"""
+        with self._writing():
+            existing = set(self._all_ids())
+            duplicates = [i for i in ids if i in existing]
+            if duplicates:
+                raise ValueError(f"IDs already exist in {self.name}: {duplicates[:5]}")
+            self._append(ids, embeddings, documents, metadatas)
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict]] = None
+    ):
+        """Add rows, replacing any rows with the same ids"""
+        replaced = set(ids)
+        with self._writing():
+            self._delete_rows(lambda segment, row: segment.ids[row] in replaced)
+            self._append(ids, embeddings, documents, metadatas)
+
+    def update(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict]] = None
+    ):
+        """
+        Change documents and/or metadata of existing rows, keeping their
+        vectors (metadata is merged, as in Chroma); unknown ids are ignored
+        """
+        changes = {
+            id_: (documents[i] if documents is not None else None, metadatas[i] if metadatas is not None else None)
+            for i, id_ in enumerate(ids)
+        }
+        with self._writing():
+            rewritten = []
+            for position, segment in enumerate(self._segments):
+                rows = [row for row, id_ in enumerate(segment.ids) if id_ in changes]
+                if not rows:
+                    continue
+                segment_documents = list(segment.documents)
+                segment_metadatas = list(segment.metadatas)
+                for row in rows:
+                    document, metadata = changes[segment.ids[row]]
+                    if document is not None:
+                        segment_documents[row] = document
+                    if metadata is not None:
+                        segment_metadatas[row] = {**(segment_metadatas[row] or {}), **metadata}
+                self._segments[position] = self._write_segment(
+                    np.asarray(segment.vectors), list(segment.ids), segment_documents, segment_metadatas
+                )
+                rewritten.append(segment.name)
+            if rewritten:
+                self._save_manifest()
+                for name in rewritten:
+                    self._remove_segment_files(name)
+
+    def _append(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError("embeddings must be a 2D array with one row per id")
+        dimension = self.metadata.get("dimension")
+        if dimension is not None and vectors.shape[1] != dimension:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match collection dimension {dimension}"
+            )
+        self.metadata["dimension"] = int(vectors.shape[1])
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        segment = self._write_segment(
+            vectors / norms,
+            list(ids),
+            list(documents) if documents is not None else [""] * len(ids),
+            list(metadatas) if metadatas is not None else [{} for _ in ids],
+        )
+        self._segments.append(segment)
+        self._save_manifest()
+
+        if len(self._segments) > MAX_SEGMENTS:
+            self._compact()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """Delete rows by id and/or metadata filter"""
+        id_set = set(ids) if ids is not None else None
+        matching: Dict[str, set] = {}
+
+        def should_delete(segment: _Segment, row: int) -> bool:
+            if id_set is not None and segment.ids[row] not in id_set:
+                return False
+            if not where:
+                return True
+            if segment.name not in matching:
+                matching[segment.name] = set(segment.rows_matching(where).tolist())
+            return row in matching[segment.name]
+
+        if id_set is None and not where:
+            return
+        with self._writing():
+            self._delete_rows(should_delete)
+
+    def _delete_rows(self, predicate):
+        changed = False
+        remaining = []
+        for segment in self._segments:
+            keep = [row for row in range(len(segment)) if not predicate(segment, row)]
+            if len(keep) == len(segment):
+                remaining.append(segment)
+                continue
+            changed = True
+            if keep:
+                remaining.append(self._write_segment(
+                    np.asarray(segment.vectors)[keep],
+                    [segment.ids[row] for row in keep],
+                    [segment.documents[row] for row in keep],
+                    [segment.metadatas[row] for row in keep],
+                ))
+        if changed:
+            old = [s for s in self._segments if s not in remaining]
+            self._segments = remaining
+            self._save_manifest()
+            for segment in old:
+                self._remove_segment_files(segment.name)
+
+    # ----- reads ------------------------------------------------------------
+
+    def _all_ids(self) -> Iterable[str]:
+        for segment in self._segments:
+            yield from segment.ids
+
+    def count(self) -> int:
+        with self._lock:
+            self._sync()
+            return sum(len(segment) for segment in self._segments)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None
+    ) -> Dict:
+        """Fetch rows by id and/or metadata filter (paged with limit/offset)"""
+        include = include if include is not None else ["documents", "metadatas"]
+        id_set = set(ids) if ids is not None else None
+        result = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        skip = offset or 0
+
+        with self._lock:
+            self._sync()
+            for segment in self._segments:
+                for row in segment.rows_matching(where):
+                    if id_set is not None and segment.ids[row] not in id_set:
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    if limit is not None and len(result["ids"]) >= limit:
+                        break
+                    result["ids"].append(segment.ids[row])
+                    result["documents"].append(segment.documents[row])
+                    result["metadatas"].append(segment.metadatas[row])
+                    if "embeddings" in include:
+                        result["embeddings"].append(np.asarray(segment.vectors[row]).tolist())
+
+        for key in ("documents", "metadatas", "embeddings"):
+            if key not in include:
+                result[key] = None
+        return result
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        """Exact cosine top-k; distances are 1 - cosine similarity"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            self._sync()
+            segments = list(self._segments)
+
+        # Filtered once for all query vectors
+        candidates = []
+        for segment in segments:
+            rows = segment.rows_matching(where)
+            if len(rows):
+                candidates.append((segment, rows, segment.vectors_for(rows)))
+
+        for query in queries:
+            scores, owners = [], []
+            for segment, rows, vectors in candidates:
+                scores.append(np.asarray(vectors) @ query)
+                owners.append((segment, rows))
+
+            if not scores:
+                for key in result:
+                    result[key].append([])
+                continue
+
+            flat = np.concatenate(scores)
+            k = min(n_results, len(flat))
+            top = np.argpartition(-flat, k - 1)[:k]
+            top = top[np.argsort(-flat[top])]
+
+            # Map flat positions back to (segment, row)
+            offsets = np.cumsum([0] + [len(s) for s in scores])
+            ids, documents, metadatas, distances = [], [], [], []
+            for position in top:
+                owner = int(np.searchsorted(offsets, position, side="right") - 1)
+                segment, rows = owners[owner]
+                row = int(rows[position - offsets[owner]])
+                ids.append(segment.ids[row])
+                documents.append(segment.documents[row])
+                metadatas.append(segment.metadatas[row])
+                distances.append(float(1.0 - flat[position]))
+
+            result["ids"].append(ids)
+            result["documents"].append(documents)
+            result["metadatas"].append(metadatas)
+            result["distances"].append(distances)
+
+        return result
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class LocalVectorClient:
+    """Collection registry rooted at a data directory (Chroma client API subset)"""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> Path:
+        if not _VALID_NAME.match(name):
+            raise ValueError(f"Invalid collection name: {name}")
+        return self.data_dir / name
+
+    def get_collection(self, name: str) -> LocalCollection:
+        with self._lock:
+            path = self._path(name)
+            if not (path / "manifest.json").exists():
+                # Possibly deleted by another process: forget our handle too
+                self._collections.pop(name, None)
+                raise ValueError(f"Collection {name} does not exist.")
+            if name in self._collections:
+                return self._collections[name]
+            collection = LocalCollection(name, path)
+            self._collections[name] = collection
+            return collection
+
+    def create_collection(self, name: str, metadata: Optional[Dict] = None) -> LocalCollection:
+        with self._lock:
+            path = self._path(name)
+            if name in self._collections or (path / "manifest.json").exists():
+                raise ValueError(f"Collection {name} already exists.")
+            collection = LocalCollection(name, path, metadata)
+            self._collections[name] = collection
+            return collection
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None) -> LocalCollection:
+        try:
+            return self.get_collection(name)
+        except ValueError:
+            try:
+                return self.create_collection(name, metadata)
+            except ValueError:
+                # Lost a creation race; the winner's collection is usable
+                return self.get_collection(name)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            path = self._path(name)
+            if name not in self._collections and not path.exists():
+                raise ValueError(f"Collection {name} does not exist.")
+            self._collections.pop(name, None)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def list_collections(self) -> List[LocalCollection]:
+        return [
+            self.get_collection(path.name)
+            for path in sorted(self.data_dir.iterdir())
+            if (path / "manifest.json").exists()
+        ]
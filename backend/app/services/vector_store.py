@@ -1,13 +1,19 @@
 """
 Vector Store Service
 Handles embeddings and similarity search using ChromaDB
+(or the in-process local index when VECTOR_BACKEND=local)
 """
 
 from typing import List, Dict, Optional
+import hashlib
 
 from chromadb.config import Settings
-from openai import AsyncOpenAI
 from core.config import settings
+from core.executors import run_io
+from services.embedding_cache import embedding_cache
+from services.embedding_backend import get_embedding_backend
+from services.collection_cache import CollectionHandleCache, count_requests, record_request
+from services.vector_index import LocalVectorClient
 import structlog
 import chromadb
 from chromadb.config import Settings as ChromaSettings
@@ -15,108 +21,284 @@ from core.config import settings
 
 logger = structlog.get_logger()
 
-# Initialize OpenAI client
-openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
-# Initialize ChromaDB client
-chroma_client = chromadb.HttpClient(
-    host=settings.CHROMA_HOST,
-    port=settings.CHROMA_PORT,
-    settings=ChromaSettings(
-        anonymized_telemetry=False,
-        allow_reset=True
+def create_vector_client():
+    """Create the configured vector client (Chroma over HTTP or local index)"""
+    if settings.VECTOR_BACKEND == "local":
+        logger.info("Using local vector index", data_dir=settings.VECTOR_DATA_DIR)
+        return LocalVectorClient(settings.VECTOR_DATA_DIR)
+
+    if settings.VECTOR_BACKEND != "chroma":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+
+    return chromadb.HttpClient(
+        host=settings.CHROMA_HOST,
+        port=settings.CHROMA_PORT,
+        settings=ChromaSettings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
     )
+
+
+# Initialize vector client
+vector_client = create_vector_client()
+
+# Collection handles are cheap to keep and expensive to look up over HTTP
+collection_cache = CollectionHandleCache(
+    max_size=settings.VECTOR_COLLECTION_CACHE_SIZE,
+    ttl=settings.VECTOR_COLLECTION_CACHE_TTL
 )
 
+
 class VectorStore:
     """Manage document embeddings and similarity search"""
     
     @staticmethod
     async def create_embeddings(texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using OpenAI"""
+        """
+        Generate embeddings with the configured backend.
+        For remote backends, texts already in the embedding cache are
+        served from it; only the (deduplicated) misses are sent out.
+        """
         try:
-            response = await openai_client.embeddings.create(
-                model=settings.EMBEDDING_MODEL,
-                input=texts
-            )
-            embeddings = [item.embedding for item in response.data]
-            logger.info("Embeddings created", count=len(embeddings))
+            backend = get_embedding_backend()
+            model = backend.name
+            use_cache = settings.EMBEDDING_CACHE_ENABLED and backend.remote
+            if use_cache:
+                embeddings = await embedding_cache.get_many(model, texts)
+            else:
+                embeddings = [None] * len(texts)
+
+            cache_hits = sum(1 for embedding in embeddings if embedding is not None)
+            missing = list(dict.fromkeys(
+                text for text, embedding in zip(texts, embeddings) if embedding is None
+            ))
+
+            if missing:
+                vectors = await backend.embed(missing)
+                fresh = dict(zip(missing, vectors))
+                if use_cache:
+                    await embedding_cache.set_many(model, fresh)
+                embeddings = [
+                    embedding if embedding is not None else fresh[text]
+                    for text, embedding in zip(texts, embeddings)
+                ]
+
+            logger.info("Embeddings created",
+                       backend=model,
+                       count=len(embeddings),
+                       cache_hits=cache_hits,
+                       provider_inputs=len(missing))
             return embeddings
         except Exception as e:
             logger.error("Embedding creation failed", error=str(e))
             raise
     
     @staticmethod
-    def get_or_create_collection(document_id: int):
-        """Get or create a ChromaDB collection for a document"""
-        collection_name = f"doc_{document_id}"
-        try:
-            collection = chroma_client.get_collection(name=collection_name)
-            logger.info("Retrieved existing collection", collection=collection_name)
-        except:
-            collection = chroma_client.create_collection(
+    def collection_name(document_id: int, user_id: Optional[int] = None) -> str:
+        """
+        Resolve the collection holding a document's chunks.
+
+        per_document: one collection per document (doc_<id>)
+        shared:       every document in one collection, filtered by document_id
+        per_user:     one collection per owner (user_<id>), filtered by document_id
+        """
+        mode = settings.VECTOR_COLLECTION_MODE
+        if mode == "per_document":
+            return f"doc_{document_id}"
+        if mode == "shared":
+            return settings.VECTOR_SHARED_COLLECTION
+        if mode == "per_user":
+            if user_id is None:
+                raise ValueError("user_id is required in per_user collection mode")
+            return f"user_{user_id}"
+        raise ValueError(f"Unknown VECTOR_COLLECTION_MODE: {mode}")
+
+    @staticmethod
+    def is_pooled() -> bool:
+        """Whether collections hold more than one document"""
+        return settings.VECTOR_COLLECTION_MODE != "per_document"
+
+    @staticmethod
+    def document_filter(document_id: int) -> Optional[Dict]:
+        """Metadata filter scoping a pooled collection to one document"""
+        if not VectorStore.is_pooled():
+            return None
+        return {"document_id": document_id}
+
+    @staticmethod
+    def chunk_id(document_id: int, local_id: str) -> str:
+        """Chunk id, prefixed with the document when collections are pooled"""
+        if not VectorStore.is_pooled():
+            return local_id
+        return f"doc_{document_id}_{local_id}"
+
+    @staticmethod
+    def content_id(text: str, occurrence: int = 0) -> str:
+        """
+        Local chunk id derived from the chunk text, so an unchanged chunk
+        keeps its id across re-ingestions; occurrence tells apart repeats
+        of the same text within a document
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+        return f"c_{digest}" if occurrence == 0 else f"c_{digest}_{occurrence}"
+
+    @staticmethod
+    def get_or_create_collection(document_id: int, user_id: Optional[int] = None):
+        """
+        Get or create the vector collection holding a document.
+        Handles are cached by name, so only the first use (per TTL) costs a request.
+        """
+        collection_name = VectorStore.collection_name(document_id, user_id)
+
+        def load():
+            record_request(settings.VECTOR_BACKEND, "get_or_create_collection")
+            collection = vector_client.get_or_create_collection(
                 name=collection_name,
                 metadata={"hnsw:space": "cosine"}
             )
-            logger.info("Created new collection", collection=collection_name)
-        
-        return collection
-    
+            logger.info("Collection handle loaded", collection=collection_name)
+            return collection
+
+        return collection_cache.get_or_load(collection_name, load)
+
+    @staticmethod
+    async def get_collection_async(document_id: int, user_id: Optional[int] = None):
+        """Cached handle inline; a miss is loaded on the I/O pool"""
+        collection = collection_cache.get(VectorStore.collection_name(document_id, user_id))
+        if collection is not None:
+            return collection
+        return await run_io(VectorStore.get_or_create_collection, document_id, user_id)
+
+    @staticmethod
+    async def _call(collection, operation: str, **kwargs):
+        """Run a collection method off the loop, dropping the cached handle if it fails"""
+        record_request(settings.VECTOR_BACKEND, operation)
+        try:
+            return await run_io(getattr(collection, operation), **kwargs)
+        except Exception:
+            # The collection may have been deleted or recreated elsewhere
+            collection_cache.invalidate(collection.name)
+            raise
+
     @staticmethod
     async def add_document_chunks(
         document_id: int,
         chunks: List[str],
-        metadata: Optional[List[Dict]] = None
+        metadata: Optional[List[Dict]] = None,
+        user_id: Optional[int] = None,
+        embeddings: Optional[List[List[float]]] = None,
+        start_index: int = 0,
+        ids: Optional[List[str]] = None
     ):
-        """Add document chunks to vector store"""
+        """
+        Add document chunks to vector store.
+        Chunks can be written in batches: start_index is the position of the
+        first chunk in the document, and embeddings may be computed upstream.
+        ids: local chunk ids (see content_id); positional chunk_<i> by default.
+        """
         try:
-            collection = VectorStore.get_or_create_collection(document_id)
-            
-            # Generate embeddings
-            embeddings = await VectorStore.create_embeddings(chunks)
-            
-            # Prepare IDs and metadata
-            ids = [f"chunk_{i}" for i in range(len(chunks))]
-            metadatas = metadata or [{"chunk_index": i} for i in range(len(chunks))]
-            
-            # Add to collection
-            collection.add(
-                embeddings=embeddings,
-                documents=chunks,
-                ids=ids,
-                metadatas=metadatas
-            )
-            
+            with count_requests("add") as requests:
+                collection = await VectorStore.get_collection_async(document_id, user_id)
+
+                # Generate embeddings
+                if embeddings is None:
+                    embeddings = await VectorStore.create_embeddings(chunks)
+
+                # Prepare IDs and metadata (tagged with owner so pooled
+                # collections can be filtered per document or per user)
+                positions = range(start_index, start_index + len(chunks))
+                local_ids = ids or [f"chunk_{i}" for i in positions]
+                ids = [VectorStore.chunk_id(document_id, local_id) for local_id in local_ids]
+                metadatas = metadata or [{"chunk_index": i} for i in positions]
+                tags = {"document_id": document_id}
+                if user_id is not None:
+                    tags["user_id"] = user_id
+                metadatas = [{**m, **tags} for m in metadatas]
+
+                # Upsert, so a retried ingestion job doesn't trip over its earlier attempt
+                await VectorStore._call(
+                    collection,
+                    "upsert",
+                    embeddings=embeddings,
+                    documents=chunks,
+                    ids=ids,
+                    metadatas=metadatas
+                )
+
             logger.info("Chunks added to vector store", 
                        document_id=document_id, 
-                       count=len(chunks))
+                       collection=collection.name,
+                       count=len(chunks),
+                       vector_requests=requests[0])
             
         except Exception as e:
             logger.error("Failed to add chunks", error=str(e))
             raise
     
+    @staticmethod
+    async def get_stored_chunks(document_id: int, user_id: Optional[int] = None) -> Dict[str, Dict]:
+        """Ids (as stored) and metadata of every chunk already indexed for a document"""
+        with count_requests("get_stored_chunks"):
+            collection = await VectorStore.get_collection_async(document_id, user_id)
+            results = await VectorStore._call(
+                collection, "get", where=VectorStore.document_filter(document_id), include=["metadatas"]
+            )
+        return dict(zip(results['ids'], results['metadatas']))
+
+    @staticmethod
+    async def update_chunk_metadata(
+        document_id: int,
+        ids: List[str],
+        metadatas: List[Dict],
+        user_id: Optional[int] = None
+    ):
+        """Rewrite the metadata of stored chunks (ids as stored), keeping their vectors"""
+        if not ids:
+            return
+        with count_requests("update"):
+            collection = await VectorStore.get_collection_async(document_id, user_id)
+            await VectorStore._call(collection, "update", ids=ids, metadatas=metadatas)
+
+    @staticmethod
+    async def delete_chunks(document_id: int, ids: List[str], user_id: Optional[int] = None):
+        """Delete stored chunks by id (ids as stored)"""
+        if not ids:
+            return
+        with count_requests("delete_chunks"):
+            collection = await VectorStore.get_collection_async(document_id, user_id)
+            await VectorStore._call(collection, "delete", ids=ids)
+        logger.info("Chunks deleted", document_id=document_id, count=len(ids))
+
     @staticmethod
     async def similarity_search(
         document_id: int,
         query: str,
-        n_results: int = 5
+        n_results: int = 5,
+        user_id: Optional[int] = None
     ) -> Dict:
         """Search for similar chunks"""
         try:
-            collection = VectorStore.get_or_create_collection(document_id)
-            
-            # Generate query embedding
-            query_embedding = (await VectorStore.create_embeddings([query]))[0]
-            
-            # Search
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results
-            )
-            
+            with count_requests("similarity_search") as requests:
+                collection = await VectorStore.get_collection_async(document_id, user_id)
+
+                # Generate query embedding
+                query_embedding = (await VectorStore.create_embeddings([query]))[0]
+
+                # Search
+                results = await VectorStore._call(
+                    collection,
+                    "query",
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=VectorStore.document_filter(document_id)
+                )
+
             logger.info("Similarity search completed", 
                        document_id=document_id,
-                       results_count=len(results['documents'][0]))
+                       results_count=len(results['documents'][0]),
+                       vector_requests=requests[0])
             
             return {
                 'chunks': results['documents'][0],
@@ -127,13 +309,119 @@ class VectorStore:
         except Exception as e:
             logger.error("Similarity search failed", error=str(e))
             raise
+
+    @staticmethod
+    async def get_document_chunks(
+        document_id: int,
+        user_id: Optional[int] = None,
+        page: Optional[int] = None,
+        chunk_index: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Dict:
+        """
+        Fetch stored chunks by metadata rather than similarity: the chunks
+        spanning a page and/or one chunk by index, in document order.
+        Serves citations without reading the document's extracted text.
+        """
+        clauses = []
+        if VectorStore.is_pooled():
+            clauses.append({"document_id": document_id})
+        if page is not None:
+            clauses += [{"page_start": {"$lte": page}}, {"page_end": {"$gte": page}}]
+        if chunk_index is not None:
+            clauses.append({"chunk_index": chunk_index})
+        where = None if not clauses else clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+        try:
+            with count_requests("get_document_chunks") as requests:
+                collection = await VectorStore.get_collection_async(document_id, user_id)
+                results = await VectorStore._call(
+                    collection, "get", where=where, limit=limit, include=["documents", "metadatas"]
+                )
+
+            rows = sorted(
+                zip(results['documents'], results['metadatas']),
+                key=lambda row: row[1].get('chunk_index', 0)
+            )
+            logger.info("Document chunks fetched",
+                       document_id=document_id,
+                       page=page,
+                       results_count=len(rows),
+                       vector_requests=requests[0])
+            return {
+                'chunks': [chunk for chunk, _ in rows],
+                'metadatas': [metadata for _, metadata in rows]
+            }
+
+        except Exception as e:
+            logger.error("Chunk fetch failed", error=str(e))
+            raise
+
+    @staticmethod
+    async def search_documents(
+        document_ids: List[int],
+        query: str,
+        n_results: int = 5,
+        user_id: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> Dict:
+        """
+        Search several documents with a single collection query.
+        Pooled modes filter with $in; per_document mode takes one document.
+        Pass query_embedding to reuse one vector across several searches.
+        """
+        if not VectorStore.is_pooled() and len(document_ids) != 1:
+            raise ValueError("per_document collection mode searches one document per query")
+
+        try:
+            with count_requests("search_documents") as requests:
+                collection = await VectorStore.get_collection_async(document_ids[0], user_id)
+                if query_embedding is None:
+                    query_embedding = (await VectorStore.create_embeddings([query]))[0]
+
+                if len(document_ids) == 1:
+                    where = VectorStore.document_filter(document_ids[0])
+                else:
+                    where = {"document_id": {"$in": list(document_ids)}}
+
+                results = await VectorStore._call(
+                    collection,
+                    "query",
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=where
+                )
+
+            logger.info("Multi-document search completed",
+                       documents=len(document_ids),
+                       results_count=len(results['documents'][0]),
+                       vector_requests=requests[0])
+
+            return {
+                'chunks': results['documents'][0],
+                'distances': results['distances'][0],
+                'metadatas': results['metadatas'][0]
+            }
+
+        except Exception as e:
+            logger.error("Multi-document search failed", error=str(e))
+            raise
     
     @staticmethod
-    def delete_document_collection(document_id: int):
-        """Delete a document's vector collection"""
+    async def delete_document_collection(document_id: int, user_id: Optional[int] = None):
+        """Delete a document's vectors (its collection, or its rows in a pooled one)"""
         try:
-            collection_name = f"doc_{document_id}"
-            chroma_client.delete_collection(name=collection_name)
-            logger.info("Collection deleted", collection=collection_name)
+            collection_name = VectorStore.collection_name(document_id, user_id)
+            if VectorStore.is_pooled():
+                collection = await VectorStore.get_collection_async(document_id, user_id)
+                await VectorStore._call(collection, "delete", where=VectorStore.document_filter(document_id))
+                logger.info("Document vectors deleted",
+                           collection=collection_name,
+                           document_id=document_id)
+            else:
+                collection_cache.invalidate(collection_name)
+                record_request(settings.VECTOR_BACKEND, "delete_collection")
+                await run_io(vector_client.delete_collection, name=collection_name)
+                logger.info("Collection deleted", collection=collection_name)
         except Exception as e:
-            logger.error("Collection deletion failed", error=str(e))
\ No newline at end of file
+            logger.error("Collection deletion failed", error=str(e))
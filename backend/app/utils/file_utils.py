@@ -2,10 +2,14 @@
 File Upload and Processing Utilities
 """
 
+import codecs
 import os
 import hashlib
-from pathlib import Path
-from typing import Optional
+import tarfile
+import uuid
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator, BinaryIO, Iterator, NamedTuple, Optional, Tuple
 from fastapi import UploadFile
 import aiofiles
 from core.config import settings
@@ -37,39 +41,159 @@ def is_allowed_file(filename: str) -> bool:
     return get_file_extension(filename) in allowed_extensions
 
 
-async def save_upload_file(upload_file: UploadFile, user_id: int) -> tuple[str, str]:
+class UploadTooLarge(Exception):
+    """The upload went past MAX_UPLOAD_SIZE (raised as soon as it does)"""
+
+
+class UnsupportedUpload(Exception):
+    """The upload's content doesn't match an accepted type"""
+
+
+class StoredFile(NamedTuple):
+    file_path: str
+    file_hash: str
+    size: int
+    mime_type: str
+
+
+# Content type each accepted extension must sniff as
+ALLOWED_MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.txt': 'text/plain',
+    '.csv': 'text/plain',
+}
+
+# Bytes looked at to sniff the type
+SNIFF_BYTES = 4096
+
+
+def sniff_mime_type(head: bytes, complete: bool = True) -> Optional[str]:
     """
-    Save uploaded file to disk
-    Returns: (file_path, file_hash)
+    MIME type from the first bytes of a file: PDF by its signature, text
+    when it decodes as UTF-8 without control bytes; None otherwise.
+    complete=False: head is a prefix (it may end inside a character).
     """
+    if head.lstrip(b"\x00\t\n\r\x0c ")[:5] == b"%PDF-":
+        return "application/pdf"
     try:
-        # Read file content
-        content = await upload_file.read()
-        
-        # Generate hash for deduplication
-        file_hash = get_file_hash(content)
-        
-        # Create user-specific directory
-        user_dir = Path(settings.UPLOAD_DIR) / str(user_id)
-        user_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate safe filename
-        extension = get_file_extension(upload_file.filename)
-        safe_filename = f"{file_hash}{extension}"
-        file_path = user_dir / safe_filename
-        
-        # Save file
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(content)
-        
-        logger.info("File saved", path=str(file_path), size=len(content))
-        return str(file_path), file_hash
-        
-    except Exception as e:
-        logger.error("File save failed", error=str(e))
+        text = codecs.getincrementaldecoder("utf-8")().decode(head, final=complete)
+    except UnicodeDecodeError:
+        return None
+    if any(ord(char) < 32 and char not in "\t\n\r\x0c" for char in text):
+        return None
+    return "text/plain"
+
+
+def blob_path(file_hash: str) -> Path:
+    """Content-addressed location of a stored file"""
+    return Path(settings.UPLOAD_DIR) / "blobs" / file_hash[:2] / file_hash
+
+
+async def save_upload_file(
+    upload_file: UploadFile,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> StoredFile:
+    """
+    Stream an upload to disk, content-addressed: identical files share one
+    path (blobs/<hash[:2]>/<hash>) and are stored once. The type lives on
+    the Document (content_type), not in the file name.
+
+    The file is read chunk_size bytes at a time into a temp file while
+    SHA-256 is computed; the type is sniffed from the first SNIFF_BYTES
+    and checked against the extension, and max_size is enforced as bytes
+    arrive. The temp file is then renamed into place, so a partial file
+    is never visible. Memory stays O(chunk_size) whatever the file size.
+    """
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    expected = ALLOWED_MIME_TYPES.get(get_file_extension(upload_file.filename))
+    if expected is None:
+        raise UnsupportedUpload(f"Unsupported file type: {upload_file.filename}")
+
+    temp_dir = Path(settings.UPLOAD_DIR) / "tmp"
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = temp_dir / f"{uuid.uuid4().hex}.part"
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    mime_type = None
+    try:
+        async with aiofiles.open(temp_path, 'wb') as f:
+            while True:
+                chunk = await upload_file.read(chunk_size)
+                if chunk:
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadTooLarge(f"File too large (max {max_size // (1024 * 1024)}MB)")
+                    if mime_type is None and len(head) < SNIFF_BYTES:
+                        head += chunk[:SNIFF_BYTES - len(head)]
+                if mime_type is None and (len(head) >= SNIFF_BYTES or not chunk):
+                    mime_type = sniff_mime_type(head, complete=not chunk)
+                    if mime_type != expected:
+                        raise UnsupportedUpload(
+                            f"{upload_file.filename} doesn't look like {expected} (sniffed {mime_type})"
+                        )
+                if not chunk:
+                    break
+                digest.update(chunk)
+                await f.write(chunk)
+
+        file_hash = digest.hexdigest()
+        file_path = blob_path(file_hash)
+        if file_path.exists():
+            temp_path.unlink()
+            logger.info("File already stored", path=str(file_path), size=size)
+        else:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, file_path)
+            logger.info("File saved", path=str(file_path), size=size)
+        return StoredFile(str(file_path), file_hash, size, mime_type)
+
+    except BaseException as e:
+        temp_path.unlink(missing_ok=True)
+        if not isinstance(e, (UploadTooLarge, UnsupportedUpload)):
+            logger.error("File save failed", error=str(e))
         raise
 
 
+# Archives a batch upload may be sent as
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+def is_archive(filename: str) -> bool:
+    """Check if a file is a zip or tar archive (by name)"""
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _is_hidden(name: str) -> bool:
+    # .DS_Store, ._resource forks, __MACOSX/ and the like
+    return any(part.startswith(('.', '__MACOSX')) for part in PurePosixPath(name).parts)
+
+
+def iter_archive(fileobj: BinaryIO, filename: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    (name, file object) for each regular file in a zip or tar archive,
+    opened one at a time and read lazily; directories, links and hidden
+    entries are skipped. Each file object is only valid until the next
+    item. Blocking: advance it with run_io.
+    """
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _is_hidden(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member
+    else:
+        with tarfile.open(fileobj=fileobj, mode='r:*') as archive:
+            for info in archive:
+                if not info.isfile() or _is_hidden(info.name):
+                    continue
+                yield info.name, archive.extractfile(info)
+
+
 async def delete_file(file_path: str):
     """Delete file from disk"""
     try:
@@ -89,4 +213,14 @@ async def read_file_content(file_path: str) -> bytes:
             return await f.read()
     except Exception as e:
         logger.error("File read failed", path=file_path, error=str(e))
-        raise
\ No newline at end of file
+        raise
+
+
+async def iter_text_blocks(file_path: str, block_chars: int = 64 * 1024) -> AsyncIterator[str]:
+    """Read a UTF-8 text file a block of characters at a time"""
+    async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            block = await f.read(block_chars)
+            if not block:
+                return
+            yield block
@@ -0,0 +1,158 @@
+"""
+Ingestion Worker
+Consumes background jobs from the Redis stream and runs document processing
+
+Usage (from the app directory):
+    python -m worker
+
+Start as many workers as needed (e.g. docker compose up --scale worker=4);
+they share the stream through one consumer group. Workers never call
+init_db(): that recreates the schema, which is the API's job.
+"""
+
+from typing import Awaitable, Callable, Dict, Set
+import asyncio
+import os
+import signal
+import socket
+
+from core.config import settings
+from core.database import AsyncSessionLocal, close_db
+from core.executors import shutdown_executors
+from core.redis_client import init_redis, close_redis
+from models.document import Document
+from models import user, chat  # register every mapper the Document relationships need
+from services.document_service import DocumentService, INGEST_JOB
+from services.job_queue import Job, JobQueue, job_queue
+from services.neo4j_service import neo4j_service
+import structlog
+
+logger = structlog.get_logger()
+
+
+async def ingest_document(queue: JobQueue, job: Job):
+    """Run the document processing stages, publishing progress as they go"""
+    document_id = job.payload["document_id"]
+
+    async with AsyncSessionLocal() as db:
+        document = await db.get(Document, document_id)
+        if document is None:
+            # Deleted while queued: nothing to do
+            logger.info("Skipping job for deleted document", job_id=job.job_id, document_id=document_id)
+            return
+
+        async def progress(stage: str, percent: int, message: str):
+            await queue.publish_progress(
+                job.job_id, document.user_id, document.id,
+                status="processing", stage=stage, progress=percent, message=message
+            )
+
+        await DocumentService.process_document(db, document, progress=progress)
+        await queue.publish_progress(
+            job.job_id, document.user_id, document.id,
+            status="completed", stage="completed", progress=100, message="Document ready"
+        )
+
+
+HANDLERS: Dict[str, Callable[[JobQueue, Job], Awaitable[None]]] = {
+    INGEST_JOB: ingest_document,
+}
+
+
+async def _heartbeat(queue: JobQueue, consumer: str, job: Job):
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+        await queue.heartbeat(consumer, job.message_id)
+
+
+async def _report_failure(queue: JobQueue, job: Job, retrying: bool, message: str):
+    if "user_id" in job.payload and "document_id" in job.payload:
+        await queue.publish_progress(
+            job.job_id, job.payload["user_id"], job.payload["document_id"],
+            status="retrying" if retrying else "failed",
+            stage="retrying" if retrying else "failed",
+            progress=0,
+            message=message
+        )
+
+
+async def run_job(queue: JobQueue, consumer: str, job: Job):
+    """Run one job to completion, retry or dead letter"""
+    handler = HANDLERS.get(job.type)
+    if handler is None:
+        # Retrying can't help (a payload with a bad type, or a job from a newer
+        # release during a rolling deploy): keep it in the dead-letter stream
+        error = f"Unknown job type: {job.type}"
+        await queue.dead_letter(job, error)
+        await _report_failure(queue, job, retrying=False, message=f"Processing failed: {error}")
+        return
+
+    attempt = await queue.start(job)
+    if queue.abandoned(job):
+        # The previous runs never returned: running it again would crash again
+        error = f"Worker died while running the job ({attempt - 1} attempts, {job.deliveries} deliveries)"
+        await queue.dead_letter(job, error)
+        await _report_failure(queue, job, retrying=False, message=f"Processing failed: {error}")
+        return
+
+    logger.info("Job started", job_id=job.job_id, type=job.type, attempt=attempt)
+    heartbeat = asyncio.create_task(_heartbeat(queue, consumer, job))
+    try:
+        await handler(queue, job)
+    except Exception as e:
+        retrying = await queue.fail(job, str(e))
+        await _report_failure(queue, job, retrying, message=f"Processing failed: {e}")
+        return
+    finally:
+        heartbeat.cancel()
+
+    await queue.complete(job)
+    logger.info("Job completed", job_id=job.job_id, type=job.type)
+
+
+async def consume(queue: JobQueue, consumer: str, concurrency: int, stop: asyncio.Event):
+    """Claim up to `concurrency` jobs at a time until stopped, then drain"""
+    in_flight: Set[asyncio.Task] = set()
+
+    while not stop.is_set():
+        await queue.release_due()
+
+        free = concurrency - len(in_flight)
+        if free <= 0:
+            await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            continue
+
+        for job in await queue.claim(consumer, free, block_ms=2000):
+            task = asyncio.create_task(run_job(queue, consumer, job))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        logger.info("Draining in-flight jobs", count=len(in_flight))
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+async def main():
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await init_redis()
+    await job_queue.ensure_group()
+    logger.info("Worker started", consumer=consumer, concurrency=settings.WORKER_CONCURRENCY)
+
+    try:
+        await consume(job_queue, consumer, settings.WORKER_CONCURRENCY, stop)
+    finally:
+        await neo4j_service.close()
+        await close_redis()
+        await close_db()
+        await shutdown_executors()
+        logger.info("Worker stopped", consumer=consumer)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
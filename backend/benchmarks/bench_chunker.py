@@ -0,0 +1,105 @@
+"""
+Chunker Benchmark
+Throughput (MB/s) of the previous chars/4 chunker against TokenChunker
+
+Corpora:
+- prose: sentences and paragraphs, like extracted manuals
+- sparse: unbroken runs of ~1900 characters (tables, base64, CJK without
+  spaces). The previous chunker scans back character by character to the
+  last space, which lies inside the overlap, so start = end - overlap
+  moves backwards and it never terminates: not run on this corpus
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_chunker.py --mb 20
+"""
+
+import argparse
+import json
+import random
+import time
+
+from services.chunker import TokenChunker
+from services.tokenizer import get_encoding
+
+
+def legacy_chunk_by_tokens(text, chunk_size=500, overlap=50):
+    char_chunk_size = chunk_size * 4
+    char_overlap = overlap * 4
+    chunks = []
+    start = 0
+    text_length = len(text)
+    while start < text_length:
+        end = start + char_chunk_size
+        if end < text_length:
+            while end > start and text[end] not in [' ', '\n', '.', '!', '?']:
+                end -= 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end - char_overlap
+    return chunks
+
+
+def prose(mb: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = ("valve pump pressure torque flange bolt seal gasket rotor shaft bearing inspect "
+             "replace tighten check calibrate sensor the a of to and for with XR-2000 M12").split()
+    parts, size = [], 0
+    while size < mb * 2**20:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 20))).capitalize() + ". "
+        if rng.random() < 0.1:
+            sentence += "\n\n"
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)
+
+
+def sparse(mb: int) -> str:
+    run = "0123456789abcdef" * 118  # 1888 chars without a boundary
+    return (run + " ") * (mb * 2**20 // (len(run) + 1))
+
+
+def measure(label, text, func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = func(text)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "chunker": label,
+        "chunks": len(chunks),
+        "seconds": round(best, 3),
+        "mb_per_second": round(len(text) / 2**20 / best, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    approx = TokenChunker(args.chunk_size, args.overlap, use_tiktoken=False)
+    candidates = [
+        ("previous chars/4", lambda t: legacy_chunk_by_tokens(t, args.chunk_size, args.overlap)),
+        ("TokenChunker (regex tokens)", approx.chunk),
+    ]
+    encoding = get_encoding()
+    if encoding is not None:
+        exact = TokenChunker(args.chunk_size, args.overlap, encoding=encoding)
+        exact.chunk("warm up the token length table")
+        candidates.append((f"TokenChunker (tiktoken {encoding.name})", exact.chunk))
+
+    report = {"mb": args.mb, "tiktoken": encoding is not None}
+    for name, text in (("prose", prose(args.mb)), ("sparse", sparse(args.mb))):
+        report[name] = [
+            measure(label, text, func) for label, func in candidates
+            if not (name == "sparse" and label.startswith("previous"))
+        ]
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
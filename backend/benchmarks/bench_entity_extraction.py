@@ -0,0 +1,92 @@
+"""
+Entity Extraction Benchmark
+Graph coverage and wall time of the previous extraction (one call on the
+first EntityExtractor.MAX_INPUT_CHARS of the document) against chunk-wise
+extraction (ChunkExtraction) at several concurrency limits
+
+The model is simulated: each call takes --call-ms and "extracts" the
+part numbers (PN-xxxx) in its text; every page of the synthetic manual
+introduces its own parts, so coverage shows how much of the document the
+graph sees.
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_entity_extraction.py --pages 300
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+from services.entity_extractor import ChunkExtraction, EntityExtractor
+
+CHUNK_CHARS = 2000  # about CHUNK_SIZE_TOKENS tokens of prose
+
+
+def manual(pages: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = "valve pump pressure torque flange bolt seal gasket rotor shaft inspect replace tighten the of to".split()
+    result = []
+    for page in range(pages):
+        sentences = []
+        for part in range(4):
+            filler = " ".join(rng.choice(words) for _ in range(rng.randint(40, 80)))
+            sentences.append(f"Fit PN-{page:03d}{part} before the next step: {filler}.")
+        result.append(" ".join(sentences))
+    return "\n\n".join(result)
+
+
+def simulated_model(call_s: float):
+    async def extract_from_text(text):
+        await asyncio.sleep(call_s)
+        names = sorted(set(re.findall(r"PN-\d+", text[:EntityExtractor.MAX_INPUT_CHARS])))
+        return {"entities": [{"name": name, "type": "Part"} for name in names], "relationships": []}
+    return extract_from_text
+
+
+async def run(args):
+    EntityExtractor.extract_from_text = staticmethod(simulated_model(args.call_ms / 1000))
+    text = manual(args.pages)
+    total = len(set(re.findall(r"PN-\d+", text)))
+    chunks = [text[start:start + CHUNK_CHARS] for start in range(0, len(text), CHUNK_CHARS)]
+
+    started = time.perf_counter()
+    previous = await EntityExtractor.extract_from_text(text)
+    results = {
+        "pages": args.pages,
+        "chunks": len(chunks),
+        "entities_in_document": total,
+        "first_window": {
+            "calls": 1,
+            "entities": len(previous["entities"]),
+            "wall_seconds": round(time.perf_counter() - started, 3),
+        },
+    }
+    for concurrency in args.concurrency:
+        extraction = ChunkExtraction(concurrency=concurrency)
+        started = time.perf_counter()
+        for number, chunk in enumerate(chunks):
+            extraction.submit(f"c{number}", chunk)
+        merged = await extraction.result()
+        results[f"chunkwise_concurrency_{concurrency}"] = {
+            "calls": len(chunks),
+            "entities": len(merged["entities"]),
+            "wall_seconds": round(time.perf_counter() - started, 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--call-ms", type=float, default=1500.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 64, 512])
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Graph Write Benchmark
+Round-trips and wall time for writing one document graph: the previous
+per-row auto-commit writes against batched UNWIND statements in one
+transaction (Neo4jService.create_document_graph)
+
+Runs against an in-memory stand-in for the async Neo4j driver: every
+statement costs one network round-trip (--rtt-ms) plus server time per
+row (--row-us), and a commit costs one round-trip.
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_graph_writes.py --entities 2000 --relationships 5000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from services.neo4j_service import Neo4jService
+
+
+class FakeResult:
+    async def consume(self):
+        return None
+
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def run(self, query, parameters=None, **kwargs):
+        parameters = {**(parameters or {}), **kwargs}
+        rows = len(parameters.get("rows", ())) or 1
+        self.driver.round_trips += 1
+        self.driver.statements += 1
+        self.driver.rows += rows
+        await asyncio.sleep(self.driver.rtt_s + self.driver.row_s * rows)
+        return FakeResult()
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, parameters=None, **kwargs):
+        # Auto-commit: the statement and its commit share a round-trip
+        return await FakeTransaction(self.driver).run(query, parameters, **kwargs)
+
+    async def execute_write(self, work, *args, **kwargs):
+        result = await work(FakeTransaction(self.driver), *args, **kwargs)
+        self.driver.round_trips += 1  # COMMIT
+        await asyncio.sleep(self.driver.rtt_s)
+        return result
+
+
+class FakeDriver:
+    def __init__(self, rtt_ms: float, row_us: float):
+        self.rtt_s = rtt_ms / 1000
+        self.row_s = row_us / 1_000_000
+        self.round_trips = 0
+        self.statements = 0
+        self.rows = 0
+
+    def modeled_seconds(self) -> float:
+        # Without event loop timer overhead (it inflates many short sleeps)
+        return self.round_trips * self.rtt_s + self.rows * self.row_s
+
+    def session(self):
+        return FakeSession(self)
+
+    async def close(self):
+        pass
+
+
+async def legacy_create_document_graph(driver, document_id, entities, relationships):
+    """The previous writer: one auto-commit statement per entity and relationship"""
+    async with driver.session() as session:
+        await session.run("MERGE (d:Document {id: $doc_id})", doc_id=document_id)
+        for entity in entities:
+            await session.run("MERGE (e:Entity {name: $name, type: $type}) ...",
+                              name=entity['name'], type=entity['type'], doc_id=document_id)
+        for rel in relationships:
+            await session.run("MATCH (e1:Entity {name: $from_entity}) ...",
+                              from_entity=rel['from'], to_entity=rel['to'], rel_type=rel['type'],
+                              doc_id=document_id)
+
+
+def graph(entities: int, relationships: int, seed: int = 0):
+    rng = random.Random(seed)
+    nodes = [{"name": f"entity {i}", "type": rng.choice(["PART", "TOOL", "PROCEDURE"])} for i in range(entities)]
+    edges = [
+        {"from": rng.choice(nodes)["name"], "to": rng.choice(nodes)["name"], "type": "RELATES_TO"}
+        for _ in range(relationships)
+    ]
+    return nodes, edges
+
+
+async def measure(write, driver):
+    started = time.perf_counter()
+    await write()
+    return {
+        "round_trips": driver.round_trips,
+        "statements": driver.statements,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "modeled_seconds": round(driver.modeled_seconds(), 3),
+    }
+
+
+async def run(args):
+    entities, relationships = graph(args.entities, args.relationships)
+
+    legacy = FakeDriver(args.rtt_ms, args.row_us)
+    batched = FakeDriver(args.rtt_ms, args.row_us)
+    service = Neo4jService()
+    await service.driver.close()
+    service.driver = batched
+
+    return {
+        "entities": args.entities,
+        "relationships": args.relationships,
+        "per_row": await measure(
+            lambda: legacy_create_document_graph(legacy, 1, entities, relationships), legacy
+        ),
+        "batched": await measure(
+            lambda: service.create_document_graph(1, entities, relationships), batched
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--relationships", type=int, default=5000)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--row-us", type=float, default=20.0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
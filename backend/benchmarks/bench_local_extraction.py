@@ -0,0 +1,124 @@
+"""
+Local Entity Extraction Benchmark
+Pages per second and graph coverage of ChunkExtraction in each
+ENTITY_EXTRACTION_MODE: llm, local and hybrid
+
+The LLM is simulated as in bench_entity_extraction (each call takes
+--call-ms and returns the part numbers in its text), so the llm and
+hybrid figures are bounded by ENTITY_EXTRACTION_CONCURRENCY calls in
+flight; local mode makes no calls at all. "inline" is extract_batch on
+one core, without the process pool.
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_local_extraction.py --pages 300
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+from core.config import settings
+from core.executors import shutdown_executors
+from services.entity_extractor import ChunkExtraction, EntityExtractor
+from services.local_entity_extractor import extract_batch
+
+CHUNK_CHARS = 2000  # about CHUNK_SIZE_TOKENS tokens of prose
+PART = re.compile(r"PN-\d+")
+
+
+def manual(pages: int, seed: int = 0) -> str:
+    """Every fifth page introduces four parts; the pages between refer back to known ones"""
+    rng = random.Random(seed)
+    words = "valve pump pressure torque flange bolt seal gasket rotor shaft inspect replace tighten the of to".split()
+    components = ["Drive Belt", "Pressure Relief Valve", "Main Manifold", "Control Board", "Intake Filter"]
+    makers = ["Acme Fluid Systems GmbH", "Northwind Pumps Ltd", "Contoso Seals Inc"]
+    introduced = []
+    result = []
+    for page in range(pages):
+        sentences = []
+        for part in range(4):
+            if page % 5 == 0:
+                introduced.append(f"PN-{page:03d}{part}")
+                name = introduced[-1]
+            else:
+                name = rng.choice(introduced)
+            filler = " ".join(rng.choice(words) for _ in range(rng.randint(40, 80)))
+            sentences.append(
+                f"Fit {name} to the {rng.choice(components)} of the XR-{page % 7}00 unit "
+                f"from {rng.choice(makers)}. Then {filler}."
+            )
+        result.append(" ".join(sentences))
+    return "\n\n".join(result)
+
+
+def simulated_model(call_s: float):
+    async def extract_from_text(text):
+        await asyncio.sleep(call_s)
+        names = sorted(set(PART.findall(text[:EntityExtractor.MAX_INPUT_CHARS])))
+        return {"entities": [{"name": name, "type": "Part"} for name in names], "relationships": []}
+    return extract_from_text
+
+
+async def run(args):
+    EntityExtractor.extract_from_text = staticmethod(simulated_model(args.call_ms / 1000))
+    text = manual(args.pages)
+    parts = set(PART.findall(text))
+    chunks = [text[start:start + CHUNK_CHARS] for start in range(0, len(text), CHUNK_CHARS)]
+
+    started = time.perf_counter()
+    extract_batch(chunks)
+    inline_seconds = time.perf_counter() - started
+
+    results = {
+        "pages": args.pages,
+        "chunks": len(chunks),
+        "parts_in_document": len(parts),
+        "llm_concurrency": settings.ENTITY_EXTRACTION_CONCURRENCY,
+        "inline": {"pages_per_second": round(args.pages / inline_seconds, 1)},
+    }
+    for mode in args.modes:
+        calls = [0]
+        model = EntityExtractor.extract_from_text
+
+        async def counted(chunk_text, model=model):
+            calls[0] += 1
+            return await model(chunk_text)
+
+        EntityExtractor.extract_from_text = staticmethod(counted)
+        extraction = ChunkExtraction(mode=mode)
+        started = time.perf_counter()
+        for number, chunk in enumerate(chunks):
+            extraction.submit(f"c{number}", chunk)
+        merged = await extraction.result()
+        seconds = time.perf_counter() - started
+        EntityExtractor.extract_from_text = staticmethod(model)
+
+        names = {entity["name"] for entity in merged["entities"]}
+        results[mode] = {
+            "llm_calls": calls[0],
+            "entities": len(merged["entities"]),
+            "relationships": len(merged["relationships"]),
+            "part_coverage": round(len(parts & names) / len(parts), 3),
+            "wall_seconds": round(seconds, 3),
+            "pages_per_second": round(args.pages / seconds, 1),
+        }
+
+    await shutdown_executors()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--call-ms", type=float, default=1500.0)
+    parser.add_argument("--modes", nargs="+", default=["llm", "local", "hybrid"])
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+PDF Extraction Benchmark
+Serial pdfplumber (the previous extract_with_metadata) against page-range
+extraction on the process pool, adaptive (PyPDF2 first) and pdfplumber-only
+
+Uses a synthetic text PDF (see synthetic_pdf.py); a few pages are blank so
+the adaptive strategy exercises its pdfplumber fallback. Speed-up from the
+pool is bounded by the number of cores available.
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_pdf_extraction.py --pages 500 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from core.config import settings
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def timed(label, pages, func):
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    return result, {
+        "mode": label,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    settings.EXECUTOR_CPU_PROCESSES = args.workers
+
+    # Imported after the pool size is set
+    from core.executors import get_cpu_executor, shutdown_executors
+    from services.pdf_processor import PDFProcessor, _extract_pypdf, _extract_with_metadata
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_pdf_"), "synthetic.pdf")
+    blank = range(10, args.pages + 1, 50)
+    write_synthetic_pdf(path, args.pages, args.lines, blank_pages=blank)
+
+    results = []
+    serial, row = timed("serial pdfplumber", args.pages, lambda: _extract_with_metadata(path))
+    results.append(row)
+    _, row = timed("serial PyPDF2", args.pages, lambda: _extract_pypdf(path))
+    results.append(row)
+
+    async def parallel(strategy):
+        settings.PDF_EXTRACT_STRATEGY = strategy
+        return await PDFProcessor.extract_with_metadata(path, parallel=True)
+
+    async def run_parallel():
+        # Start the workers outside the timed region (spawn start-up is a one-off cost)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(get_cpu_executor(), time.sleep, 0.01) for _ in range(args.workers)
+        ))
+        rows = []
+        for strategy in ("adaptive", "pdfplumber"):
+            start = time.perf_counter()
+            extracted = await parallel(strategy)
+            seconds = time.perf_counter() - start
+            assert [p['page_number'] for p in extracted['pages']] == \
+                [p['page_number'] for p in serial['pages']], "pages out of order"
+            rows.append({
+                "mode": f"parallel {strategy} ({args.workers} workers)",
+                "seconds": round(seconds, 3),
+                "pages_per_second": round(args.pages / seconds, 1),
+            })
+        await shutdown_executors()
+        return rows
+
+    results.extend(asyncio.run(run_parallel()))
+
+    print(json.dumps({
+        "pages": args.pages,
+        "blank_pages": len(blank),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+PDF Extraction Memory Benchmark
+Peak RSS of the previous extractors (text += per page; pages_content plus a
+joined full_text, pdfplumber page caches kept) against the page-record
+versions, on a synthetic PDF
+
+Each mode runs in a fresh interpreter so peaks don't mask each other;
+"extraction_mb" is the peak minus the RSS after imports.
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_pdf_memory.py --pages 1000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+MODES = [
+    "legacy_pypdf",
+    "pypdf",
+    "legacy_metadata",
+    "metadata",
+    "stream",
+]
+
+
+def legacy_pypdf(file_path):
+    import PyPDF2
+    text = ""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_num, page in enumerate(pdf_reader.pages):
+            text += f"\n--- Page {page_num + 1} ---\n"
+            text += page.extract_text()
+        return text, len(pdf_reader.pages)
+
+
+def legacy_metadata(file_path):
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        metadata = pdf.metadata
+        pages_content = []
+        for page_num, page in enumerate(pdf.pages):
+            page_text = page.extract_text()
+            if page_text:
+                pages_content.append({
+                    'page_number': page_num + 1,
+                    'text': page_text,
+                    'char_count': len(page_text)
+                })
+        full_text = "\n\n".join([p['text'] for p in pages_content])
+        return {'text': full_text, 'pages': pages_content, 'doc_metadata': dict(metadata)}
+
+
+def max_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, path):
+    from services import pdf_processor
+
+    baseline = max_rss_mb()
+    if mode == "legacy_pypdf":
+        result = legacy_pypdf(path)
+    elif mode == "pypdf":
+        result = pdf_processor._extract_pypdf(path)
+    elif mode == "legacy_metadata":
+        result = legacy_metadata(path)
+    elif mode == "metadata":
+        result = pdf_processor._extract_with_metadata(path)
+    else:
+        # Consumer that never holds the document: what the ingest pipeline sees
+        result = sum(len(record.text) for record in pdf_processor.iter_page_records(path, "adaptive"))
+    peak = max_rss_mb()
+    del result
+
+    print(json.dumps({
+        "mode": mode,
+        "baseline_mb": round(baseline, 1),
+        "peak_mb": round(peak, 1),
+        "extraction_mb": round(peak - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_pdf_mem_"), "synthetic.pdf")
+    write_synthetic_pdf(path, args.pages, args.lines)
+
+    results = []
+    for mode in args.modes.split(","):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps({
+        "pages": args.pages,
+        "file_mb": round(os.path.getsize(path) / 2**20, 1),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Re-ingestion Benchmark
+Embedding calls and wall time for re-uploading a lightly edited document:
+full re-ingestion (a fresh document, as before content-hash chunk ids)
+against incremental re-ingestion of the stored one
+
+Runs the real IngestPipeline against the local vector index in a temp
+directory; the embedding provider is simulated (fixed latency per call
+plus per text, 384-d vectors) so the numbers don't depend on a network.
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_reingest.py --pages 200 --edits 3
+"""
+
+import os
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix="bench_reingest_")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ["VECTOR_DATA_DIR"] = os.path.join(_data_dir, "vectors")
+os.environ["LEXICAL_INDEX_DIR"] = os.path.join(_data_dir, "lexical")
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from services.ingest_pipeline import IngestPipeline
+from services.pdf_processor import PageRecord
+from services.vector_store import VectorStore
+
+
+def document(pages: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ("valve pump pressure torque flange bolt seal gasket rotor shaft bearing inspect "
+             "replace tighten check calibrate sensor the a of to and for with XR-2000 M12").split()
+    result = []
+    for _ in range(pages):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = [
+                " ".join(rng.choice(words) for _ in range(rng.randint(6, 20))).capitalize() + "."
+                for _ in range(rng.randint(3, 8))
+            ]
+            paragraphs.append(" ".join(sentences))
+        result.append("\n\n".join(paragraphs))
+    return result
+
+
+def edit(pages, edits: int, seed: int = 1):
+    rng = random.Random(seed)
+    pages = list(pages)
+    for number in rng.sample(range(len(pages)), edits):
+        pages[number] = pages[number].replace(".", ", revised in rev B.", 1)
+    return pages
+
+
+class SimulatedProvider:
+    def __init__(self, call_ms: float, text_ms: float):
+        self.call_s = call_ms / 1000
+        self.text_s = text_ms / 1000
+        self.calls = 0
+        self.texts = 0
+        self.rng = np.random.default_rng(0)
+
+    async def create_embeddings(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        await asyncio.sleep(self.call_s + self.text_s * len(texts))
+        return self.rng.standard_normal((len(texts), 384)).tolist()
+
+
+async def ingest(document_id: int, pages, provider: SimulatedProvider):
+    async def source():
+        for number, text in enumerate(pages, start=1):
+            yield PageRecord(number, text, "pypdf")
+
+    calls, texts = provider.calls, provider.texts
+    result = await IngestPipeline(document_id, total_pages=len(pages)).run(source())
+    return {
+        "chunks": result.chunk_count,
+        "embedded": result.chunks_embedded,
+        "reused": result.chunks_reused,
+        "deleted": result.chunks_deleted,
+        "embedding_calls": provider.calls - calls,
+        "embedding_texts": provider.texts - texts,
+        "wall_seconds": round(result.wall_seconds, 3),
+    }
+
+
+async def run(args):
+    provider = SimulatedProvider(args.call_ms, args.text_ms)
+    VectorStore.create_embeddings = staticmethod(provider.create_embeddings)
+
+    original = document(args.pages)
+    revised = edit(original, args.edits)
+
+    started = time.perf_counter()
+    initial = await ingest(1, original, provider)
+    initial["wall_seconds"] = round(time.perf_counter() - started, 3)
+    return {
+        "pages": args.pages,
+        "edited_pages": args.edits,
+        "initial": initial,
+        "full_reingest": await ingest(2, revised, provider),
+        "incremental_reingest": await ingest(1, revised, provider),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=3)
+    parser.add_argument("--call-ms", type=float, default=150.0)
+    parser.add_argument("--text-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Upload Memory Benchmark
+Peak Python memory for storing one upload: the previous path (read the
+whole file to check its size and hash it, then write it) against the
+streaming save (chunked copy with incremental hashing)
+
+The upload is a spooled temp file on disk, as the multipart parser hands
+it over; peaks are measured with tracemalloc.
+
+Run from backend/:
+    PYTHONPATH=app:. python benchmarks/bench_upload_memory.py --mb 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from fastapi import UploadFile
+
+from utils import file_utils
+
+
+async def read_all(upload: UploadFile, target: str):
+    content = await upload.read()
+    await upload.seek(0)
+    if len(content) > file_utils.settings.MAX_UPLOAD_SIZE:
+        raise ValueError("too large")
+    file_hash = file_utils.get_file_hash(content)
+    with open(os.path.join(target, file_hash), "wb") as f:
+        f.write(content)
+
+
+async def measure(save, path: str):
+    with open(path, "rb") as source:
+        upload = UploadFile(source, filename="manual.pdf")
+        tracemalloc.start()
+        started = time.perf_counter()
+        await save(upload)
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"peak_mb": round(peak / 2**20, 2), "seconds": round(seconds, 3)}
+
+
+async def run(args):
+    work = tempfile.mkdtemp(prefix="bench_upload_")
+    file_utils.settings.UPLOAD_DIR = os.path.join(work, "uploads")
+    file_utils.settings.MAX_UPLOAD_SIZE = (args.mb + 1) * 2**20
+    path = os.path.join(work, "upload.pdf")
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.7\n")
+        block = os.urandom(2**20)
+        for _ in range(args.mb):
+            f.write(block)
+
+    legacy_dir = os.path.join(work, "legacy")
+    os.makedirs(legacy_dir)
+    return {
+        "file_mb": args.mb,
+        "read_all": await measure(lambda upload: read_all(upload, legacy_dir), path),
+        "streaming": await measure(file_utils.save_upload_file, path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=50)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Vector Index Benchmark
+Compares query latency of the in-process local index against an HTTP path
+
+The HTTP path is a local stand-in for the Chroma server: the same index
+served by a threaded HTTP server on 127.0.0.1, with JSON request/response
+bodies like Chroma's REST API. It measures the cost of the hop itself
+(serialisation + loopback round-trip); a real remote Chroma adds network
+latency on top.
+
+The pooled figures query one collection holding --documents documents
+(as in VECTOR_COLLECTION_MODE=shared), filtered to one document and to a
+$in of --in-documents: "posting" filters on document_id (posting lists),
+"scan" on an unindexed copy of it, i.e. a metadata scan per query.
+
+Run from backend/:
+    PYTHONPATH=app python benchmarks/bench_vector_index.py --rows 20000 --dim 384
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import http.client
+import json
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from services.vector_index import LocalVectorClient
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+    }
+
+
+def build_collection(rows: int, dim: int, segment_rows: int):
+    data_dir = tempfile.mkdtemp(prefix="bench_vectors_")
+    collection = LocalVectorClient(data_dir).create_collection("bench")
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, segment_rows):
+        count = min(segment_rows, rows - start)
+        collection.add(
+            ids=[f"chunk_{i}" for i in range(start, start + count)],
+            embeddings=rng.standard_normal((count, dim)).astype(np.float32),
+            documents=[f"chunk text {i} " * 40 for i in range(start, start + count)],
+            metadatas=[{"chunk_index": i} for i in range(start, start + count)],
+        )
+    return collection
+
+
+def build_pooled_collection(rows: int, dim: int, documents: int):
+    """One collection of `documents` documents, each added in its own call as ingestion does"""
+    data_dir = tempfile.mkdtemp(prefix="bench_pooled_")
+    collection = LocalVectorClient(data_dir).create_collection("pooled")
+    rng = np.random.default_rng(0)
+    per_document = max(1, rows // documents)
+    for document_id in range(documents):
+        collection.add(
+            ids=[f"{document_id}:{i}" for i in range(per_document)],
+            embeddings=rng.standard_normal((per_document, dim)).astype(np.float32),
+            documents=[f"chunk text {i} " * 40 for i in range(per_document)],
+            metadatas=[
+                {"document_id": document_id, "user_id": document_id % 10, "doc": document_id, "chunk_index": i}
+                for i in range(per_document)
+            ],
+        )
+    return collection
+
+
+def time_queries(collection, queries, k, where=None):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=k, where=where)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def serve(collection):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            result = collection.query(
+                query_embeddings=body["query_embeddings"],
+                n_results=body["n_results"],
+            )
+            payload = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--segment-rows", type=int, default=2000)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--in-documents", type=int, default=10)
+    args = parser.parse_args()
+
+    collection = build_collection(args.rows, args.dim, args.segment_rows)
+    queries = np.random.default_rng(1).standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    # Warm up page cache for the memory-mapped segments
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=args.k)
+
+    local = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=args.k)
+        local.append(time.perf_counter() - start)
+
+    server = serve(collection)
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    conn.connect()
+    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    remote = []
+    for query in queries:
+        start = time.perf_counter()
+        body = json.dumps({"query_embeddings": [query.tolist()], "n_results": args.k})
+        conn.request("POST", "/query", body=body, headers={"Content-Type": "application/json"})
+        json.loads(conn.getresponse().read())
+        remote.append(time.perf_counter() - start)
+    server.shutdown()
+
+    pooled = build_pooled_collection(args.rows, args.dim, args.documents)
+    pooled.query(query_embeddings=[queries[0].tolist()], n_results=args.k)
+    target = args.documents // 2
+    subset = list(range(0, args.documents, max(1, args.documents // args.in_documents)))[:args.in_documents]
+
+    print(json.dumps({
+        "rows": args.rows,
+        "dim": args.dim,
+        "k": args.k,
+        "local_in_process": percentiles(local),
+        "http_stand_in": percentiles(remote),
+        "pooled": {
+            "documents": args.documents,
+            "segments": len(pooled._segments),
+            "one_document": {
+                "posting": time_queries(pooled, queries, args.k, {"document_id": target}),
+                "scan": time_queries(pooled, queries, args.k, {"doc": target}),
+            },
+            "in_documents": {
+                "posting": time_queries(pooled, queries, args.k, {"document_id": {"$in": subset}}),
+                "scan": time_queries(pooled, queries, args.k, {"doc": {"$in": subset}}),
+            },
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
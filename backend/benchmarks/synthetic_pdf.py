@@ -0,0 +1,104 @@
+"""
+Synthetic PDF Generator
+Writes text-only PDFs of any size without extra dependencies, for benchmarks
+
+Each page holds `lines_per_page` lines of pseudo-random manual-like prose
+(Helvetica, one content stream per page). Pages listed in `blank_pages`
+get no text, the way scanned pages look to a text extractor.
+
+    python benchmarks/synthetic_pdf.py out.pdf --pages 500
+"""
+
+from typing import Iterable, Optional
+import argparse
+import random
+
+WORDS = (
+    "valve pump pressure torque flange bolt seal gasket housing rotor shaft "
+    "bearing inspect replace tighten check calibrate sensor controller relay "
+    "manual procedure warning caution maintenance interval operator system "
+    "the a of to and for with on at by from before after each every"
+).split()
+
+CODES = ["XR-2000", "PX-15", "M12", "ISO-9001", "RT-400", "KV-7"]
+
+
+def page_lines(rng: random.Random, page_number: int, lines: int, width: int = 90):
+    yield f"Section {page_number}. Maintenance procedure {page_number}"
+    for _ in range(lines - 1):
+        words = []
+        length = 0
+        while length < width:
+            word = rng.choice(CODES) if rng.random() < 0.03 else rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        yield " ".join(words).capitalize() + "."
+
+
+def write_synthetic_pdf(
+    path: str,
+    pages: int = 500,
+    lines_per_page: int = 50,
+    seed: int = 0,
+    blank_pages: Optional[Iterable[int]] = None
+) -> str:
+    """Write the PDF to path and return the path"""
+    rng = random.Random(seed)
+    blank = set(blank_pages or ())
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for index in range(pages):
+        page_id = 4 + 2 * index
+        content_id = page_id + 1
+        kids.append(f"{page_id} 0 R")
+
+        if index + 1 in blank:
+            stream = b""
+        else:
+            body = ["BT", "/F1 9 Tf", "12 TL", "40 800 Td"]
+            for line in page_lines(rng, index + 1, lines_per_page):
+                body.append(f"({line}) Tj T*")
+            body.append("ET")
+            stream = "\n".join(body).encode("latin-1")
+
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, objects[number]))
+
+        xref = f.tell()
+        count = max(objects) + 1
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for number in range(1, count):
+            f.write(b"%010d 00000 n \n" % offsets[number])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=50)
+    args = parser.parse_args()
+    write_synthetic_pdf(args.path, args.pages, args.lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,31 @@
 from neo4j import GraphDatabase
 from langchain.llms import OpenAI
-from typing import List, Dict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Optional
+import asyncio
 import json
 
+
+def _quoted(name: str) -> str:
+    # Labels and relationship types can't be parameters; backtick-quote them
+    return "`" + name.replace("`", "``") + "`"
+
+
+def _batches(rows: List[Dict], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
 class GraphRAGService:
-    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str):
+    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str,
+                 executor: Optional[Executor] = None, write_batch_size: int = 500):
         self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        # Rows per UNWIND statement when writing the graph
+        self.write_batch_size = write_batch_size
         self.llm = OpenAI(temperature=0)
+        # The driver and LLM client block; async callers run them here
+        # (pass the app's I/O pool to share its sizing)
+        self.executor = executor or ThreadPoolExecutor(max_workers=8, thread_name_prefix="graph-rag")
         
         self.entity_extraction_prompt = """
         Extract entities and relationships from this text.
@@ -23,6 +42,18 @@ class GraphRAGService:
         Text: {text}
         """
     
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def acreate_knowledge_graph(self, document_id: str, chunks: List[str], metadata: Dict = None):
+        """create_knowledge_graph without blocking the event loop"""
+        return await self._run(self.create_knowledge_graph, document_id, chunks, metadata)
+
+    async def aquery_graph(self, query: str) -> Dict:
+        """query_graph without blocking the event loop"""
+        return await self._run(self.query_graph, query)
+    
     def extract_entities_and_relationships(self, text: str) -> Dict:
         try:
             prompt = self.entity_extraction_prompt.format(text=text)
@@ -58,40 +89,60 @@ class GraphRAGService:
         }
     
     def _create_graph_nodes(self, entities: List[Dict], document_id: str, metadata: Dict):
-        with self.driver.session() as session:
-            session.run(
+        # One UNWIND statement per label and batch, all in one transaction
+        by_label: Dict[str, List[Dict]] = {}
+        for entity in entities:
+            by_label.setdefault(entity['type'], []).append(
+                {"name": entity['name'], "description": entity.get('description', '')}
+            )
+
+        def write(tx):
+            tx.run(
                 """
                 MERGE (d:Document {id: $document_id})
                 SET d.metadata = $metadata, d.created_at = datetime()
                 """,
                 document_id=document_id, metadata=metadata or {}
-            )
-            
-            for entity in entities:
-                session.run(
-                    f"""
-                    MERGE (e:{entity['type']} {{name: $name}})
-                    SET e.description = $description, e.document_id = $document_id
-                    MERGE (d:Document {{id: $document_id}})
-                    MERGE (d)-[:CONTAINS]->(e)
-                    """,
-                    name=entity['name'],
-                    description=entity.get('description', ''),
-                    document_id=document_id
-                )
+            ).consume()
+            for label, rows in by_label.items():
+                for batch in _batches(rows, self.write_batch_size):
+                    tx.run(
+                        f"""
+                        UNWIND $rows AS row
+                        MERGE (e:{_quoted(label)} {{name: row.name}})
+                        SET e.description = row.description, e.document_id = $document_id
+                        WITH e
+                        MATCH (d:Document {{id: $document_id}})
+                        MERGE (d)-[:CONTAINS]->(e)
+                        """,
+                        rows=batch, document_id=document_id
+                    ).consume()
+
+        with self.driver.session() as session:
+            session.execute_write(write)
     
     def _create_graph_relationships(self, relationships: List[Dict]):
+        by_type: Dict[str, List[Dict]] = {}
+        for rel in relationships:
+            by_type.setdefault(rel['relationship'].upper().replace(' ', '_'), []).append(
+                {"source": rel['source'], "target": rel['target']}
+            )
+
+        def write(tx):
+            for rel_type, rows in by_type.items():
+                for batch in _batches(rows, self.write_batch_size):
+                    tx.run(
+                        f"""
+                        UNWIND $rows AS row
+                        MATCH (source {{name: row.source}})
+                        MATCH (target {{name: row.target}})
+                        MERGE (source)-[:{_quoted(rel_type)}]->(target)
+                        """,
+                        rows=batch
+                    ).consume()
+
         with self.driver.session() as session:
-            for rel in relationships:
-                session.run(
-                    f"""
-                    MATCH (source {{name: $source_name}})
-                    MATCH (target {{name: $target_name}})
-                    MERGE (source)-[:{rel['relationship'].upper().replace(' ', '_')}]->(target)
-                    """,
-                    source_name=rel['source'],
-                    target_name=rel['target']
-                )
+            session.execute_write(write)
     
     def query_graph(self, query: str) -> Dict:
         with self.driver.session() as session:
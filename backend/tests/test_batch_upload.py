@@ -0,0 +1,112 @@
+"""
+Test batch document upload
+"""
+
+import io
+import zipfile
+import pytest
+from fastapi import UploadFile
+from models.document import Document, DocumentStatus
+from services.document_service import DocumentService
+from utils import file_utils
+
+
+PDF = b"%PDF-1.7\n" + b"pump manual " * 100
+
+
+class FakeSession:
+    """Stands in for AsyncSession: assigns ids on flush, counts flushes"""
+
+    def __init__(self):
+        self.added = []
+        self.flushes = 0
+        self.committed = False
+
+    def add_all(self, documents):
+        self.added.extend(documents)
+
+    async def flush(self):
+        self.flushes += 1
+        for number, document in enumerate(self.added, start=1):
+            document.id = number
+
+    async def commit(self):
+        self.committed = True
+
+
+class User:
+    id = 3
+
+
+def zipped(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in entries.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils.settings, "UPLOAD_DIR", str(tmp_path))
+    calls = {"enqueued": [], "blobs": []}
+    processed = Document(id=99, user_id=8, title="old.txt", file_path="p",
+                         file_hash=file_utils.get_file_hash(b"already processed"),
+                         status=DocumentStatus.COMPLETED, extracted_text="already processed", chunk_count=1)
+
+    async def acquire_blobs(db, files):
+        calls["blobs"].append(files)
+        return {file_hash: number for number, (file_hash, _) in enumerate(files)}
+
+    async def find_duplicates(db, file_hashes):
+        return {h: processed for h in file_hashes if h == processed.file_hash}
+
+    async def enqueue_many(job_type, payloads, owner_id=None):
+        calls["enqueued"].append(payloads)
+        return [f"job{p['document_id']}" for p in payloads]
+
+    monkeypatch.setattr(DocumentService, "_acquire_blobs", staticmethod(acquire_blobs))
+    monkeypatch.setattr(DocumentService, "_find_processed_duplicates", staticmethod(find_duplicates))
+    monkeypatch.setattr("services.document_service.job_queue.enqueue_many", enqueue_many)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_batch_upload_stores_inserts_and_enqueues_once(batch):
+    """Test files and archive members get per-file results from one insert and one enqueue"""
+    db = FakeSession()
+    files = [
+        UploadFile(io.BytesIO(b"line one"), filename="a.txt"),
+        UploadFile(zipped({"docs/b.pdf": PDF, "docs/c.pdf": b"not a pdf", "d.txt": b"already processed"}),
+                   filename="bundle.zip"),
+        UploadFile(io.BytesIO(b"not a zip"), filename="broken.zip"),
+    ]
+
+    results = await DocumentService.upload_documents(db, User(), files, "manual")
+
+    assert [(r["filename"], r["status"]) for r in results] == [
+        ("a.txt", "queued"), ("docs/b.pdf", "queued"), ("docs/c.pdf", "rejected"),
+        ("d.txt", "reused"), ("broken.zip", "rejected"),
+    ]
+    assert db.flushes == 1 and db.committed and len(db.added) == 3
+    assert [d.title for d in db.added] == ["a.txt", "b.pdf", "d.txt"]
+    assert db.added[2].index_document_id == 99 and db.added[2].status == DocumentStatus.COMPLETED
+    assert len(batch["blobs"]) == 1 and len(batch["blobs"][0]) == 3
+    assert batch["enqueued"] == [[{"document_id": 1, "user_id": 3}, {"document_id": 2, "user_id": 3}]]
+    assert [r["job_id"] for r in results] == ["job1", "job2", None, None, None]
+    assert "stored" not in results[0]
+
+
+@pytest.mark.asyncio
+async def test_batch_upload_caps_archive_members(batch, monkeypatch):
+    """Test an archive past BATCH_UPLOAD_MAX_FILES stops with a rejected entry"""
+    monkeypatch.setattr("services.document_service.settings.BATCH_UPLOAD_MAX_FILES", 2)
+    archive = zipped({f"{n}.txt": f"note {n}".encode() for n in range(5)})
+
+    results = await DocumentService.upload_documents(
+        FakeSession(), User(), [UploadFile(archive, filename="many.zip")], "manual"
+    )
+
+    assert [r["status"] for r in results] == ["queued", "queued", "rejected"]
+    assert "the rest were skipped" in results[-1]["error"]
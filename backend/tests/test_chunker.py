@@ -0,0 +1,115 @@
+"""
+Test the token chunker
+"""
+
+import pytest
+import tiktoken
+from services.chunker import StreamingTokenChunker, TokenChunker, stitch_chunks, token_offsets
+from services.pdf_processor import TextChunker
+
+PARAGRAPHS = [
+    " ".join(f"Sentence {p}.{s} about valve XR-2000 maintenance and torque." for s in range(12))
+    for p in range(20)
+]
+TEXT = "\n\n".join(PARAGRAPHS)
+
+
+@pytest.fixture
+def byte_encoding():
+    """A real tiktoken Encoding with a tiny local vocabulary (no BPE download)"""
+    ranks = {bytes([i]): i for i in range(256)}
+    for pair in (b"th", b"e ", b"an", b"in", b"er"):
+        ranks[pair] = len(ranks)
+    return tiktoken.Encoding(
+        name="test-bytes",
+        pat_str=r"""'s|'t| ?\w+| ?[^\s\w]+|\s+(?!\S)|\s+""",
+        mergeable_ranks=ranks,
+        special_tokens={}
+    )
+
+
+def test_tiktoken_offsets_are_character_offsets(byte_encoding):
+    """Test byte-level token offsets map back to characters in non-ASCII text"""
+    text = "naïve café — thé ✓ done"
+    offsets = token_offsets(text, byte_encoding)
+
+    assert offsets[0] == 0 and offsets[-1] == len(text)
+    assert all(a <= b for a, b in zip(offsets, offsets[1:]))
+    assert len(offsets) - 1 == len(byte_encoding.encode_ordinary(text))
+
+
+@pytest.mark.parametrize("use_encoding", [True, False])
+def test_chunks_index_the_source_and_respect_the_budget(byte_encoding, use_encoding):
+    """Test offsets, token counts and sentence-aligned cuts"""
+    chunker = TokenChunker(120, 20, encoding=byte_encoding if use_encoding else None, use_tiktoken=False)
+
+    chunks = chunker.chunk(TEXT)
+
+    assert len(chunks) > 5
+    for chunk in chunks:
+        assert TEXT[chunk.char_start:chunk.char_end] == chunk.text
+        assert chunk.token_count <= 120
+    # Every cut but the last lands on a sentence end
+    assert all(chunk.text.endswith(".") for chunk in chunks)
+    # Consecutive chunks overlap and move forward
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.char_start < current.char_start < previous.char_end
+
+
+def test_paragraph_break_preferred_over_sentence():
+    """Test a paragraph end in the back half of the window wins"""
+    text = "One two three four five six seven eight nine.\n\nTen eleven. Twelve thirteen fourteen fifteen."
+    chunker = TokenChunker(16, 2, use_tiktoken=False)
+
+    first = chunker.chunk(text)[0]
+
+    assert first.text == "One two three four five six seven eight nine."
+
+
+def test_text_without_boundaries_still_progresses():
+    """Test a run with no whitespace is cut hard and fully covered"""
+    text = "x" * 5000
+    chunker = TokenChunker(50, 10, use_tiktoken=False)
+
+    chunks = chunker.chunk(text)
+
+    assert chunks[0].char_start == 0 and chunks[-1].char_end == len(text)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.char_start < current.char_start <= previous.char_end
+
+
+def test_streaming_matches_single_pass_and_tags_pages():
+    """Test feeding page by page gives the same chunks as chunking the joined text"""
+    chunker = TokenChunker(80, 10, use_tiktoken=False)
+    page_starts, position = [], 0
+    for number, paragraph in enumerate(PARAGRAPHS, start=1):
+        page_starts.append((position, number))
+        position += len(paragraph) + 2
+    expected = chunker.chunk(TEXT, page_starts)
+
+    streaming = StreamingTokenChunker(chunker)
+    chunks = []
+    for number, paragraph in enumerate(PARAGRAPHS, start=1):
+        chunks += streaming.feed(paragraph if number == 1 else "\n\n" + paragraph, page=number)
+    chunks += streaming.finish()
+
+    assert [(c.text, c.char_start, c.page_start, c.page_end) for c in chunks] == \
+        [(c.text, c.char_start, c.page_start, c.page_end) for c in expected]
+    assert any(c.page_start != c.page_end for c in chunks)
+    assert streaming.buffer == ""
+
+
+def test_stitched_chunks_rebuild_the_span():
+    """Test overlapping chunks are joined back without repeating the overlap"""
+    chunks = TokenChunker(60, 10, use_tiktoken=False).chunk(PARAGRAPHS[0])
+
+    stitched = stitch_chunks([c.text for c in chunks], [c.char_start for c in chunks])
+
+    assert stitched == PARAGRAPHS[0]
+
+
+def test_text_chunker_keeps_its_interface():
+    """Test the legacy helper still returns plain strings"""
+    chunks = TextChunker.chunk_by_tokens(TEXT, chunk_size=100, overlap=10)
+
+    assert chunks and all(isinstance(chunk, str) for chunk in chunks)
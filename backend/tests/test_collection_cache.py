@@ -0,0 +1,121 @@
+"""
+Test collection handle cache
+"""
+
+import threading
+import time
+
+import pytest
+from services.collection_cache import CollectionHandleCache, count_requests, record_request
+
+
+def test_handle_is_loaded_once_and_invalidated():
+    """Test hits skip the loader and invalidation forces a reload"""
+    cache = CollectionHandleCache(max_size=4, ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return object()
+
+    first = cache.get_or_load("doc_1", loader)
+    assert cache.get_or_load("doc_1", loader) is first
+    assert len(calls) == 1
+
+    cache.invalidate("doc_1")
+    assert cache.get_or_load("doc_1", loader) is not first
+    assert len(calls) == 2
+
+
+def test_ttl_and_size_bound():
+    """Test expired and least recently used handles are dropped"""
+    cache = CollectionHandleCache(max_size=2, ttl=60)
+    for name in ["a", "b", "c"]:
+        cache.get_or_load(name, lambda: name)
+    assert cache._lookup("a") is None
+
+    cache = CollectionHandleCache(max_size=2, ttl=0.01)
+    cache.get_or_load("a", lambda: "old")
+    time.sleep(0.02)
+    assert cache.get_or_load("a", lambda: "new") == "new"
+
+
+def test_concurrent_first_use_is_single_flight():
+    """Test many threads missing at once trigger one load"""
+    cache = CollectionHandleCache()
+    calls = []
+    start = threading.Barrier(8)
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return "handle"
+
+    def worker():
+        start.wait()
+        assert cache.get_or_load("shared", loader) == "handle"
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_failing_loader_leaves_no_creation_lock():
+    """Test a loader that raises caches nothing and leaks no per-name lock"""
+    cache = CollectionHandleCache()
+
+    def loader():
+        raise ValueError("server down")
+
+    for name in ["a", "b"]:
+        with pytest.raises(ValueError):
+            cache.get_or_load(name, loader)
+
+    assert cache._creation_locks == {} and cache.get("a") is None
+    assert cache.get_or_load("a", lambda: "handle") == "handle"
+
+
+@pytest.mark.asyncio
+async def test_failed_collection_calls_drop_the_cached_handle(tmp_path, monkeypatch):
+    """Test every VectorStore call on a stale handle invalidates it, not just queries"""
+    from services import vector_store
+    from services.vector_index import LocalVectorClient
+    from services.vector_store import VectorStore
+
+    client = LocalVectorClient(str(tmp_path))
+    monkeypatch.setattr(vector_store, "vector_client", client)
+    monkeypatch.setattr(VectorStore, "is_pooled", staticmethod(lambda: False))
+    vector_store.collection_cache.invalidate("doc_9")
+    await VectorStore.add_document_chunks(9, ["a"], embeddings=[[1.0]])
+
+    calls = [
+        lambda: VectorStore.add_document_chunks(9, ["b"], embeddings=[[1.0]]),
+        lambda: VectorStore.get_stored_chunks(9),
+        lambda: VectorStore.update_chunk_metadata(9, ["chunk_0"], [{"page": 2}]),
+        lambda: VectorStore.delete_chunks(9, ["chunk_0"]),
+        lambda: VectorStore.get_document_chunks(9),
+    ]
+    for call in calls:
+        stale = await VectorStore.get_collection_async(9)
+        client.delete_collection("doc_9")  # deleted behind the cache's back
+        with pytest.raises(ValueError):
+            await call()
+        assert vector_store.collection_cache.get("doc_9") is None
+        # The next call loads a fresh handle
+        assert await VectorStore.get_collection_async(9) is not stale
+    vector_store.collection_cache.invalidate("doc_9")
+
+
+def test_count_requests_tallies_nested_calls():
+    """Test the outermost block owns the per-query tally"""
+    with count_requests("outer") as outer:
+        record_request("local", "get_or_create_collection")
+        with count_requests("inner") as inner:
+            record_request("local", "query")
+        assert inner is outer
+
+    assert outer[0] == 2
@@ -19,8 +19,9 @@ async def test_upload_pdf(client: AsyncClient, auth_headers: dict):
         data={"document_type": "pdf"}
     )
     
-    assert response.status_code == 201
+    assert response.status_code == 202
     data = response.json()
+    assert data["job_id"]
     assert data["title"] == "test.pdf"
     assert data["content_type"] == "pdf"
     assert data["status"] in ["pending", "processing", "completed"]
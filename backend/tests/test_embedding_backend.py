@@ -0,0 +1,59 @@
+"""
+Test local embedding backend
+"""
+
+import gc
+import weakref
+
+import numpy as np
+import pytest
+from services.embedding_backend import HashingEmbeddingBackend
+
+
+def test_hashing_vectors_are_normalised():
+    """Test vectors have the configured dimension and unit length"""
+    backend = HashingEmbeddingBackend(dimension=64)
+    matrix = backend.embed_sync(["the quick brown fox", "", "lazy dog"])
+
+    assert matrix.shape == (3, 64)
+    assert matrix.dtype == np.float32
+    assert np.allclose(np.linalg.norm(matrix[[0, 2]], axis=1), 1.0)
+    assert not matrix[1].any()
+
+
+def test_hashing_is_deterministic_and_similarity_aware():
+    """Test identical texts match and overlapping texts score higher"""
+    backend = HashingEmbeddingBackend(dimension=256)
+    query, near, far = backend.embed_sync([
+        "invoice number 4471 for acme corp",
+        "acme corp invoice number 4471 is overdue",
+        "photosynthesis converts light into chemical energy",
+    ])
+
+    again = HashingEmbeddingBackend(dimension=256).embed_sync(["invoice number 4471 for acme corp"])[0]
+    assert np.allclose(query, again)
+    assert float(query @ near) > float(query @ far)
+
+
+def test_bucket_cache_does_not_keep_backends_alive():
+    """Test the hashed-feature cache is keyed on the dimension, not the instance"""
+    backend = HashingEmbeddingBackend(dimension=64)
+    backend.embed_sync(["pump gasket torque"])
+    ref = weakref.ref(backend)
+
+    del backend
+    gc.collect()
+
+    assert ref() is None
+
+
+@pytest.mark.asyncio
+async def test_async_embed_returns_lists():
+    """Test the async interface returns plain lists in input order"""
+    backend = HashingEmbeddingBackend(dimension=32)
+    texts = [f"chunk {i}" for i in range(40)]  # above the inline limit
+
+    embeddings = await backend.embed(texts)
+
+    assert len(embeddings) == 40
+    assert embeddings[3] == backend.embed_sync(["chunk 3"])[0].tolist()
@@ -0,0 +1,63 @@
+"""
+Test embedding batcher
+"""
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+from services.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEmbeddings:
+    """Records calls and returns one-dimensional vectors, shuffled"""
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, model, input):
+        self.calls.append(list(input))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text))])
+            for i, text in enumerate(input)
+        ]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+def make_batcher(**kwargs):
+    fake = FakeEmbeddings()
+    client = SimpleNamespace(embeddings=fake)
+    return EmbeddingBatcher(client=client, model="test", **kwargs), fake
+
+
+def test_plan_batches_respects_item_limit():
+    """Test batches never exceed the item limit"""
+    batcher, _ = make_batcher(max_items=3, max_tokens=10_000)
+    batches = batcher.plan_batches(["x"] * 7)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_plan_batches_respects_token_budget(monkeypatch):
+    """Test an oversized input gets its own batch"""
+    monkeypatch.setattr("services.embedding_batcher.count_tokens", len)
+    batcher, _ = make_batcher(max_items=100, max_tokens=50)
+    batches = batcher.plan_batches(["a" * 20, "b" * 20, "c" * 100, "d"])
+    assert batches == [[0, 1], [2], [3]]
+
+
+@pytest.mark.asyncio
+async def test_embed_preserves_order_under_concurrency():
+    """Test results line up with inputs and concurrency is bounded"""
+    batcher, fake = make_batcher(max_items=2, max_tokens=10_000, concurrency=2)
+    texts = ["a" * n for n in range(1, 10)]
+
+    embeddings = await batcher.embed(texts)
+
+    assert embeddings == [[float(n)] for n in range(1, 10)]
+    assert len(fake.calls) == 5
+    assert fake.max_in_flight == 2
@@ -0,0 +1,54 @@
+"""
+Test embedding cache
+"""
+
+import pytest
+from services.embedding_cache import (
+    EmbeddingCache,
+    embedding_cache_key,
+    pack_vector,
+    unpack_vector,
+)
+
+
+def test_key_is_content_addressed():
+    """Test keys depend on model and text only"""
+    assert embedding_cache_key("m", "hello") == embedding_cache_key("m", "hello")
+    assert embedding_cache_key("m", "hello") != embedding_cache_key("m", "hello!")
+    assert embedding_cache_key("a", "hello") != embedding_cache_key("b", "hello")
+
+
+def test_pack_roundtrip_is_float32_bytes():
+    """Test vectors are packed as 4 bytes per dimension"""
+    packed = pack_vector([0.5, -1.25, 3.0])
+    assert len(packed) == 12
+    assert unpack_vector(packed).tolist() == [0.5, -1.25, 3.0]
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_hits_and_misses():
+    """Test only unseen texts are reported as misses"""
+    cache = EmbeddingCache(max_items=10)
+
+    first = await cache.get_many("m", ["a", "b"])
+    assert first == [None, None]
+
+    await cache.set_many("m", {"a": [1.0, 2.0]})
+    second = await cache.get_many("m", ["a", "b"])
+    assert second == [[1.0, 2.0], None]
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 3
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_oldest():
+    """Test the memory tier is bounded"""
+    cache = EmbeddingCache(max_items=2)
+    await cache.set_many("m", {"a": [1.0], "b": [2.0]})
+    await cache.get_many("m", ["a"])  # touch "a" so "b" is oldest
+    await cache.set_many("m", {"c": [3.0]})
+
+    results = await cache.get_many("m", ["a", "b", "c"])
+    assert results == [[1.0], None, [3.0]]
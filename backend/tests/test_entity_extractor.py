@@ -0,0 +1,125 @@
+"""
+Test chunk-wise entity extraction
+"""
+
+import asyncio
+import pytest
+from services import entity_extractor
+from services.entity_extractor import ChunkExtraction, EntityExtractor, merge_extractions
+
+
+def test_merge_deduplicates_by_normalised_name():
+    """Test spellings of one entity merge, keeping chunk ids and the majority type"""
+    merged = merge_extractions([
+        ("c1", {"entities": [{"name": "XR-2000 Pump", "type": "Product"}, {"name": "Acme", "type": "Organization"}],
+                "relationships": [{"from": "Acme", "to": "XR-2000 Pump", "type": "makes"}]}),
+        ("c2", {"entities": [{"name": "xr-2000  pump.", "type": "Product"}, {"name": "ACME", "type": "Location"},
+                             {"name": None, "type": "Concept"}],
+                "relationships": [{"from": "acme", "to": "XR-2000 pump", "type": "MAKES"}]}),
+        ("c3", {"entities": [{"name": "Acme", "type": "Organization"}]}),
+    ])
+
+    assert merged["entities"] == [
+        {"name": "XR-2000 Pump", "type": "Product", "chunk_ids": ["c1", "c2"]},
+        {"name": "Acme", "type": "Organization", "chunk_ids": ["c1", "c2", "c3"]},
+    ]
+    assert merged["relationships"] == [
+        {"from": "Acme", "to": "XR-2000 Pump", "type": "MAKES", "chunk_ids": ["c1", "c2"]}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_extracted_concurrently_up_to_the_limit(monkeypatch):
+    """Test every chunk is extracted, never more than `concurrency` at once"""
+    in_flight = [0, 0]
+
+    async def extract(text):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[1], in_flight[0])
+        await asyncio.sleep(0.05)
+        in_flight[0] -= 1
+        if text == "broken":
+            raise ValueError("bad json")
+        return {"entities": [{"name": text, "type": "Part"}]}
+
+    monkeypatch.setattr(EntityExtractor, "extract_from_text", staticmethod(extract))
+    extraction = ChunkExtraction(concurrency=4)
+    for i in range(12):
+        extraction.submit(f"c{i}", f"part {i}")
+    extraction.submit("c12", "broken")
+
+    started = asyncio.get_running_loop().time()
+    merged = await extraction.result()
+
+    assert in_flight[1] == 4
+    assert asyncio.get_running_loop().time() - started < 0.05 * 13 / 2
+    assert [e["chunk_ids"] for e in merged["entities"]] == [[f"c{i}"] for i in range(12)]
+
+
+@pytest.mark.asyncio
+async def test_extraction_fails_when_every_chunk_fails(monkeypatch):
+    """Test a wholly failed extraction raises instead of writing an empty graph"""
+    async def extract(text):
+        raise ValueError("model unavailable")
+
+    monkeypatch.setattr(EntityExtractor, "extract_from_text", staticmethod(extract))
+    extraction = ChunkExtraction()
+    extraction.submit("c1", "text")
+
+    with pytest.raises(ValueError, match="model unavailable"):
+        await extraction.result()
+    assert entity_extractor.normalize_name("  The  PUMP. ") == "the pump"
+
+
+@pytest.mark.asyncio
+async def test_local_mode_makes_no_model_calls(monkeypatch):
+    """Test local extraction covers every chunk, across batches, without calling the LLM"""
+    async def extract(text):
+        raise AssertionError("LLM called")
+
+    monkeypatch.setattr(EntityExtractor, "extract_from_text", staticmethod(extract))
+    monkeypatch.setattr(entity_extractor.settings, "ENTITY_LOCAL_BATCH_SIZE", 2)
+    extraction = ChunkExtraction(mode="local")
+    for i in range(5):
+        extraction.submit(f"c{i}", f"Fit the Drive Belt to motor M{i}.")
+
+    merged = await extraction.result()
+
+    assert len(extraction) == 5
+    assert merged["entities"][0] == {"name": "Drive Belt", "type": "Concept", "chunk_ids": [f"c{i}" for i in range(5)]}
+    assert [e["name"] for e in merged["entities"][1:]] == [f"M{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_mode_sends_only_chunks_with_new_entities_to_the_llm(monkeypatch):
+    """Test the LLM sees chunks where local extraction finds new entities, and its spellings win the merge"""
+    seen = []
+
+    async def extract(text):
+        seen.append(text)
+        if "broken" in text:
+            raise ValueError("bad json")
+        return {"entities": [{"name": "XR-2000 pump", "type": "Equipment"}],
+                "relationships": [{"from": "Acme Ltd", "to": "XR-2000 pump", "type": "makes"}]}
+
+    monkeypatch.setattr(EntityExtractor, "extract_from_text", staticmethod(extract))
+    monkeypatch.setattr(entity_extractor.settings, "ENTITY_HYBRID_MIN_NEW_ENTITIES", 2)
+    extraction = ChunkExtraction(mode="hybrid")
+    extraction.submit("dense", "Acme Ltd tested the XR-2000 Pump with the PSU.")
+    extraction.submit("known", "The XR-2000 Pump needs weekly cleaning.")
+    extraction.submit("broken", "The broken Main Valve on the M12 Rig and the PSU.")
+
+    merged = await extraction.result()
+
+    assert seen == ["Acme Ltd tested the XR-2000 Pump with the PSU.",
+                    "The broken Main Valve on the M12 Rig and the PSU."]
+    entities = {e["name"]: e for e in merged["entities"]}
+    assert entities["XR-2000 pump"]["chunk_ids"] == ["dense", "known"]
+    assert "Main Valve" in entities
+    assert {"from": "Acme Ltd", "to": "XR-2000 pump", "type": "MAKES", "chunk_ids": ["dense"]} in merged["relationships"]
+
+
+def test_unknown_mode_is_rejected():
+    """Test a misconfigured mode fails fast"""
+    with pytest.raises(ValueError, match="ENTITY_EXTRACTION_MODE"):
+        ChunkExtraction(mode="spacy")
@@ -0,0 +1,111 @@
+"""
+Test entity mention matching for graph queries
+"""
+
+import pytest
+from services.entity_matcher import EntityMatcher, EntityMatcherCache
+from services.neo4j_service import Neo4jService
+
+
+NAMES = ["Pump", "hydraulic pump", "XR-2000", "Seal Kit", "seal", "a", "he"]
+
+
+def test_finds_mentions_longest_first():
+    """Test every mention is found in one pass, longest first, original spelling kept"""
+    matcher = EntityMatcher(NAMES)
+
+    found = matcher.find("How do I replace the seal on the  Hydraulic\nPump of an XR-2000?")
+
+    assert found == ["hydraulic pump", "XR-2000", "seal", "Pump"]
+    assert len(matcher) == 6  # "a" is below min_chars
+
+
+def test_respects_word_boundaries():
+    """Test names inside longer words are not mentions"""
+    matcher = EntityMatcher(NAMES)
+
+    assert matcher.find("pumping the sealant where theXR-2000x sits") == []
+    assert matcher.find("He checked the seal kit.") == ["Seal Kit", "seal", "he"]
+
+
+def test_overlapping_keys_share_suffixes():
+    """Test fail links report keys ending inside longer partial matches"""
+    matcher = EntityMatcher(["she", "he", "hers", "his"])
+
+    assert matcher.find("ushers his she") == ["his", "she"]
+    assert matcher.find("he said hers") == ["hers", "he"]
+    assert EntityMatcher([]).find("anything") == []
+
+
+def test_cache_expires_and_evicts(monkeypatch):
+    """Test the matcher cache is a bounded LRU with a TTL"""
+    clock = [100.0]
+    monkeypatch.setattr("services.entity_matcher.time.monotonic", lambda: clock[0])
+    cache = EntityMatcherCache(max_size=2, ttl=10)
+    one, two, three = EntityMatcher(["a1"]), EntityMatcher(["b2"]), EntityMatcher(["c3"])
+
+    cache.put(1, one)
+    cache.put(2, two)
+    assert cache.get(1) is one
+    cache.put(3, three)
+    assert cache.get(2) is None and cache.get(1) is one
+
+    clock[0] += 11
+    assert cache.get(1) is None and cache.get(3) is None
+
+
+class GraphDriver:
+    """Stands in for the async driver: answers entity-name and neighbourhood queries"""
+
+    def __init__(self, names, edges):
+        self.names = names
+        self.edges = edges
+        self.queries = []
+
+    def session(self):
+        driver = self
+
+        class Result:
+            def __init__(self, records):
+                self.records = records
+
+            def __aiter__(self):
+                async def records():
+                    for record in self.records:
+                        yield record
+                return records()
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run(self, query, **parameters):
+                driver.queries.append((query, parameters))
+                if "RETURN DISTINCT e.name" in query:
+                    return Result([{"name": name} for name in driver.names])
+                return Result([
+                    {"entity1": a, "entity2": b, "relationship": t}
+                    for a, b, t in driver.edges if a in parameters["names"] or b in parameters["names"]
+                ])
+
+        return Session()
+
+
+@pytest.mark.asyncio
+async def test_query_graph_seeds_from_mentions():
+    """Test a query loads the matcher once and only expands around mentioned entities"""
+    service = Neo4jService()
+    await service.driver.close()
+    service.driver = GraphDriver(["XR-2000", "Seal Kit", "Torque Wrench"],
+                                 [("XR-2000", "Seal Kit", "USES"), ("Torque Wrench", "Bolt", "TIGHTENS")])
+
+    paths = await service.query_graph(5, "Which seal kit fits the xr-2000?")
+    assert paths == [{"entity1": "XR-2000", "entity2": "Seal Kit", "relationship": "USES"}]
+    query, parameters = service.driver.queries[-1]
+    assert parameters["names"] == ["Seal Kit", "XR-2000"] and "*1..2]" in query
+
+    assert await service.query_graph(5, "What is the warranty period?") == []
+    assert len(service.driver.queries) == 2  # names loaded once; no expansion without seeds
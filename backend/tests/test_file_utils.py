@@ -0,0 +1,146 @@
+"""
+Test upload file storage
+"""
+
+from io import BytesIO
+from typing import List
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from httpx import ASGITransport, AsyncClient
+from core.request_limits import RequestBodyLimitMiddleware
+from utils import file_utils
+
+
+PDF = b"%PDF-1.7\n" + b"manual v1 " * 1000
+
+
+def upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(BytesIO(content), filename=filename)
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils.settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def stored_files(root):
+    return [p for p in root.rglob("*") if p.is_file()]
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_are_stored_once(upload_dir):
+    """Test files are content-addressed: same bytes, same path, one write"""
+    first = await file_utils.save_upload_file(upload(PDF, "a.pdf"), chunk_size=1000)
+    second = await file_utils.save_upload_file(upload(PDF, "copy.pdf"))
+    other = await file_utils.save_upload_file(upload(b"manual v2", "notes.txt"))
+
+    assert first == second and first.file_path.endswith(first.file_hash)
+    assert first.file_hash == file_utils.get_file_hash(PDF)
+    assert (first.size, first.mime_type) == (len(PDF), "application/pdf")
+    assert other.file_path != first.file_path and other.mime_type == "text/plain"
+    assert sorted(p.read_bytes() for p in stored_files(upload_dir)) == [PDF, b"manual v2"]
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_cut_off(upload_dir):
+    """Test the size limit stops the read early and leaves nothing behind"""
+    source = upload(PDF, "big.pdf")
+
+    with pytest.raises(file_utils.UploadTooLarge):
+        await file_utils.save_upload_file(source, max_size=4096, chunk_size=1024)
+
+    assert source.file.tell() <= 4096 + 1024
+    assert stored_files(upload_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_content_must_match_extension(upload_dir):
+    """Test a file is rejected when its bytes don't match its extension"""
+    with pytest.raises(file_utils.UnsupportedUpload):
+        await file_utils.save_upload_file(upload(b"plain text", "fake.pdf"))
+    with pytest.raises(file_utils.UnsupportedUpload):
+        await file_utils.save_upload_file(upload(b"\x7fELF\x02\x01\x01\x00", "tool.txt"))
+    with pytest.raises(file_utils.UnsupportedUpload):
+        await file_utils.save_upload_file(upload(PDF, "report.docx"))
+
+    assert stored_files(upload_dir) == []
+
+
+def test_sniff_mime_type():
+    """Test type sniffing from the first bytes"""
+    assert file_utils.sniff_mime_type(b"\n%PDF-1.4 ...") == "application/pdf"
+    assert file_utils.sniff_mime_type("name,qty\nflange,4\n".encode()) == "text/plain"
+    # A prefix may stop inside a multi-byte character
+    assert file_utils.sniff_mime_type("drück".encode()[:-3], complete=False) == "text/plain"
+    assert file_utils.sniff_mime_type("drück".encode()[:-3]) is None
+    assert file_utils.sniff_mime_type(b"PK\x03\x04\x14\x00") is None
+
+
+@pytest.mark.asyncio
+async def test_body_limit_middleware():
+    """Test oversized request bodies get 413 before the endpoint runs"""
+    app = FastAPI()
+    calls = []
+
+    @app.post("/api/documents/upload")
+    async def endpoint(file: UploadFile = File(...)):
+        calls.append(file.filename)
+        return {"ok": True}
+
+    @app.post("/api/documents/batch")
+    async def batch(files: List[UploadFile] = File(...)):
+        calls.extend(file.filename for file in files)
+        return {"ok": True}
+
+    app.add_middleware(RequestBodyLimitMiddleware,
+                       limits={"/api/documents": 2048, "/api/documents/batch": 20_000})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        small = await client.post("/api/documents/upload", files={"file": ("a.txt", b"x" * 100)})
+        large = await client.post("/api/documents/upload", files={"file": ("b.txt", b"x" * 10_000)})
+
+        # No Content-Length: counted as the body arrives
+        async def chunked():
+            yield (b'--b\r\nContent-Disposition: form-data; name="file"; filename="c.txt"\r\n'
+                   b'Content-Type: text/plain\r\n\r\n')
+            for _ in range(10):
+                yield b"x" * 1000
+            yield b"\r\n--b--\r\n"
+
+        streamed = await client.post("/api/documents/upload", content=chunked(),
+                                     headers={"content-type": "multipart/form-data; boundary=b"})
+
+        batched = await client.post("/api/documents/batch", files=[("files", ("d.txt", b"x" * 10_000))])
+
+    assert small.status_code == 200 and batched.status_code == 200
+    assert large.status_code == 413 and streamed.status_code == 413
+    assert calls == ["a.txt", "d.txt"]
+
+
+def test_iter_archive_skips_directories_and_hidden_entries(tmp_path):
+    """Test zip and tar members are listed one by one, without junk entries"""
+    import io
+    import tarfile
+    import zipfile
+
+    entries = {"manuals/pump.pdf": PDF, "notes.txt": b"torque 40 Nm", "__MACOSX/._notes.txt": b"x",
+               "manuals/.DS_Store": b"x"}
+    zipped = io.BytesIO()
+    with zipfile.ZipFile(zipped, "w") as archive:
+        archive.writestr("manuals/", b"")
+        for name, content in entries.items():
+            archive.writestr(name, content)
+    tarred = io.BytesIO()
+    with tarfile.open(fileobj=tarred, mode="w:gz") as archive:
+        for name, content in entries.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+    for buffer, filename in ((zipped, "batch.zip"), (tarred, "batch.tar.gz")):
+        assert file_utils.is_archive(filename)
+        buffer.seek(0)
+        members = [(name, member.read()) for name, member in file_utils.iter_archive(buffer, filename)]
+        assert members == [("manuals/pump.pdf", PDF), ("notes.txt", b"torque 40 Nm")]
+    assert not file_utils.is_archive("pump.pdf")
@@ -0,0 +1,99 @@
+"""
+Test the graph schema bootstrap
+"""
+
+import pytest
+from services.graph_schema import GRAPH_SCHEMA, GraphSchemaManager
+
+
+class SchemaDriver:
+    """Stands in for the async driver: SHOW INDEXES answers from a dict, CREATE adds to it"""
+
+    def __init__(self, states):
+        self.states = dict(states)
+        self.created = []
+
+    def session(self):
+        driver = self
+
+        class Result:
+            def __init__(self, records=()):
+                self.records = list(records)
+
+            def __aiter__(self):
+                async def records():
+                    for record in self.records:
+                        yield record
+                return records()
+
+            async def consume(self):
+                pass
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run(self, query):
+                if query.startswith("SHOW INDEXES"):
+                    return Result({"name": n, "state": s} for n, s in driver.states.items())
+                assert query.startswith("CREATE ") and "IF NOT EXISTS" in query
+                name = next(item.name for item in GRAPH_SCHEMA if f" {item.name} IF NOT EXISTS" in query)
+                driver.created.append(name)
+                driver.states[name] = "POPULATING"
+                return Result()
+
+        return Session()
+
+
+@pytest.mark.asyncio
+async def test_ensure_creates_only_what_is_missing():
+    """Test startup creates missing items once and is a no-op afterwards"""
+    driver = SchemaDriver({"document_id_unique": "ONLINE", "entity_name": "ONLINE", "other_index": "ONLINE"})
+    manager = GraphSchemaManager(driver)
+
+    created = await manager.ensure()
+
+    expected = [item.name for item in GRAPH_SCHEMA if item.name not in ("document_id_unique", "entity_name")]
+    assert created == driver.created == expected
+    assert await manager.ensure() == []
+
+
+@pytest.mark.asyncio
+async def test_check_reports_missing_and_offline_indexes():
+    """Test the health check lists missing indexes and ones still populating"""
+    states = {item.name: "ONLINE" for item in GRAPH_SCHEMA}
+    del states["entity_document_name_unique"]
+    states["entity_name_fulltext"] = "POPULATING"
+
+    problems = await GraphSchemaManager(SchemaDriver(states)).check()
+
+    assert problems == {"entity_document_name_unique": "missing", "entity_name_fulltext": "POPULATING"}
+    assert await GraphSchemaManager(SchemaDriver({i.name: "ONLINE" for i in GRAPH_SCHEMA})).check() == {}
+
+
+@pytest.mark.asyncio
+async def test_ensure_carries_on_past_a_failing_item():
+    """Test a constraint existing data violates doesn't keep the other indexes from being created"""
+    driver = SchemaDriver({})
+    session_factory = driver.session
+
+    def session():
+        inner = session_factory()
+        run = inner.run
+
+        async def failing_run(query):
+            if "entity_document_name_unique" in query:
+                raise RuntimeError("already exists with label Entity and properties")
+            return await run(query)
+
+        inner.run = failing_run
+        return inner
+
+    driver.session = session
+
+    created = await GraphSchemaManager(driver).ensure()
+
+    assert created == [item.name for item in GRAPH_SCHEMA if item.name != "entity_document_name_unique"]
@@ -0,0 +1,179 @@
+"""
+Test the streaming ingestion pipeline
+"""
+
+import asyncio
+import json
+import os
+import pytest
+from services.ingest_pipeline import IngestPipeline
+from services.pdf_processor import PageRecord
+
+
+PAGES = [" ".join(f"page{p} word{i}." for i in range(300)) for p in range(1, 6)]
+
+
+class FakeStore:
+    """In-memory vector store: id -> (text, metadata)"""
+
+    def __init__(self):
+        self.rows = {}
+        self.embedded = 0
+        self.indexed = []
+        self.spools = []
+        self.graphs_deleted = 0
+
+    async def create_embeddings(self, texts):
+        await asyncio.sleep(0.02)
+        self.embedded += len(texts)
+        return [[0.0] for _ in texts]
+
+    async def add_document_chunks(self, document_id, chunks, metadata, user_id, embeddings, ids):
+        await asyncio.sleep(0.02)
+        assert len(embeddings) == len(chunks)
+        for chunk_id, chunk, meta in zip(ids, chunks, metadata):
+            self.rows[chunk_id] = (chunk, meta)
+
+    async def get_stored_chunks(self, document_id, user_id):
+        return {chunk_id: dict(meta) for chunk_id, (_, meta) in self.rows.items()}
+
+    async def update_chunk_metadata(self, document_id, ids, metadatas, user_id):
+        for chunk_id, meta in zip(ids, metadatas):
+            self.rows[chunk_id] = (self.rows[chunk_id][0], {**self.rows[chunk_id][1], **meta})
+
+    async def delete_chunks(self, document_id, ids, user_id):
+        for chunk_id in ids:
+            del self.rows[chunk_id]
+
+    async def index_spooled_document(self, document_id, spool_path):
+        self.spools.append(spool_path)
+        with open(spool_path, encoding="utf-8") as f:
+            self.indexed = [json.loads(line) for line in f]
+
+    async def delete_document_graph(self, document_id):
+        self.graphs_deleted += 1
+
+    def by_index(self):
+        return {meta['chunk_index']: (chunk, meta) for chunk, meta in self.rows.values()}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeStore()
+    for name in ("create_embeddings", "add_document_chunks", "get_stored_chunks",
+                 "update_chunk_metadata", "delete_chunks"):
+        monkeypatch.setattr(f"services.ingest_pipeline.VectorStore.{name}", getattr(fake, name))
+    monkeypatch.setattr("services.ingest_pipeline.lexical_store.index_spooled_document",
+                        fake.index_spooled_document)
+    monkeypatch.setattr("services.ingest_pipeline.neo4j_service.delete_document_graph", fake.delete_document_graph)
+    return fake
+
+
+async def slow_pages(pages=PAGES):
+    for number, text in enumerate(pages, start=1):
+        await asyncio.sleep(0.02)
+        yield PageRecord(number, text, "pypdf")
+
+
+@pytest.mark.asyncio
+async def test_pipeline_overlaps_stages(store):
+    """Test embedding and writes run while pages are still being read"""
+    pipeline = IngestPipeline(1, 2, total_pages=len(PAGES), embed_batch_size=4, embed_workers=2,
+                              chunk_size=100, overlap=10)
+
+    result = await pipeline.run(slow_pages())
+
+    assert result.pages == 5
+    assert result.text == "\n\n".join(PAGES)
+    assert len(store.indexed) == result.chunk_count == result.chunks_embedded
+    rows = store.by_index()
+    assert sorted(rows) == list(range(result.chunk_count))
+    for i in range(result.chunk_count):
+        chunk, meta = rows[i]
+        assert result.text[meta['char_start']:meta['char_end']] == chunk
+        assert f"page{meta['page_start']} " in chunk and f"page{meta['page_end']} " in chunk
+        assert store.indexed[i] == {"text": chunk, "metadata": meta}
+    assert not os.path.exists(store.spools[0])
+    busy = sum(result.stage_seconds.values())
+    assert result.wall_seconds < busy * 0.75
+
+
+@pytest.mark.asyncio
+async def test_reingestion_only_embeds_changed_chunks(store):
+    """Test a revised document reuses stored chunks and drops the vanished ones"""
+    def pipeline():
+        return IngestPipeline(1, 2, embed_batch_size=4, chunk_size=100, overlap=10)
+
+    first = await pipeline().run(slow_pages())
+    revised = list(PAGES)
+    revised[2] = revised[2].replace("word150.", "word150, revised.")
+    second = await pipeline().run(slow_pages(revised))
+
+    # Cuts after the edit shift until the next paragraph break (here: page 4)
+    assert 0 < second.chunks_embedded <= first.chunk_count // 5
+    assert second.chunks_reused == second.chunk_count - second.chunks_embedded
+    assert second.chunks_deleted == first.chunk_count - second.chunks_reused
+    rows = store.by_index()
+    assert len(store.rows) == len(rows) == second.chunk_count
+    text = "\n\n".join(revised)
+    for chunk, meta in rows.values():
+        assert text[meta['char_start']:meta['char_end']] == chunk
+
+    embedded = store.embedded
+    third = await pipeline().run(slow_pages(revised))
+    assert (third.chunks_embedded, third.chunks_deleted) == (0, 0) and store.embedded == embedded
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stage_failure_propagates(store, monkeypatch):
+    """Test a failing stage stops the pipeline instead of leaving it blocked"""
+    async def broken(texts):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr("services.ingest_pipeline.VectorStore.create_embeddings", broken)
+    pipeline = IngestPipeline(1, 2, embed_batch_size=2, queue_size=1, chunk_size=100, overlap=10)
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        await asyncio.wait_for(pipeline.run(slow_pages()), timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_entities_come_from_every_chunk(store, monkeypatch):
+    """Test the graph covers the whole document, with the chunk ids of each entity"""
+    async def extract(text):
+        await asyncio.sleep(0.01)
+        pages = sorted({word.split("page")[1] for word in text.split() if word.startswith("page")})
+        return {"entities": [{"name": f"Page {p}", "type": "Section"} for p in pages], "relationships": []}
+
+    graphs = []
+
+    async def create_document_graph(document_id, entities, relationships):
+        graphs.append(entities)
+
+    monkeypatch.setattr("services.entity_extractor.EntityExtractor.extract_from_text", extract)
+    monkeypatch.setattr("services.ingest_pipeline.neo4j_service.create_document_graph", create_document_graph)
+    pipeline = IngestPipeline(1, 2, extract_entities=True, embed_batch_size=4, chunk_size=100, overlap=10)
+
+    await pipeline.run(slow_pages())
+
+    [entities] = graphs
+    assert [e["name"] for e in entities] == [f"Page {p}" for p in range(1, 6)]
+    assert all(set(e["chunk_ids"]) <= set(store.rows) for e in entities)
+    assert sum(len(e["chunk_ids"]) for e in entities) >= len(store.rows)
+
+
+@pytest.mark.asyncio
+async def test_reingestion_without_entities_drops_the_old_graph(store, monkeypatch):
+    """Test a new version with nothing to extract doesn't leave the previous graph behind"""
+    created = []
+
+    async def create_document_graph(document_id, entities, relationships):
+        created.append(entities)
+
+    monkeypatch.setattr("services.ingest_pipeline.neo4j_service.create_document_graph", create_document_graph)
+    await IngestPipeline(1, 2, embed_batch_size=4, chunk_size=100, overlap=10).run(slow_pages())
+    assert store.graphs_deleted == 0  # first ingestion, no extraction: no graph to touch
+
+    await IngestPipeline(1, 2, extract_entities=True, embed_batch_size=4).run(slow_pages(["Too short."]))
+
+    assert store.graphs_deleted == 1 and created == []
@@ -0,0 +1,117 @@
+"""
+Test lexical (BM25) index and hybrid retrieval
+"""
+
+import json
+import pytest
+from services.lexical_index import (
+    LexicalIndex, LexicalIndexStore, build_index_from_spool, reciprocal_rank_fusion, tokenize
+)
+from services.rag_service import RAGService
+from services.vector_store import VectorStore
+
+CHUNKS = [
+    "The pump assembly uses gasket XR-2000 rated for high pressure.",
+    "Maintenance intervals depend on the operating temperature of the pump.",
+    "Replace the filter every six months or after 500 operating hours.",
+    "Safety valves must be inspected by a certified engineer.",
+]
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    """Test joined identifiers are indexed whole and by part"""
+    assert tokenize("Gasket XR-2000, v1.2") == ["gasket", "xr-2000", "xr", "2000", "v1.2", "v1", "2"]
+
+
+def test_bm25_finds_exact_identifier_and_persists(tmp_path):
+    """Test identifier lookups rank first and survive a save/load round trip"""
+    index = LexicalIndex.build(CHUNKS, [{"chunk_index": i} for i in range(len(CHUNKS))])
+    index.save(tmp_path / "doc_1.npz")
+    loaded = LexicalIndex.load(tmp_path / "doc_1.npz")
+
+    result = loaded.search("XR-2000", n_results=3)
+
+    assert result['chunks'][0] == CHUNKS[0]
+    assert result['metadatas'][0] == {"chunk_index": 0}
+    assert result['coverage'] == pytest.approx(1.0)
+    assert loaded.search("nonexistent words", n_results=3)['chunks'] == []
+
+
+def test_index_builds_from_spooled_chunks(tmp_path):
+    """Test an index built from a JSON-lines spool matches one built from lists"""
+    spool = tmp_path / "chunks.jsonl"
+    spool.write_text("".join(
+        json.dumps({"text": chunk, "metadata": {"chunk_index": i}}) + "\n" for i, chunk in enumerate(CHUNKS)
+    ))
+
+    chunks, terms = build_index_from_spool(str(tmp_path / "doc_1.npz"), str(spool))
+    result = LexicalIndex.load(tmp_path / "doc_1.npz").search("XR-2000", n_results=3)
+
+    assert (chunks, terms) == (len(CHUNKS), len(LexicalIndex.build(CHUNKS).terms))
+    assert result['chunks'][0] == CHUNKS[0]
+    assert result['metadatas'][0] == {"chunk_index": 0}
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """Test keys ranked by both lists beat keys ranked highly by one"""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "e"]], k=60)
+    assert [key for key, _ in fused][:2] == ["b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_skips_embedding_on_confident_lexical_hit(tmp_path, monkeypatch):
+    """Test a confident keyword hit answers without the vector search"""
+    store = LexicalIndexStore(str(tmp_path))
+    LexicalIndex.build(CHUNKS).save(store.path(7))
+    monkeypatch.setattr("services.rag_service.lexical_store", store)
+
+    async def no_vector_search(**kwargs):
+        raise AssertionError("vector search should be skipped")
+
+    monkeypatch.setattr(VectorStore, "similarity_search", staticmethod(no_vector_search))
+
+    result = await RAGService.hybrid_search(7, "XR-2000 gasket", n_results=2)
+
+    assert result['retrieval']['path'] == "lexical_only"
+    assert result['chunks'][0] == CHUNKS[0]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_fuses_lexical_and_vector_rankings(tmp_path, monkeypatch):
+    """Test natural-language questions fuse both rankings"""
+    store = LexicalIndexStore(str(tmp_path))
+    LexicalIndex.build(CHUNKS).save(store.path(7))
+    monkeypatch.setattr("services.rag_service.lexical_store", store)
+
+    async def vector_search(document_id, query, n_results, user_id):
+        return {
+            'chunks': [CHUNKS[1], CHUNKS[2]],
+            'distances': [0.2, 0.4],
+            'metadatas': [{"chunk_index": 1}, {"chunk_index": 2}],
+        }
+
+    monkeypatch.setattr(VectorStore, "similarity_search", staticmethod(vector_search))
+
+    result = await RAGService.hybrid_search(7, "how often should the pump be serviced", n_results=3)
+
+    assert result['retrieval']['path'] == "fused"
+    assert result['chunks'][0] == CHUNKS[1]
+    assert result['distances'][0] == 0.2
+
+
+@pytest.mark.asyncio
+async def test_completed_update_drops_the_api_copy_of_a_reingested_index(tmp_path, monkeypatch):
+    """Test a worker's rebuild reaches the API once the relay forgets the document"""
+    from api import websocket
+
+    api_store, worker_store = LexicalIndexStore(str(tmp_path)), LexicalIndexStore(str(tmp_path))
+    monkeypatch.setattr(websocket, "lexical_store", api_store)
+    await worker_store.index_document(1, CHUNKS)
+    assert (await api_store.search(1, "gasket"))['chunks'] == [CHUNKS[0]]
+
+    await worker_store.index_document(1, ["The gasket was replaced by a seal."])
+    assert (await api_store.search(1, "gasket"))['chunks'] == [CHUNKS[0]]  # still the loaded copy
+
+    websocket.forget_document(1, 2)
+
+    assert (await api_store.search(1, "gasket"))['chunks'] == ["The gasket was replaced by a seal."]
@@ -0,0 +1,48 @@
+"""
+Test rule-based local entity extraction
+"""
+
+from services.local_entity_extractor import extract_batch, extract_text, load_gazetteer
+
+MANUAL = (
+    "Install the XR-2000 Pump on the Main Manifold. The pump is made by Acme Fluid Systems GmbH. "
+    "NOTE: Check the Pressure Relief Valve and the PSU before starting.\n\n"
+    "Replace gasket G-45 every 500 hours."
+)
+
+
+def test_entities_by_rule_without_overlaps():
+    """Test codes, organisations, phrases and acronyms are found once each, the widest span winning"""
+    extraction = extract_text(MANUAL)
+
+    assert extraction["entities"] == [
+        {"name": "XR-2000 Pump", "type": "Product"},
+        {"name": "Main Manifold", "type": "Concept"},
+        {"name": "Acme Fluid Systems GmbH", "type": "Organization"},
+        {"name": "Pressure Relief Valve", "type": "Concept"},
+        {"name": "PSU", "type": "Concept"},
+        {"name": "G-45", "type": "Product"},
+    ]
+
+
+def test_relationships_link_entities_of_one_sentence():
+    """Test co-occurrence edges stay within sentences and skip list-like ones"""
+    extraction = extract_text(MANUAL + " Spares: A1, B2, C3, D4, E5, F6, G7.")
+
+    assert extraction["relationships"] == [
+        {"from": "Main Manifold", "to": "XR-2000 Pump", "type": "CO_OCCURS"},
+        {"from": "Pressure Relief Valve", "to": "PSU", "type": "CO_OCCURS"},
+    ]
+
+
+def test_gazetteer_names_take_their_type(tmp_path):
+    """Test gazetteer entries win over the generic rules, case-insensitively"""
+    path = tmp_path / "gazetteer.csv"
+    path.write_text("# name,type\nmain manifold,Component\nPSU,Component\n")
+    load_gazetteer.cache_clear()
+
+    [first, second] = extract_batch([MANUAL, "The Main  Manifold leaks."], str(path))
+
+    assert {"name": "main manifold", "type": "Component"} in first["entities"]
+    assert {"name": "PSU", "type": "Component"} in first["entities"]
+    assert second["entities"] == [{"name": "main manifold", "type": "Component"}]
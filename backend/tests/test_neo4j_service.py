@@ -0,0 +1,99 @@
+"""
+Test batched knowledge graph writes
+"""
+
+import pytest
+from services.neo4j_service import (
+    DOCUMENT_UPSERT, ENTITY_UPSERT, RELATIONSHIP_UPSERT, Neo4jService, graph_write_batches
+)
+
+
+class RecordingDriver:
+    """Stands in for the async driver: records transactions and their statements"""
+
+    def __init__(self):
+        self.transactions = []
+        self.auto_commit = 0
+
+    def session(self):
+        driver = self
+
+        class Result:
+            async def consume(self):
+                pass
+
+        class Transaction:
+            def __init__(self):
+                self.statements = []
+
+            async def run(self, query, parameters=None, **kwargs):
+                self.statements.append((query, parameters))
+                return Result()
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run(self, *args, **kwargs):
+                driver.auto_commit += 1
+
+            async def execute_write(self, work):
+                tx = Transaction()
+                await work(tx)
+                driver.transactions.append(tx.statements)
+
+        return Session()
+
+
+def test_graph_write_batches_dedupes_and_splits():
+    """Test rows are deduplicated and cut into batch_size UNWIND statements"""
+    entities = [{"name": f"part {i}", "type": "PART"} for i in range(5)] + [
+        {"name": "part 0", "type": "PART", "chunk_ids": ["c1", "c2"]},
+        {"name": "part 0", "type": "PART", "chunk_ids": ["c2", "c3"]},
+    ]
+    relationships = [{"source": "part 0", "target": f"part {i}", "type": "FITS"} for i in range(1, 5)] * 2
+
+    statements = list(graph_write_batches(7, entities, relationships, batch_size=2))
+
+    assert [query for query, _ in statements] == [DOCUMENT_UPSERT] + [ENTITY_UPSERT] * 3 + [RELATIONSHIP_UPSERT] * 2
+    assert all(parameters["doc_id"] == 7 for _, parameters in statements)
+    assert [len(parameters["rows"]) for _, parameters in statements[1:]] == [2, 2, 1, 2, 2]
+    assert statements[3][1]["rows"] == [{"name": "part 4", "type": "PART", "chunk_ids": []}]
+    assert statements[1][1]["rows"][0] == {"name": "part 0", "type": "PART", "chunk_ids": ["c1", "c2", "c3"]}
+
+
+@pytest.mark.asyncio
+async def test_create_document_graph_writes_in_one_transaction(monkeypatch):
+    """Test a document graph costs a few statements in one transaction, not one per row"""
+    monkeypatch.setattr("services.neo4j_service.settings.NEO4J_WRITE_BATCH_SIZE", 100)
+    service = Neo4jService()
+    await service.driver.close()
+    service.driver = RecordingDriver()
+    entities = [{"name": f"part {i}", "type": "PART"} for i in range(250)]
+    relationships = [{"from": f"part {i}", "to": f"part {i + 1}", "type": "FITS", "chunk_ids": [f"c{i}"]}
+                     for i in range(249)]
+
+    await service.create_document_graph(3, entities, relationships)
+
+    assert service.driver.auto_commit == 0 and len(service.driver.transactions) == 1
+    statements = service.driver.transactions[0]
+    assert len(statements) == 1 + 3 + 3
+    assert statements[4][1]["rows"][0] == {"source": "part 0", "target": "part 1", "type": "FITS",
+                                           "chunk_ids": ["c0"]}
+
+
+def test_entities_are_one_node_per_name():
+    """Test a name given two types is written as one node, so relationships can't attach to both"""
+    entities = [{"name": "Apple", "type": "ORG", "chunk_ids": ["c1"]},
+                {"name": "Apple", "type": "PRODUCT", "chunk_ids": ["c2"]}]
+    relationships = [{"source": "Apple", "target": "Apple", "type": "MAKES"}]
+
+    statements = list(graph_write_batches(7, entities, relationships))
+
+    assert statements[1] == (ENTITY_UPSERT, {"doc_id": 7, "rows": [
+        {"name": "Apple", "type": "ORG", "chunk_ids": ["c1", "c2"]}
+    ]})
+    assert "MERGE (e:Entity {name: row.name, document_id: $doc_id})" in ENTITY_UPSERT
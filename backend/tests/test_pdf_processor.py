@@ -0,0 +1,79 @@
+"""
+Test page-range PDF extraction
+"""
+
+import asyncio
+import PyPDF2
+import pytest
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from services import pdf_processor
+from services.pdf_processor import PDFProcessor, _extract_page_range, _looks_garbled
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return write_synthetic_pdf(str(tmp_path / "doc.pdf"), pages=6, lines_per_page=10, blank_pages=[4])
+
+
+def test_looks_garbled():
+    """Test empty, glyph-soup and control-code text is flagged, prose is not"""
+    assert _looks_garbled("")
+    assert _looks_garbled(" ")
+    assert _looks_garbled("\x01\x02\x03 abc")
+    assert _looks_garbled("!!! ### $$$ %%% &&& *** ((( )))")
+    assert not _looks_garbled("Torque the flange bolts on valve XR-2000 to 45 Nm.")
+
+
+def test_adaptive_falls_back_to_pdfplumber_for_bad_pages(pdf_path, monkeypatch):
+    """Test only empty or garbled PyPDF2 pages are re-extracted"""
+    original = PyPDF2.PageObject.extract_text
+    calls = {"n": 0}
+
+    def flaky(self, *args, **kwargs):
+        calls["n"] += 1
+        return "�" * 50 if calls["n"] == 2 else original(self, *args, **kwargs)
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", flaky)
+
+    pages = _extract_page_range(pdf_path, 0, 6, "adaptive")
+
+    assert [page.page_number for page in pages] == [1, 2, 3, 4, 5, 6]
+    # the garbled page 2 and the blank page 4
+    assert [page.extractor for page in pages] == ["pypdf", "pdfplumber", "pypdf", "pdfplumber", "pypdf", "pypdf"]
+    assert pages[1].text.startswith("Section 2.")
+    assert pages[3].text == ""
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_keeps_page_order(pdf_path, monkeypatch):
+    """Test ranges finishing out of order are still yielded in page order"""
+    async def run_cpu(func, *args):
+        start = args[1]
+        await asyncio.sleep(0.05 - start * 0.01)  # later ranges finish first
+        return func(*args)
+
+    monkeypatch.setattr(pdf_processor, "run_cpu", run_cpu)
+
+    pages = [page async for page in PDFProcessor.iter_pages(pdf_path, 6, batch_size=2, parallelism=3)]
+
+    assert [page.page_number for page in pages] == [1, 2, 3, 4, 5, 6]
+    assert pages[4].text.startswith("Section 5.")
+
+
+@pytest.mark.asyncio
+async def test_extractors_agree_on_page_layout(pdf_path, monkeypatch):
+    """Test page offsets index the joined text and headers mark every page"""
+    async def run_cpu(func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(pdf_processor, "run_cpu", run_cpu)
+
+    extracted = await PDFProcessor.extract_with_metadata(pdf_path, parallel=True)
+    with_headers = await PDFProcessor.extract_text_pypdf(pdf_path)
+
+    assert [page['page_number'] for page in extracted['pages']] == [1, 2, 3, 5, 6]
+    for page in extracted['pages']:
+        text = extracted['text'][page['start']:page['start'] + page['char_count']]
+        assert text.startswith(f"Section {page['page_number']}.")
+    assert extracted['doc_metadata']['num_pages'] == 6
+    assert with_headers.count("--- Page ") == 6
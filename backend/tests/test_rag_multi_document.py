@@ -0,0 +1,79 @@
+"""
+Test multi-document retrieval
+"""
+
+import pytest
+from services.rag_service import RAGService
+from services.vector_store import VectorStore
+
+
+@pytest.mark.asyncio
+async def test_search_merges_global_top_k(monkeypatch):
+    """Test hits from every shard are merged by distance"""
+    monkeypatch.setattr(VectorStore, "is_pooled", staticmethod(lambda: False))
+
+    async def fake_embeddings(texts):
+        return [[0.0] for _ in texts]
+
+    async def fake_search(document_ids, query, n_results, user_id, query_embedding):
+        doc = document_ids[0]
+        if doc == 3:
+            raise ValueError("Collection doc_3 does not exist.")
+        return {
+            'chunks': [f"doc{doc}-a", f"doc{doc}-b"],
+            'distances': [doc / 10, doc / 10 + 0.5],
+            'metadatas': [{}, {}],
+        }
+
+    monkeypatch.setattr(VectorStore, "create_embeddings", staticmethod(fake_embeddings))
+    monkeypatch.setattr(VectorStore, "search_documents", staticmethod(fake_search))
+
+    result = await RAGService.search_documents([4, 1, 3, 2], "q", user_id=1, n_results=3)
+
+    assert result['chunks'] == ["doc1-a", "doc2-a", "doc4-a"]
+    assert [m['document_id'] for m in result['metadatas']] == [1, 2, 4]
+    assert len(result['shards']) == 4
+    assert 'error' in result['shards'][2]
+
+
+def test_pooled_shards_batch_documents(monkeypatch):
+    """Test pooled collections search many documents per shard"""
+    monkeypatch.setattr(VectorStore, "is_pooled", staticmethod(lambda: True))
+    monkeypatch.setattr("services.rag_service.settings.RAG_MAX_DOCUMENTS_PER_SHARD", 2)
+
+    assert RAGService._plan_shards([1, 2, 3, 4, 5]) == [[1, 2], [3, 4], [5]]
+
+
+@pytest.mark.asyncio
+async def test_deduplicated_documents_search_their_source(monkeypatch):
+    """Test shared documents are searched under the source's key and cited by their own id"""
+    monkeypatch.setattr(VectorStore, "is_pooled", staticmethod(lambda: True))
+    searched = []
+
+    async def fake_embeddings(texts):
+        return [[0.0] for _ in texts]
+
+    async def fake_search(document_ids, query, n_results, user_id, query_embedding):
+        searched.append((sorted(document_ids), user_id))
+        return {
+            'chunks': [f"doc{doc}" for doc in document_ids],
+            'distances': [doc / 10 for doc in document_ids],
+            'metadatas': [{'document_id': doc} for doc in document_ids],
+        }
+
+    async def fake_answer(system_prompt, user_prompt):
+        return {'answer': "ok", 'usage': {'cost_usd': 0.0}}
+
+    monkeypatch.setattr(VectorStore, "create_embeddings", staticmethod(fake_embeddings))
+    monkeypatch.setattr(VectorStore, "search_documents", staticmethod(fake_search))
+    monkeypatch.setattr(RAGService, "_generate_answer", staticmethod(fake_answer))
+
+    # Document 12 (user 1) is a duplicate of document 3, owned by user 9
+    result = await RAGService.query_documents(
+        [11, 12], "q", user_id=1, n_results=2, rerank=False,
+        titles={11: "Mine", 12: "Shared copy"},
+        artifact_keys={11: (11, 1), 12: (3, 9)}
+    )
+
+    assert sorted(searched) == [([3], 9), ([11], 1)]
+    assert [(s['document_id'], s['title']) for s in result['sources']] == [(12, "Shared copy"), (11, "Mine")]
@@ -0,0 +1,70 @@
+"""
+Test candidate reranking
+"""
+
+import pytest
+from services.rag_service import RAGService
+from services.reranker import LexicalReranker, rerank_results
+from services.vector_store import VectorStore
+
+
+def test_lexical_reranker_prefers_passages_covering_the_query():
+    """Test exact query terms outweigh a slightly better vector distance"""
+    reranker = LexicalReranker(dense_weight=0.3)
+    passages = [
+        "General notes about the maintenance schedule.",
+        "Torque the flange bolts on valve XR-2000 to 45 Nm.",
+        "Unrelated text about invoices.",
+    ]
+
+    scores = reranker.score_sync("valve XR-2000 torque", passages, [0.30, 0.35, 0.60])
+
+    assert scores.argmax() == 1
+
+
+@pytest.mark.asyncio
+async def test_rerank_keeps_top_n_with_aligned_fields():
+    """Test chunks, distances and metadatas are reordered together"""
+    results = {
+        'chunks': ["alpha", "beta gamma", "gamma"],
+        'distances': [0.1, 0.2, None],
+        'metadatas': [{"i": 0}, {"i": 1}, {"i": 2}],
+    }
+
+    reranked = await rerank_results("gamma", results, top_n=2)
+
+    assert len(reranked['chunks']) == 2
+    for chunk, metadata in zip(reranked['chunks'], reranked['metadatas']):
+        assert results['chunks'][metadata["i"]] == chunk
+    assert reranked['rerank']['candidates'] == 3
+    assert "alpha" not in reranked['chunks']
+
+
+@pytest.mark.asyncio
+async def test_query_document_overfetches_and_sends_fewer_chunks(monkeypatch):
+    """Test the LLM sees only RERANK_TOP_N of the over-fetched candidates"""
+    monkeypatch.setattr("services.rag_service.settings.RERANK_OVERFETCH", 4)
+    monkeypatch.setattr("services.rag_service.settings.RERANK_TOP_N", 2)
+    requested = {}
+
+    async def similarity_search(document_id, query, n_results, user_id):
+        requested['n_results'] = n_results
+        return {
+            'chunks': [f"chunk {i}" for i in range(n_results)],
+            'distances': [i / 100 for i in range(n_results)],
+            'metadatas': [{} for _ in range(n_results)],
+        }
+
+    async def generate_answer(system_prompt, user_prompt):
+        requested['prompt'] = user_prompt
+        return {'answer': "ok", 'usage': {'input_tokens': 1, 'output_tokens': 1, 'total_tokens': 2, 'cost_usd': 0}}
+
+    monkeypatch.setattr(VectorStore, "similarity_search", staticmethod(similarity_search))
+    monkeypatch.setattr(RAGService, "_generate_answer", staticmethod(generate_answer))
+
+    result = await RAGService.query_document(1, "chunk", n_results=5, rerank=True)
+
+    assert requested['n_results'] == 20
+    assert len(result['context_chunks']) == 2
+    assert requested['prompt'].count("[Chunk") == 2
+    assert result['retrieval']['rerank']['candidates'] == 20
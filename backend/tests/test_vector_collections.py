@@ -0,0 +1,110 @@
+"""
+Test pooled vector collections (shared and per_user modes) and the migration to them
+"""
+
+import pytest
+from core.config import settings
+from scripts import migrate_vector_collections
+from services import vector_store
+from services.vector_index import LocalVectorClient
+from services.vector_store import VectorStore
+
+EAST, NORTH = [1.0, 0.0], [0.0, 1.0]
+
+
+@pytest.fixture(params=["shared", "per_user"])
+def pooled(request, tmp_path, monkeypatch):
+    """A local client in the given pooled mode; yields the mode"""
+    client = LocalVectorClient(str(tmp_path))
+    monkeypatch.setattr(settings, "VECTOR_COLLECTION_MODE", request.param)
+    monkeypatch.setattr(vector_store, "vector_client", client)
+    monkeypatch.setattr(migrate_vector_collections, "vector_client", client)
+
+    async def fake_embeddings(texts):
+        return [EAST for _ in texts]
+
+    monkeypatch.setattr(VectorStore, "create_embeddings", staticmethod(fake_embeddings))
+    vector_store.collection_cache.clear()
+    yield request.param
+    vector_store.collection_cache.clear()
+
+
+async def add_two_documents():
+    """Documents 1 and 2 of user 5, two chunks each"""
+    for document_id in (1, 2):
+        await VectorStore.add_document_chunks(
+            document_id, [f"doc{document_id} east", f"doc{document_id} north"], user_id=5,
+            embeddings=[EAST, NORTH], ids=["c_a", "c_b"]
+        )
+
+
+def test_collection_names_and_chunk_ids(pooled):
+    """Test pooled modes name the pool and prefix chunk ids with the document"""
+    expected = {"shared": settings.VECTOR_SHARED_COLLECTION, "per_user": "user_5"}[pooled]
+
+    assert VectorStore.collection_name(1, 5) == VectorStore.collection_name(2, 5) == expected
+    assert VectorStore.chunk_id(1, "c_a") == "doc_1_c_a"
+    assert VectorStore.document_filter(1) == {"document_id": 1}
+    if pooled == "per_user":
+        with pytest.raises(ValueError):
+            VectorStore.collection_name(1)
+
+
+@pytest.mark.asyncio
+async def test_queries_are_scoped_to_their_documents(pooled):
+    """Test two documents in one pool are searched apart, or together with $in"""
+    await add_two_documents()
+
+    first = await VectorStore.similarity_search(1, "q", n_results=5, user_id=5)
+    second = await VectorStore.similarity_search(2, "q", n_results=5, user_id=5)
+    both = await VectorStore.search_documents([1, 2], "q", n_results=5, user_id=5)
+    stored = await VectorStore.get_stored_chunks(2, user_id=5)
+
+    assert first['chunks'] == ["doc1 east", "doc1 north"]
+    assert second['chunks'] == ["doc2 east", "doc2 north"]
+    assert {m['document_id'] for m in first['metadatas']} == {1}
+    assert sorted(both['chunks']) == ["doc1 east", "doc1 north", "doc2 east", "doc2 north"]
+    assert sorted(stored) == ["doc_2_c_a", "doc_2_c_b"]
+    assert all(meta['user_id'] == 5 for meta in stored.values())
+
+
+@pytest.mark.asyncio
+async def test_deleting_a_document_keeps_the_rest_of_the_pool(pooled):
+    """Test delete_document_collection removes only that document's rows"""
+    await add_two_documents()
+
+    await VectorStore.delete_document_collection(1, user_id=5)
+
+    pool = vector_store.vector_client.get_collection(VectorStore.collection_name(2, 5))
+    assert sorted(pool.get()["ids"]) == ["doc_2_c_a", "doc_2_c_b"]
+    assert (await VectorStore.similarity_search(1, "q", user_id=5))['chunks'] == []
+    assert (await VectorStore.similarity_search(2, "q", user_id=5))['chunks'] == ["doc2 east", "doc2 north"]
+
+
+@pytest.mark.asyncio
+async def test_migration_copies_legacy_collections_idempotently(pooled, monkeypatch):
+    """Test doc_<id> rows move with owner tags and prefixed ids, and a rerun changes nothing"""
+    client = vector_store.vector_client
+    client.create_collection("doc_3").add(
+        ids=["chunk_0", "chunk_1"], embeddings=[EAST, NORTH],
+        documents=["three a", "three b"], metadatas=[{"chunk_index": 0}, {"chunk_index": 1}]
+    )
+    client.create_collection("doc_4").add(ids=["chunk_0"], embeddings=[EAST], documents=["orphan"])
+
+    async def owners(document_ids):
+        return {3: 7}
+
+    monkeypatch.setattr(migrate_vector_collections, "load_owners", owners)
+
+    summary = await migrate_vector_collections.migrate(page_size=1, dry_run=False, delete_source=False)
+    again = await migrate_vector_collections.migrate(page_size=1, dry_run=False, delete_source=True)
+
+    assert (summary["migrated"], summary["rows"], summary["orphaned"]) == (1, 2, ["doc_4"])
+    assert (again["rows"], again["deleted"]) == (2, 1)
+    pool = client.get_collection(VectorStore.collection_name(3, 7))
+    rows = pool.get(include=["documents", "metadatas", "embeddings"])
+    assert sorted(zip(rows["ids"], rows["documents"])) == [("doc_3_chunk_0", "three a"), ("doc_3_chunk_1", "three b")]
+    assert all(meta["document_id"] == 3 and meta["user_id"] == 7 for meta in rows["metadatas"])
+    assert sorted(rows["embeddings"]) == [NORTH, EAST]
+    assert [c.name for c in client.list_collections() if c.name.startswith("doc_")] == ["doc_4"]
+    assert (await VectorStore.similarity_search(3, "q", user_id=7))['chunks'] == ["three a", "three b"]
@@ -0,0 +1,175 @@
+"""
+Test local vector index
+"""
+
+import pytest
+from services.vector_index import LocalVectorClient, match_where
+
+
+def test_match_where_operators():
+    """Test the supported subset of Chroma's where syntax"""
+    metadata = {"document_id": 3, "page_start": 2, "page_end": 4}
+
+    assert match_where(metadata, {"document_id": 3})
+    assert match_where(metadata, {"document_id": {"$in": [1, 3]}})
+    assert not match_where(metadata, {"document_id": {"$ne": 3}})
+    assert match_where(metadata, {"$and": [{"page_start": {"$lte": 3}}, {"page_end": {"$gte": 3}}]})
+    assert not match_where(metadata, {"$and": [{"page_start": {"$lte": 1}}, {"page_end": {"$gte": 1}}]})
+
+
+def test_query_returns_cosine_top_k(tmp_path):
+    """Test nearest rows come back first with cosine distances"""
+    client = LocalVectorClient(str(tmp_path))
+    collection = client.create_collection("doc_1")
+    collection.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+        documents=["east", "north", "north-east"],
+        metadatas=[{"i": 0}, {"i": 1}, {"i": 2}],
+    )
+
+    results = collection.query(query_embeddings=[[2.0, 0.1]], n_results=2)
+
+    assert results["ids"][0] == ["a", "c"]
+    assert results["documents"][0] == ["east", "north-east"]
+    assert results["distances"][0][0] == pytest.approx(1 - 2.0 / (2.0 ** 2 + 0.01) ** 0.5, abs=1e-5)
+
+
+def test_where_filter_delete_and_persistence(tmp_path):
+    """Test filtered queries, deletes and reloading from disk"""
+    client = LocalVectorClient(str(tmp_path))
+    collection = client.get_or_create_collection("shared")
+    collection.add(ids=["1:a"], embeddings=[[1.0, 0.0]], documents=["x"], metadatas=[{"document_id": 1}])
+    collection.add(ids=["2:a"], embeddings=[[1.0, 0.0]], documents=["y"], metadatas=[{"document_id": 2}])
+
+    filtered = collection.query(query_embeddings=[[1.0, 0.0]], n_results=5, where={"document_id": 2})
+    assert filtered["ids"][0] == ["2:a"]
+
+    collection.delete(where={"document_id": 1})
+
+    reopened = LocalVectorClient(str(tmp_path)).get_collection("shared")
+    assert reopened.count() == 1
+    assert reopened.get()["ids"] == ["2:a"]
+
+
+def test_owner_filters_use_posting_lists_and_agree_with_a_scan(tmp_path):
+    """Test document_id / user_id filters select the same rows as match_where"""
+    collection = LocalVectorClient(str(tmp_path)).create_collection("shared")
+    metadatas = [{"document_id": i % 3, "user_id": i % 2, "chunk_index": i} for i in range(12)]
+    collection.add(ids=[str(i) for i in range(12)], embeddings=[[1.0, float(i)] for i in range(12)],
+                   metadatas=metadatas)
+    segment = collection._segments[0]
+    assert segment.postings["document_id"][1].tolist() == [1, 4, 7, 10]
+
+    for where in (
+        {"document_id": 1},
+        {"document_id": {"$in": [0, 2, 9]}},
+        {"document_id": {"$eq": 5}},
+        {"document_id": 2, "user_id": 0},
+        {"$and": [{"user_id": 1}, {"chunk_index": {"$gte": 5}}]},
+        {"document_id": {"$ne": 1}},
+    ):
+        expected = [i for i, metadata in enumerate(metadatas) if match_where(metadata, where)]
+        assert segment.rows_matching(where).tolist() == expected, where
+        result = collection.query(query_embeddings=[[1.0, 0.0]], n_results=12, where=where)
+        assert sorted(result["ids"][0], key=int) == [str(i) for i in expected], where
+
+
+def test_duplicate_ids_and_missing_collections(tmp_path):
+    """Test the client mirrors Chroma's error behaviour"""
+    client = LocalVectorClient(str(tmp_path))
+    collection = client.create_collection("doc_1")
+    collection.add(ids=["a"], embeddings=[[1.0]])
+
+    with pytest.raises(ValueError):
+        collection.add(ids=["a"], embeddings=[[1.0]])
+    with pytest.raises(ValueError):
+        client.get_collection("doc_2")
+
+    client.delete_collection("doc_1")
+    with pytest.raises(ValueError):
+        client.get_collection("doc_1")
+
+
+@pytest.mark.asyncio
+async def test_document_chunks_by_page_and_index(tmp_path, monkeypatch):
+    """Test chunks spanning a page are fetched by metadata, in document order"""
+    from services import vector_store
+    from services.vector_store import VectorStore
+
+    monkeypatch.setattr(vector_store, "vector_client", LocalVectorClient(str(tmp_path)))
+    monkeypatch.setattr(VectorStore, "is_pooled", staticmethod(lambda: False))
+    vector_store.collection_cache.invalidate("doc_7")
+    spans = [(1, 1), (1, 2), (2, 2), (3, 3)]
+    metadatas = [
+        {"chunk_index": i, "page_start": a, "page_end": b, "char_start": i * 10, "char_end": i * 10 + 12}
+        for i, (a, b) in enumerate(spans)
+    ]
+    await VectorStore.add_document_chunks(
+        7, [f"chunk {i}" for i in range(4)], metadatas,
+        embeddings=[[1.0, float(i)] for i in range(4)]
+    )
+
+    page = await VectorStore.get_document_chunks(7, page=2)
+    single = await VectorStore.get_document_chunks(7, chunk_index=3, limit=1)
+
+    assert page['chunks'] == ["chunk 1", "chunk 2"]
+    assert [m['page_start'] for m in page['metadatas']] == [1, 2]
+    assert single['chunks'] == ["chunk 3"] and single['metadatas'][0]['char_end'] == 42
+    vector_store.collection_cache.invalidate("doc_7")
+
+
+def test_update_keeps_vectors(tmp_path):
+    """Test metadata updates merge into rows without touching their vectors"""
+    collection = LocalVectorClient(str(tmp_path)).create_collection("docs")
+    collection.add(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]],
+                   documents=["A", "B"], metadatas=[{"page": 1, "document_id": 3}, {"page": 2}])
+
+    collection.update(ids=["a", "missing"], metadatas=[{"page": 5}, {"page": 9}])
+
+    rows = collection.get(include=["metadatas", "embeddings"])
+    assert rows["ids"] == ["a", "b"]
+    assert rows["metadatas"][0] == {"page": 5, "document_id": 3}
+    assert rows["embeddings"][0] == [1.0, 0.0]
+    assert LocalVectorClient(str(tmp_path)).get_collection("docs").get(ids=["a"])["metadatas"] == [{"page": 5, "document_id": 3}]
+
+
+def test_clients_sharing_a_directory_see_each_others_writes(tmp_path):
+    """Test concurrent writers from separate clients (API and workers) neither lose rows nor read stale counts"""
+    import threading
+
+    api = LocalVectorClient(str(tmp_path)).get_or_create_collection("shared")
+    workers = [LocalVectorClient(str(tmp_path)).get_or_create_collection("shared") for _ in range(2)]
+    assert api.count() == 0
+    start = threading.Barrier(len(workers))
+
+    def ingest(collection, document_id):
+        start.wait()
+        for batch in range(20):
+            ids = [f"{document_id}-{batch}-{i}" for i in range(3)]
+            collection.upsert(ids=ids, embeddings=[[1.0, float(i)] for i in range(3)],
+                              metadatas=[{"document_id": document_id}] * 3)
+
+    threads = [threading.Thread(target=ingest, args=(c, n)) for n, c in enumerate(workers, start=1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert api.count() == 120
+    assert len(api.get(where={"document_id": 1})["ids"]) == 60
+    workers[0].delete(where={"document_id": 2})
+    assert api.query([[1.0, 0.0]], n_results=100)["ids"][0] and api.count() == 60
+
+
+def test_collection_deleted_by_another_client(tmp_path):
+    """Test a handle to a collection another process deleted fails instead of serving old rows"""
+    first, second = LocalVectorClient(str(tmp_path)), LocalVectorClient(str(tmp_path))
+    collection = first.create_collection("doc_1")
+    collection.add(ids=["a"], embeddings=[[1.0, 0.0]])
+
+    second.delete_collection("doc_1")
+
+    with pytest.raises(ValueError, match="does not exist"):
+        collection.count()
+    assert first.get_or_create_collection("doc_1").count() == 0
@@ -0,0 +1,108 @@
+"""
+Test ingestion worker job handling
+"""
+
+import pytest
+import worker
+from services.job_queue import Job
+
+
+class RecordingQueue:
+    """Stands in for JobQueue: records the calls the worker makes"""
+
+    def __init__(self, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+        self.calls = []
+        self.progress = []
+
+    async def start(self, job):
+        job.attempt += 1
+        self.calls.append("start")
+        return job.attempt
+
+    def abandoned(self, job):
+        return job.attempt > self.max_attempts or job.deliveries > self.max_attempts
+
+    async def dead_letter(self, job, error):
+        self.calls.append(("dead_letter", error))
+
+    async def heartbeat(self, consumer, message_id):
+        self.calls.append("heartbeat")
+
+    async def complete(self, job):
+        self.calls.append("complete")
+
+    async def fail(self, job, error):
+        self.calls.append(("fail", error))
+        return job.attempt < self.max_attempts
+
+    async def publish_progress(self, job_id, user_id, document_id, status, stage, progress, message):
+        self.progress.append(status)
+
+
+def make_job(job_type="test"):
+    return Job(message_id="1-0", job_id="abc", type=job_type,
+               payload={"document_id": 7, "user_id": 3})
+
+
+@pytest.mark.asyncio
+async def test_successful_job_is_completed(monkeypatch):
+    """Test a handler that returns normally acknowledges the job"""
+    async def handler(queue, job):
+        pass
+
+    monkeypatch.setitem(worker.HANDLERS, "test", handler)
+    queue = RecordingQueue()
+
+    await worker.run_job(queue, "c1", make_job())
+
+    assert queue.calls == ["start", "complete"]
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_dead_lettered(monkeypatch):
+    """Test failures report retrying until attempts run out"""
+    async def handler(queue, job):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(worker.HANDLERS, "test", handler)
+    queue = RecordingQueue(max_attempts=2)
+    job = make_job()
+
+    await worker.run_job(queue, "c1", job)
+    await worker.run_job(queue, "c1", job)
+
+    assert queue.calls == ["start", ("fail", "boom"), "start", ("fail", "boom")]
+    assert queue.progress == ["retrying", "failed"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_job_type_is_dead_lettered_without_running():
+    """Test jobs nobody handles are dead-lettered, not retried"""
+    queue = RecordingQueue()
+
+    await worker.run_job(queue, "c1", make_job("nope"))
+
+    assert queue.calls == [("dead_letter", "Unknown job type: nope")]
+    assert queue.progress == ["failed"]
+
+
+@pytest.mark.asyncio
+async def test_job_that_keeps_killing_its_worker_is_dead_lettered(monkeypatch):
+    """Test a reclaimed job past its attempts is dead-lettered instead of run again"""
+    ran = []
+
+    async def handler(queue, job):
+        ran.append(job.attempt)
+
+    monkeypatch.setitem(worker.HANDLERS, "test", handler)
+    queue = RecordingQueue(max_attempts=2)
+    job = make_job()
+    job.attempt = 2  # two earlier runs died before fail() could record them
+    job.deliveries = 3
+
+    await worker.run_job(queue, "c1", job)
+
+    assert ran == []
+    assert queue.calls == ["start", ("dead_letter", "Worker died while running the job (2 attempts, 3 deliveries)")]
+    assert queue.progress == ["failed"]